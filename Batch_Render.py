@@ -0,0 +1,228 @@
+# Author: Tyler Brunette
+# Company: Indicon Corporation
+
+# Renders the viewer's overlays for every inspection file in a folder tree to PNG files, without opening a window.
+# Run: python Batch_Render.py <inspection folder> <output folder> [--images <live image folder>] [--workers N]
+# Each inspection file gets an output folder with overview.png (static images with every shape) and one
+# failure_<n>_<inspection>.png per failed inspection (live image, shape and result parameter table). Files whose
+# output is newer than the file and the shape files are skipped, so an interrupted run can be started again.
+
+import argparse
+import concurrent.futures
+import os
+import re
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')  # must be set before pygame is imported
+import pygame
+import Font_Cache
+import Image_Cache
+import Indicon_Inspection_Visuals as Visuals
+import Inspection_Watcher
+import Shape_Binary
+
+marker_name = "rendered.txt"  # written last in each output folder, its time marks the output as up to date
+background = (51,51,51)  # Dark Gray, same as the viewer
+
+# Set in each worker process by init_worker
+worker_settings = {}
+
+
+# Method: get_output_folder
+# Purpose: gets the folder the images of an inspection file are written to (mirrors the input folder tree)
+# Parameters:
+#   String json_file: inspection file
+#   String root: folder being rendered
+#   String output: folder the images are written under
+# Returns:
+#   String output_folder: folder for the inspection file's images
+def get_output_folder(json_file, root, output):
+    return os.path.join(output, os.path.splitext(os.path.relpath(json_file, root))[0])
+
+
+# Method: is_up_to_date
+# Purpose: checks whether an inspection file was rendered after it and the files it depends on last changed
+# Parameters:
+#   String json_file: inspection file
+#   String output_folder: folder for the inspection file's images
+#   Array dependencies: other files the images are drawn from (shape files, static images)
+# Returns:
+#   Bool up_to_date: whether the inspection file can be skipped
+def is_up_to_date(json_file, output_folder, dependencies):
+    marker = os.path.join(output_folder, marker_name)
+    if not os.path.exists(marker):
+        return False
+    newest = max(os.path.getmtime(file_name) for file_name in [json_file] + dependencies if os.path.exists(file_name))
+    return os.path.getmtime(marker) >= newest
+
+
+# Method: render_overview
+# Purpose: draws the static images stacked on top of each other with every shape of the inspection
+# Parameters:
+#   Array shapes_to_draw: ShapeToDraw objects or ShapeStore from get_inspection
+#   Array static_images: the static image surfaces ('1', '2' and '3')
+# Returns:
+#   Surface overview: the rendered image
+def render_overview(shapes_to_draw, static_images):
+    width = max(image.get_width() for image in static_images)
+    height = sum(image.get_height() for image in static_images)
+    overview = pygame.Surface((width, height))
+    overview.fill(background)
+
+    image_positions = {}
+    y = 0
+    for slot, image in enumerate(static_images):
+        overview.blit(image, (0, y))
+        image_positions[str(slot + 1)] = (0, y, 1)
+        y = y + image.get_height()
+
+    Visuals.draw_shapes_on_images(overview, shapes_to_draw, image_positions)
+    return overview
+
+
+# Method: render_failure
+# Purpose: draws a failed inspection the way the viewer's failure panel does: live image, shape and result table
+# Parameters:
+#   FailedInspection failed_inspection: inspection to draw
+#   Float scale: scale factor of the live image
+# Returns:
+#   Surface failure: the rendered image
+def render_failure(failed_inspection, scale):
+    try:
+        live_image = Visuals.live_image_cache.get(failed_inspection.image_file, scale)
+    except (OSError, pygame.error) as error:
+        print("Could not load " + failed_inspection.image_file + ": " + str(error))
+        live_image = pygame.Surface((0, 0))
+
+    table_width = 400
+    row_height = 32
+    label_height = 28
+    width = max(live_image.get_width(), table_width + 4)
+    height = live_image.get_height() + label_height + row_height * len(failed_inspection.keys) + 4
+    failure = pygame.Surface((width, height))
+    failure.fill(background)
+
+    failure.blit(live_image, (0, 0))
+    if live_image.get_width() > 0:
+        failed_inspection.draw_shape(failure, 0, 0, scale)
+    table_label = Font_Cache.render_text(failed_inspection.inspection_name + " result parameters:", 22, (255, 0, 0))
+    failure.blit(table_label, (2, live_image.get_height() + 2))
+    failed_inspection.fill_table(failure, pygame.Rect(2, live_image.get_height() + label_height,
+                                                      table_width, row_height))
+    return failure
+
+
+# Method: init_worker
+# Purpose: sets up pygame and loads the static images once in each worker process
+# Parameters:
+#   Array static_files: file names of the static images ('1', '2' and '3')
+#   String image_directory: folder of the live images (None for each inspection file's own folder)
+#   Float live_image_scale: scale factor of the live images
+# Returns: N/A
+def init_worker(static_files, image_directory, live_image_scale):
+    pygame.init()
+    worker_settings['static_images'] = [Image_Cache.static_image_cache.get(file_name) for file_name in static_files]
+    worker_settings['image_directory'] = image_directory
+    worker_settings['live_image_scale'] = live_image_scale
+
+
+# Method: render_file
+# Purpose: renders the overview and failure images of one inspection file (runs in a worker process)
+# Parameters:
+#   String json_file: inspection file
+#   String output_folder: folder to write the images to
+# Returns:
+#   String json_file: the inspection file
+#   Int images: number of images written
+#   String error: why the file could not be rendered (None if it was)
+def render_file(json_file, output_folder):
+    image_directory = worker_settings['image_directory']
+    if image_directory is None:
+        image_directory = os.path.dirname(json_file)
+    try:
+        shapes_to_draw, failed_inspections = Visuals.get_inspection(json_file, image_directory=image_directory)
+    except (OSError, ValueError, KeyError, pygame.error) as error:
+        return json_file, 0, str(error)
+
+    # The marker is only written once every image is, so a file that fails part way is rendered again next time
+    images = 0
+    try:
+        os.makedirs(output_folder, exist_ok=True)
+        marker = os.path.join(output_folder, marker_name)
+        if os.path.exists(marker):
+            os.remove(marker)
+        # Failure images from an earlier render of a changed file would be left over otherwise
+        for file_name in os.listdir(output_folder):
+            if file_name.startswith("failure_"):
+                os.remove(os.path.join(output_folder, file_name))
+
+        pygame.image.save(render_overview(shapes_to_draw, worker_settings['static_images']),
+                          os.path.join(output_folder, "overview.png"))
+        images = 1
+        for index, failed_inspection in enumerate(failed_inspections):
+            safe_name = re.sub(r'[^A-Za-z0-9_-]+', '_', failed_inspection.inspection_name)
+            file_name = "failure_" + str(index + 1).zfill(2) + "_" + safe_name + ".png"
+            pygame.image.save(render_failure(failed_inspection, worker_settings['live_image_scale']),
+                              os.path.join(output_folder, file_name))
+            images = images + 1
+
+        with open(marker, 'w') as marker_file:
+            marker_file.write(json_file + "\n" + str(images) + " images\n")
+    except (OSError, pygame.error) as error:
+        return json_file, images, str(error)
+    return json_file, images, None
+
+
+# Method: main
+# Purpose: renders every inspection file in the folder tree given on the command line
+# Parameters: N/A
+# Returns: N/A
+def main():
+    parser = argparse.ArgumentParser(description="Render inspection overlays to PNG files without a window.")
+    parser.add_argument("root", help="folder of inspection json files (searched with its subfolders)")
+    parser.add_argument("output", help="folder to write the images to")
+    parser.add_argument("--images", default=None,
+                        help="folder of the live images (default: the folder each json file is in)")
+    parser.add_argument("--static", nargs=3, default=["IP_Image_1.png", "IP_Image_1.png", "IP_Image_1.png"],
+                        metavar="IMAGE", help="the three static image files")
+    parser.add_argument("--live-scale", type=float, default=0.5, help="scale factor of the live images")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--force", action="store_true", help="render files that are already up to date")
+    args = parser.parse_args()
+
+    shape_files = [Visuals.shape_cache.file_name, Visuals.live_shape_cache.file_name]
+    binary_files = [Shape_Binary.get_binary_file_name(file_name) for file_name in shape_files]
+    dependencies = shape_files + binary_files + args.static
+    jobs = []
+    skipped = 0
+    for json_file in Inspection_Watcher.find_inspection_files(args.root):
+        output_folder = get_output_folder(json_file, args.root, args.output)
+        if not args.force and is_up_to_date(json_file, output_folder, dependencies):
+            skipped = skipped + 1
+        else:
+            jobs.append((json_file, output_folder))
+    print(str(len(jobs)) + " files to render, " + str(skipped) + " already up to date")
+
+    start_time = time.perf_counter()
+    images = 0
+    failed = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                                                initargs=(args.static, args.images, args.live_scale)) as executor:
+        futures = [executor.submit(render_file, json_file, output_folder) for json_file, output_folder in jobs]
+        for future in concurrent.futures.as_completed(futures):
+            json_file, file_images, error = future.result()
+            if error is not None:
+                failed = failed + 1
+                print("Could not render " + json_file + ": " + error)
+            else:
+                images = images + file_images
+    seconds = max(time.perf_counter() - start_time, 1e-9)
+
+    print("Rendered " + str(images) + " images from " + str(len(jobs) - failed) + " files in " +
+          "{:.2f}".format(seconds) + " s ({:.1f} images/s)".format(images / seconds))
+    if failed > 0:
+        print(str(failed) + " files could not be rendered")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,10 @@ class Button():
 	def __init__(self, x, y, image, scale):
 		width = image.get_width()
 		height = image.get_height()
-		self.image = pygame.transform.scale(image, (int(width * scale), int(height * scale)))
+		if scale == 1:
+			self.image = image
+		else:
+			self.image = pygame.transform.scale(image, (int(width * scale), int(height * scale)))
 		self.rect = self.image.get_rect()
 		self.rect.topleft = (x, y)
 		self.clicked = False
@@ -0,0 +1,106 @@
+# Author: Tyler Brunette
+# Company: Indicon Corporation
+
+import collections
+import pygame
+
+default_face = "Times New Roman"  # Font used for all text in both programs
+
+
+# Class: TextCache
+# Purpose: Keeps fonts and rendered text surfaces so the same label is only looked up and rendered once.
+#          Fonts are kept by (face, size) for the life of the program, rendered text is kept by
+#          (text, face, size, antialias, color, background) and the least recently used surfaces are dropped
+#          once there are more than max_surfaces.
+# Parameters:
+#   Int max_surfaces: number of rendered text surfaces to keep
+# Returns: N/A
+class TextCache:
+
+    # Method: __init__
+    # Purpose: Initializes a TextCache object
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, max_surfaces=1024):
+        self.max_surfaces = max_surfaces
+        self.fonts = {}  # (face, size) -> Font
+        self.surfaces = collections.OrderedDict()  # (text, face, size, antialias, color, background) -> Surface
+        self.hits = 0
+        self.misses = 0
+
+    # Method: get_font
+    # Purpose: gets a system font, looking it up only the first time the face and size are used
+    # Parameters:
+    #   String face: name of the font
+    #   Int size: size of the font
+    # Returns:
+    #   Font font: pygame font
+    def get_font(self, face, size):
+        key = (face, size)
+        font = self.fonts.get(key)
+        if font is None:
+            font = pygame.font.SysFont(face, size=size)
+            self.fonts[key] = font
+        return font
+
+    # Method: render
+    # Purpose: gets a rendered text surface, rendering it only if it isn't cached
+    # Parameters:
+    #   String text: text to render
+    #   Int size: size of the font
+    #   Tuple color: color of the text
+    #   Tuple background: color behind the text (None for transparent)
+    #   String face: name of the font
+    #   Bool antialias: whether the text is antialiased
+    # Returns:
+    #   Surface text_surface: rendered text (shared, do not draw on it)
+    def render(self, text, size, color, background=None, face=default_face, antialias=True):
+        key = (text, face, size, antialias, tuple(color), None if background is None else tuple(background))
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits = self.hits + 1
+            return surface
+
+        self.misses = self.misses + 1
+        surface = self.get_font(face, size).render(text, antialias, color, background)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_surfaces:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    # Method: clear
+    # Purpose: removes every font and text surface from the cache (call after pygame.font is re-initialized)
+    # Parameters: N/A
+    # Returns: N/A
+    def clear(self):
+        self.fonts.clear()
+        self.surfaces.clear()
+
+
+text_cache = TextCache()  # Shared by everything that draws text
+
+
+# Method: get_font
+# Purpose: gets a font from the shared cache
+# Parameters:
+#   Int size: size of the font
+#   String face: name of the font
+# Returns:
+#   Font font: pygame font
+def get_font(size, face=default_face):
+    return text_cache.get_font(face, size)
+
+
+# Method: render_text
+# Purpose: gets a rendered text surface from the shared cache
+# Parameters:
+#   String text: text to render
+#   Int size: size of the font
+#   Tuple color: color of the text
+#   Tuple background: color behind the text (None for transparent)
+#   String face: name of the font
+# Returns:
+#   Surface text_surface: rendered text (shared, do not draw on it)
+def render_text(text, size, color, background=None, face=default_face):
+    return text_cache.render(text, size, color, background, face)
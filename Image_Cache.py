@@ -0,0 +1,267 @@
+# Author: Tyler Brunette
+# Company: Indicon Corporation
+
+import collections
+import hashlib
+import os
+import struct
+import threading
+import pygame
+
+# TODO: Local folder for pre-scaled static images (None to disable), next to the scripts no matter where they are run
+static_cache_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static_image_cache")
+
+
+# Method: scale_surface
+# Purpose: scales a surface by a scale factor (same sizing as Button.Button)
+# Parameters:
+#   Surface image: surface to scale
+#   Float scale: scale factor
+#   Bool smooth: filter the pixels (slower, looks better when shrinking) instead of picking the nearest pixel
+# Returns:
+#   Surface scaled_image: scaled copy of the surface (the surface itself if the scale is 1)
+def scale_surface(image, scale, smooth=False):
+    if scale == 1:
+        return image
+    size = (int(image.get_width() * scale), int(image.get_height() * scale))
+    if smooth:
+        return pygame.transform.smoothscale(image, size)
+    return pygame.transform.scale(image, size)
+
+
+# Class: SurfaceCache
+# Purpose: Keeps decoded and scaled images in memory so an image that is displayed again only costs a blit.
+#          Images are keyed by (path, modified time, scale) so a replaced file is decoded again, and the least
+#          recently used images are dropped once the cache is over its memory budget.
+# Parameters:
+#   Int max_bytes: memory budget of the cached pixel data in bytes
+# Returns: N/A
+class SurfaceCache:
+
+    # Method: __init__
+    # Purpose: Initializes a SurfaceCache object
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.surfaces = collections.OrderedDict()  # (path, modified time, scale) -> Surface, least recently used first
+        self.total_bytes = 0  # pixel data currently held in the cache
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    # Method: get_surface_bytes
+    # Purpose: gets the memory used by a surface's pixel data
+    # Parameters:
+    #   Surface surface: surface to measure
+    # Returns:
+    #   Int size: size of the pixel data in bytes
+    @staticmethod
+    def get_surface_bytes(surface):
+        return surface.get_pitch() * surface.get_height()
+
+    # Method: get
+    # Purpose: gets an image scaled by a scale factor, decoding and scaling it only if it isn't cached
+    # Parameters:
+    #   String path: file location of the image
+    #   Float scale: scale factor of the image
+    # Returns:
+    #   Surface image: decoded and scaled image
+    def get(self, path, scale):
+        key = (path, os.path.getmtime(path), scale)
+        with self.lock:
+            surface = self.surfaces.get(key)
+            if surface is not None:
+                self.surfaces.move_to_end(key)
+                self.hits = self.hits + 1
+                return surface
+            self.misses = self.misses + 1
+
+        image = pygame.image.load(path)
+        if pygame.display.get_surface() is not None:
+            image = image.convert()
+        surface = scale_surface(image, scale)
+        self.put(key, surface)
+        return surface
+
+    # Method: put
+    # Purpose: adds a surface to the cache and drops the least recently used surfaces until it is under budget
+    # Parameters:
+    #   Tuple key: (path, modified time, scale) of the surface
+    #   Surface surface: decoded and scaled image
+    # Returns: N/A
+    def put(self, key, surface):
+        size = self.get_surface_bytes(surface)
+        with self.lock:
+            if key in self.surfaces:
+                self.total_bytes = self.total_bytes - self.get_surface_bytes(self.surfaces.pop(key))
+            self.surfaces[key] = surface
+            self.total_bytes = self.total_bytes + size
+            # Always keep the newest surface, even if it is bigger than the whole budget
+            while self.total_bytes > self.max_bytes and len(self.surfaces) > 1:
+                old_key, old_surface = self.surfaces.popitem(last=False)
+                self.total_bytes = self.total_bytes - self.get_surface_bytes(old_surface)
+                self.evictions = self.evictions + 1
+
+    # Method: clear
+    # Purpose: removes every surface from the cache
+    # Parameters: N/A
+    # Returns: N/A
+    def clear(self):
+        with self.lock:
+            self.surfaces.clear()
+            self.total_bytes = 0
+
+    # Method: stats
+    # Purpose: gets the cache counters
+    # Parameters: N/A
+    # Returns:
+    #   Dict stats: hits, misses, evictions, number of cached images and bytes used
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'images': len(self.surfaces), 'bytes': self.total_bytes, 'max_bytes': self.max_bytes}
+
+
+# Class: StaticImageCache
+# Purpose: Loads the static images (and button images) that stay the same for the life of the program. Each image is
+#          decoded once no matter how many paths point to the same picture (images are matched by a hash of the
+#          file's contents), and each (scale, smooth) version is scaled once. Scaled images are also saved as raw
+#          pixels in a local folder, so the next start only reads the pixels back instead of decoding and scaling.
+# Parameters:
+#   String cache_directory: folder for the raw pixel files (None to keep images in memory only)
+# Returns: N/A
+class StaticImageCache:
+
+    raw_header = struct.Struct('<4sII')  # b'IRAW', width, height, then the RGB pixels row by row
+
+    # Method: __init__
+    # Purpose: Initializes a StaticImageCache object
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, cache_directory=None):
+        self.cache_directory = cache_directory
+        self.hashes = {}  # absolute path -> ((modified time, size), content hash)
+        self.surfaces = {}  # (content hash, scale, smooth) -> Surface
+        self.decodes = 0  # images decoded from their file
+        self.raw_loads = 0  # images read back from a raw pixel file
+        self.lock = threading.RLock()
+
+    # Method: get_content_hash
+    # Purpose: gets the hash of an image file's contents, only reading the file again if it has changed
+    # Parameters:
+    #   String path: file location of the image
+    # Returns:
+    #   String content_hash: hex digest of the file's contents
+    def get_content_hash(self, path):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        known = self.hashes.get(path)
+        if known is not None and known[0] == signature:
+            return known[1]
+        with open(path, 'rb') as image_file:
+            content_hash = hashlib.sha1(image_file.read()).hexdigest()
+        self.hashes[path] = (signature, content_hash)
+        return content_hash
+
+    # Method: get_raw_file
+    # Purpose: gets the raw pixel file of a scaled image
+    # Parameters:
+    #   String content_hash: hash of the image file's contents
+    #   Float scale: scale factor of the image
+    #   Bool smooth: whether the image was scaled smoothly
+    # Returns:
+    #   String raw_file: file location of the raw pixels (None if images aren't saved to disk)
+    def get_raw_file(self, content_hash, scale, smooth):
+        if self.cache_directory is None:
+            return None
+        return os.path.join(self.cache_directory, content_hash + "_" + repr(float(scale)) +
+                            ("_smooth" if smooth else "") + ".raw")
+
+    # Method: read_raw
+    # Purpose: reads a scaled image back from its raw pixel file
+    # Parameters:
+    #   String raw_file: file location of the raw pixels
+    # Returns:
+    #   Surface image: the image, or None if the file doesn't exist or can't be read
+    def read_raw(self, raw_file):
+        if raw_file is None or not os.path.exists(raw_file):
+            return None
+        try:
+            with open(raw_file, 'rb') as raw:
+                magic, width, height = self.raw_header.unpack(raw.read(self.raw_header.size))
+                pixels = raw.read()
+            if magic != b'IRAW' or len(pixels) != width * height * 3:
+                return None
+            return pygame.image.frombytes(pixels, (width, height), 'RGB')
+        except (OSError, struct.error, ValueError) as error:
+            print("Could not read " + raw_file + ": " + str(error))
+            return None
+
+    # Method: write_raw
+    # Purpose: saves a scaled image as raw pixels (written to a temporary file first so a stopped write is never read,
+    #          the temporary file is named after the process so batch render workers don't write over each other)
+    # Parameters:
+    #   String raw_file: file location of the raw pixels
+    #   Surface image: scaled image
+    # Returns: N/A
+    def write_raw(self, raw_file, image):
+        if raw_file is None:
+            return
+        try:
+            os.makedirs(self.cache_directory, exist_ok=True)
+            temp_file = raw_file + "." + str(os.getpid()) + ".tmp"
+            with open(temp_file, 'wb') as raw:
+                raw.write(self.raw_header.pack(b'IRAW', image.get_width(), image.get_height()))
+                raw.write(pygame.image.tobytes(image, 'RGB'))
+            os.replace(temp_file, raw_file)
+        except OSError as error:
+            print("Could not save " + raw_file + ": " + str(error))
+
+    # Method: get
+    # Purpose: gets a static image scaled by a scale factor
+    # Parameters:
+    #   String path: file location of the image
+    #   Float scale: scale factor of the image
+    #   Bool smooth: filter the pixels when scaling (see scale_surface)
+    # Returns:
+    #   Surface image: scaled image (shared, don't draw on it)
+    def get(self, path, scale=1, smooth=False):
+        with self.lock:
+            content_hash = self.get_content_hash(path)
+            key = (content_hash, float(scale), smooth and scale != 1)
+            surface = self.surfaces.get(key)
+            if surface is not None:
+                return surface
+
+            raw_file = self.get_raw_file(*key)
+            surface = self.read_raw(raw_file)
+            if surface is not None:
+                self.raw_loads = self.raw_loads + 1
+            else:
+                if scale == 1:
+                    surface = pygame.image.load(path)
+                    self.decodes = self.decodes + 1
+                else:
+                    # Scaled from the full size image, which is cached too
+                    surface = scale_surface(self.get(path), scale, smooth)
+                self.write_raw(raw_file, surface)
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert()
+            self.surfaces[key] = surface
+            return surface
+
+    # Method: stats
+    # Purpose: gets the cache counters
+    # Parameters: N/A
+    # Returns:
+    #   Dict stats: number of cached images, decoded images and images read from raw pixel files
+    def stats(self):
+        with self.lock:
+            return {'images': len(self.surfaces), 'decodes': self.decodes, 'raw_loads': self.raw_loads}
+
+
+# Static images are shared by the viewer, the dashboard, the batch renderer and the shape editor
+static_image_cache = StaticImageCache(static_cache_directory)
@@ -1,119 +1,147 @@
 # Author: Tyler Brunette
 # Company: Indicon Corporation
 
-import json
 import os
+import time
 import pygame
 import Button
-import glob
-import socket
-import threading
-
-
-# Method: create_thread
-# Purpose: creates a separate thread for the TCP socket to run on (so it doesn't interfere with the main program)
-# Parameters:
-#   target: Something to run on the separate thread
-# Returns: N/A
-def create_thread(target):
-    thread = threading.Thread(target=target)
-    thread.daemon = True
-    thread.start()
+import Font_Cache
+import Image_Cache
+import Inspection_Diff
+import Inspection_Pipeline
+import Inspection_Parser
+import Inspection_Watcher
+import Latency_Trace
+import Shape_Library
+import Shape_Store
+import Share_Mirror
+import Thumbnail_Service
+import Trigger_Server
 
 
 HOST = '192.168.56.1'  # TODO: IP Address of the device this will be running on (ex: raspberry pi)
 PORT = 12345  # TODO: Port that the TCP message will be sent/received with
-connection_established = False
-conn, addr = None, None
+FRAMING = 'newline'  # TODO: How the stations separate messages ('newline' or 'length', see Trigger_Server.py)
 
-sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)  # Socket object using (IPV4, TCP)
-sock.bind((HOST, PORT))
-sock.listen(1)  # Listens for 1 connection
-data = None
+# Receives system names from every connected station on its own thread (started in main)
+trigger_server = Trigger_Server.TriggerServer(HOST, PORT, framing=FRAMING)
 
 
-# Method: receive_data
-# Purpose: gets the TCP message from the client
-# Parameters: N/A
-# Returns: N/A
-def receive_data():
-    global data
-    try:
-        while True:
-            data = conn.recv(1024).decode()
-    except ConnectionResetError:
-        data = data
-        wait_for_connection()
-
-
-# Method: wait_for_connection
-# Purpose: Waits for a client to connect to the program, then calls the receive_data method
-# Parameters: N/A
-# Returns: N/A
-def wait_for_connection():
-    global connection_established, conn, addr
-    conn, addr = sock.accept()  # wait for a connection, program will not proceed until a connection is made
-    print('Client connected')
-    connection_established = True
-    receive_data()
+WAKE_EVENT = pygame.USEREVENT + 1  # Posted to the viewer when a TCP message or a new inspection file arrives
 
 
-create_thread(wait_for_connection)  # Runs the TCP methods on a separate thread
+# Method: wake_viewer
+# Purpose: wakes the viewer's event loop immediately (safe to call from any thread)
+# Parameters:
+#   String reason: new inspection file or TCP message that caused the wake up (unused)
+# Returns: N/A
+def wake_viewer(reason=None):
+    if pygame.display.get_init():
+        try:
+            pygame.event.post(pygame.event.Event(WAKE_EVENT))
+        except pygame.error:
+            pass  # event queue is full, the viewer is already awake
 
 
 global directory
 directory = 'D:\\Images\\Left\\2022-05-16\\RHF122133072454630'  # TODO: Directory of the Windows share
 current_directory = os.getcwd()  # Current directory of the python script
 
+# New inspection files and their failure images are copied from the share to a local folder in the background, and the
+# viewer reads everything from that folder, so a slow share never holds up the display
+MIRROR_DIRECTORY = None  # TODO: Local folder to mirror the share into (None to read the share directly)
+mirror_cache_bytes = 2 * 1024 * 1024 * 1024  # TODO: Size limit of the mirror folder (bytes)
+mirror_latency = 0.0  # seconds added to every read from the share, to test the viewer against a slow share
+local_directory = directory if MIRROR_DIRECTORY is None else MIRROR_DIRECTORY  # where the viewer reads files from
+
+# Shape files are parsed once and only re-parsed (on a separate thread) when they are saved again
+shape_cache = Shape_Library.ShapeLibraryCache("ShapeData.json")
+live_shape_cache = Shape_Library.ShapeLibraryCache("LiveImageShapes.json")
+
+# Live images are decoded and scaled once, then reused every time the failure panel rotates back to them
+live_image_cache_bytes = 64 * 1024 * 1024  # TODO: Memory budget of the live image cache (bytes)
+live_image_cache = Image_Cache.SurfaceCache(live_image_cache_bytes)
+live_image_scale = 0.1  # Scale factor of the live image in the failure panel
+
+# Scaled-down copies of each new inspection's failure images are written by worker processes as soon as the file
+# arrives, so the failure panel loads a small local file instead of decoding the full size image from the share
+# TODO: Local folder for the scaled-down live images (None to turn this off), next to the scripts by default
+THUMBNAIL_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thumbnails")
+thumbnail_cache_bytes = 256 * 1024 * 1024  # TODO: Size limit of the thumbnail folder (bytes)
+thumbnail_wait = 2.0  # longest time (seconds) the pipeline waits for a new inspection's thumbnails
+thumbnail_service = Thumbnail_Service.ThumbnailService(THUMBNAIL_DIRECTORY, local_directory, [live_image_scale],
+                                                       thumbnail_cache_bytes)
+
+# Trigger-to-screen latency of each stage is written here when the viewer closes (None to turn tracing off)
+TRACE_FILE = None  # TODO: Set to a file name (ex: "latency_trace.json") to measure latency
+
+# Keeps the inspection files in the directory indexed by creation time, so the newest one is found without a scan
+watcher = Inspection_Watcher.InspectionWatcher(local_directory)
+share_mirror = None
+if MIRROR_DIRECTORY is not None:
+    share_mirror = Share_Mirror.ShareMirror(Inspection_Watcher.InspectionWatcher(directory), watcher,
+                                            mirror_cache_bytes, latency=mirror_latency)
+
+
+# Method: start_watcher
+# Purpose: starts keeping the watcher's index up to date, through the share mirror if there is one
+# Parameters: N/A
+# Returns: N/A
+def start_watcher():
+    if share_mirror is None:
+        watcher.start()
+    else:
+        share_mirror.start()
+
+
+# Method: stop_watcher
+# Purpose: stops what start_watcher started
+# Parameters: N/A
+# Returns: N/A
+def stop_watcher():
+    if share_mirror is None:
+        watcher.stop()
+    else:
+        share_mirror.stop()
+
 
 # Method: get_inspection
 # Purpose: gets the data necessary to run the program
 # Parameters:
 #   String file_name: file name of the json file to read from
+#   Bool report_shapes: prints shape key collisions and inspections that match no shape
+#   String image_directory: directory the live images are stored in (None for the local directory)
 # Returns:
-#   shapes_to_draw: Array of ShapeToDraw objects
-def get_inspection(file_name):
-
-    # Parse the json file and store as a dict object
-    shape_file = "ShapeData.json"
-    live_shape_file = "LiveImageShapes.json"
-    json_file = open(file_name)
-    variables = json.load(json_file)
-    json_file.close()
-
-    live_shape_json = open(live_shape_file)
-    live_shape_data = json.load(live_shape_json)
-    live_shape_json.close()
-
-    shape_json = open(shape_file)
-    shape_data = json.load(shape_json)
-    shape_json.close()
-
-    live_image_shapes = live_shape_data['Shapes']
-    shapes = shape_data['Shapes']
+#   shapes_to_draw: Array of ShapeToDraw objects (a Shape_Store.ShapeStore of the shapes when numpy is available)
+#   failed_inspections: Array of FailedInspection objects
+def get_inspection(file_name, report_shapes=False, image_directory=None):
+
+    # Parse the json file and keep only the parts used here as a dict object
+    with Latency_Trace.tracer.span('parse', file_name):
+        variables = Inspection_Parser.load_inspection(file_name)
+    match_start = time.perf_counter()
+
+    # Both shape files are kept parsed and indexed by key, so each inspection finds its shapes without a full scan
+    live_shape_library = live_shape_cache.get()
+    shape_library = shape_cache.get()
+
     cameras = variables['Cameras']
     shapes_to_draw = []
     failed_inspections = []
-    shape_count = 0
-    fail_count = 0
+
+    # With numpy the shapes are picked out of the shape library's columns by position, no object is built per shape
+    use_store = Shape_Store.numpy is not None
+    shape_rows = []  # positions in the shape library of the shapes to draw
+    shape_colors = []  # color of each of those shapes
 
     for camera in cameras:
         inspections = camera['Inspections']
         image_locations = camera['ImageLocations']
         for inspection in inspections:
             result_parameters = inspection['ResultParameters']
-            shape_key = ""
-            parameter_keys = []
-            parameter_values = []
-            index = 0
-            for parameter in result_parameters:
-                parameter_keys.insert(index, parameter[0])
-                parameter_values.insert(index, parameter[1])
-                index = index + 1
-                if len(shape_key) == 0:
-                    shape_key = parameter[1]
-                else:
-                    shape_key = shape_key + " " + parameter[1]
+            parameter_keys = [parameter[0] for parameter in result_parameters]
+            parameter_values = [parameter[1] for parameter in result_parameters]
+            shape_key = Shape_Library.get_shape_key(result_parameters)
 
             result = inspection['Result']
 
@@ -123,42 +151,63 @@ def get_inspection(file_name):
                 for image in image_locations:
                     if image['StorageType'] == 'ID' and image['ImageType'] == 'Png':
                         live_image = image['FileName']
-                for live_image_shape in live_image_shapes:
-                    if live_image_shape['key'] == shape_key:
-                        inspection_name = inspection['Name']
-                        failed_inspections.insert(fail_count,
-                                                  FailedInspection(parameter_keys, parameter_values,
-                                                                   inspection_name, live_image, live_image_shape))
-
-            for shape_to_draw in shapes:
-
-                # If the keys in the result parameters match a shape's key, display the given shape
-                if shape_to_draw['key'] == shape_key:
-                    color = 1
-                    if result == 'P':
-                        color = 0
-                    elif result == 'F':
-                        color = 1
-                    elif result == 'p':
-                        color = 2
-                    elif result == 'f':
-                        color = 3
-                    name = shape_to_draw['name']
-                    shape = shape_to_draw['shape']
-                    display_name = shape_to_draw['display_name']
-                    x = shape_to_draw['x']
-                    y = shape_to_draw['y']
-                    height = shape_to_draw['height']
-                    width = shape_to_draw['width']
-                    key = shape_to_draw['key']
-                    image = shape_to_draw['image']
-                    shapes_to_draw.insert(shape_count, ShapeToDraw(name, shape, color, display_name,
-                                                                   x, y, height, width, key, image))
-                    shape_count = shape_count + 1
+                for live_image_shape in live_shape_library.find(shape_key):
+                    inspection_name = inspection['Name']
+                    failed_inspections.append(FailedInspection(parameter_keys, parameter_values, inspection_name,
+                                                               live_image, live_image_shape, file_name,
+                                                               image_directory))
+
+            color = 1
+            if result == 'P':
+                color = 0
+            elif result == 'F':
+                color = 1
+            elif result == 'p':
+                color = 2
+            elif result == 'f':
+                color = 3
+
+            # If the keys in the result parameters match a shape's key, display the given shape
+            if use_store:
+                rows = shape_library.find_rows(shape_key)
+                shape_rows.extend(rows)
+                shape_colors.extend([color] * len(rows))
+                continue
+            for shape_to_draw in shape_library.find(shape_key):
+                name = shape_to_draw['name']
+                shape = shape_to_draw['shape']
+                display_name = shape_to_draw['display_name']
+                x = shape_to_draw['x']
+                y = shape_to_draw['y']
+                height = shape_to_draw['height']
+                width = shape_to_draw['width']
+                key = shape_to_draw['key']
+                image = shape_to_draw['image']
+                shapes_to_draw.append(ShapeToDraw(name, shape, color, display_name,
+                                                  x, y, height, width, key, image))
+
+    if use_store:
+        shapes_to_draw = Shape_Store.get_library_store(shape_library).select(shape_rows)
+        shapes_to_draw.color = Shape_Store.numpy.array(shape_colors, dtype=Shape_Store.numpy.int8)
+
+    Latency_Trace.tracer.record('shape_match', match_start, time.perf_counter(), file_name)
+
+    if report_shapes:
+        print(shape_library.report())
+        print(live_shape_library.report())
 
     return shapes_to_draw, failed_inspections
 
 
+# New inspections are parsed and their live images decoded on a worker thread (started in main), so the viewer's frame
+# loop only picks up finished results and never waits on the file share
+pipeline = Inspection_Pipeline.InspectionPipeline(watcher, get_inspection, [live_image_scale])
+
+# Each system's new inspection is compared to its last one, so only the shapes and failure panels that changed are
+# redrawn. Other code can add a listener to be told what changed (see Inspection_Diff.InspectionDiff).
+inspection_differ = Inspection_Diff.InspectionDiffer()
+
+
 # Class: FailedInspection
 # Purpose: Information about failed inspections to display on the GUI
 # Parameters:
@@ -167,6 +216,8 @@ def get_inspection(file_name):
 #   String inspection_name: Name of the inspection (from json file)
 #   String image_file: File location of the live image from the inspection
 #   ShapeToDraw shape_to_draw: Holds the information about the shape to be drawn on the image
+#   String json_file: json file the inspection came from
+#   String image_directory: directory the live image is stored in (None for the local directory)
 # Returns: N/A
 class FailedInspection:
 
@@ -174,15 +225,54 @@ class FailedInspection:
     # Purpose: Initializes a FailedInspection object
     # Parameters: See Above
     # Returns: N/A
-    def __init__(self, keys, values, inspection_name, image_file, shape_to_draw):
+    def __init__(self, keys, values, inspection_name, image_file, shape_to_draw, json_file=None, image_directory=None):
+        if image_directory is None:
+            image_directory = local_directory
         self.keys = keys
         self.values = values
         self.inspection_name = inspection_name
-        self.image_file = directory + '\\' + image_file
+        self.image_file = os.path.join(image_directory, image_file)
         self.shape_to_draw = shape_to_draw
+        self.drawable_shape = None  # ShapeToDraw built from shape_to_draw the first time it is drawn
+        self.json_file = json_file
+        self.prepared_images = {}  # scale factor -> live image decoded ahead of time by prepare_image (None if missing)
+        self.panel = None  # failure panel drawn off-screen by InspectionViewer.render_panel the first time it is shown
+
+    # Method: prepare_image
+    # Purpose: decodes and scales the live image ahead of time so display_image doesn't have to read the file (see
+    #          load_image). Only called before the failed inspection is handed to the render loop.
+    # Parameters:
+    #   Float scale: scale factor of the live image
+    #   Bool wait_for_thumbnail: give the thumbnail service up to thumbnail_wait seconds to finish the thumbnail
+    # Returns: N/A
+    def prepare_image(self, scale, wait_for_thumbnail=True):
+        self.prepared_images[scale] = self.load_image(scale, wait_for_thumbnail)
+
+    # Method: load_image
+    # Purpose: decodes and scales the live image, using the image's thumbnail if the thumbnail service has written one
+    #          (the image is copied from the share first if the share mirror doesn't have it). Reads files and may
+    #          wait on the share, so it is only called by the pipeline (and once in main, before the window opens),
+    #          never by the render loop.
+    # Parameters:
+    #   Float scale: scale factor of the live image
+    #   Bool wait_for_thumbnail: give the thumbnail service up to thumbnail_wait seconds to finish the thumbnail
+    # Returns:
+    #   Surface live_image: the scaled live image
+    def load_image(self, scale, wait_for_thumbnail=True):
+        with Latency_Trace.tracer.span('image_decode', self.json_file):
+            if wait_for_thumbnail:
+                thumbnail_service.wait(self.image_file, thumbnail_wait)
+            thumbnail_file = thumbnail_service.find(self.image_file, scale)
+            if thumbnail_file is not None:
+                return live_image_cache.get(thumbnail_file, 1)
+            elif share_mirror is not None:
+                return live_image_cache.get(share_mirror.fetch(self.image_file), scale)
+            else:
+                return live_image_cache.get(self.image_file, scale)
 
     # Method: display_image
-    # Purpose: displays the live image for the inspection from the json file on the screen
+    # Purpose: displays the live image prepared for the inspection on the screen (nothing is drawn if the image could
+    #          not be loaded, the pipeline keeps trying and the panel is drawn again once it loads)
     # Parameters:
     #   Surface screen: surface to draw the image on
     #   Int x: x coordinates to draw the image (left)
@@ -190,9 +280,10 @@ class FailedInspection:
     #   Float scale: scale factor of the live image
     # Returns: N/A
     def display_image(self, screen, x, y, scale):
-        image = pygame.image.load(self.image_file).convert()
-        live_image = Button.Button(image=image, x=x, y=y, scale=scale)
-        live_image.draw(screen)
+        # Decoded and scaled once by the pipeline, rotating back to this inspection only costs a blit
+        live_image = self.prepared_images.get(scale)
+        if live_image is not None:
+            screen.blit(live_image, (x, y))
 
     # Method: draw_shape
     # Purpose: draws a shape on the live image
@@ -203,18 +294,19 @@ class FailedInspection:
     #   Float scale: scale factor of the image
     # Returns: N/A
     def draw_shape(self, screen, image_x, image_y, scale):
-        name = self.shape_to_draw['name']
-        shape = self.shape_to_draw['shape']
-        color = 1
-        display_name = self.shape_to_draw['display_name']
-        x = self.shape_to_draw['x']
-        y = self.shape_to_draw['y']
-        height = self.shape_to_draw['height']
-        width = self.shape_to_draw['width']
-        key = self.shape_to_draw['key']
-        image = self.shape_to_draw['image']
-        shape_to_draw = ShapeToDraw(name, shape, color, display_name, x, y, height, width, key, image)
-        shape_to_draw.draw_shape(screen, image_x, image_y, scale)
+        if self.drawable_shape is None:
+            name = self.shape_to_draw['name']
+            shape = self.shape_to_draw['shape']
+            color = 1
+            display_name = self.shape_to_draw['display_name']
+            x = self.shape_to_draw['x']
+            y = self.shape_to_draw['y']
+            height = self.shape_to_draw['height']
+            width = self.shape_to_draw['width']
+            key = self.shape_to_draw['key']
+            image = self.shape_to_draw['image']
+            self.drawable_shape = ShapeToDraw(name, shape, color, display_name, x, y, height, width, key, image)
+        self.drawable_shape.draw_shape(screen, image_x, image_y, scale)
 
     # Method: fill_table
     # Purpose: creates a table with the result parameter information of the inspection
@@ -226,14 +318,13 @@ class FailedInspection:
         table_color = (220,220,225)  # Light gray
         dark_text_color = (20, 20, 20)  # Dark gray
         font_size = 24
-        font = pygame.font.SysFont("Times New Roman", size=font_size)  # font to use for the name label
 
         text_x = table_rect.left + 2
         index = 0
         for key in self.keys:
             pygame.draw.rect(screen, table_color, table_rect)
-            key_text = font.render(key + ':', True, dark_text_color)
-            value_text = font.render(self.values[index], True, dark_text_color)
+            key_text = Font_Cache.render_text(key + ':', font_size, dark_text_color)
+            value_text = Font_Cache.render_text(self.values[index], font_size, dark_text_color)
             screen.blit(key_text, (text_x, table_rect.top))
             value_x = text_x + key_text.get_width() + 8
             screen.blit(value_text, (value_x, table_rect.top))
@@ -274,6 +365,24 @@ class ShapeToDraw:
         self.image = image  # image to draw the shape on
         self.line_width = 5  # line width of the shape
 
+    # Method: get_rect
+    # Purpose: gets the area of the screen draw_shape draws on, without drawing
+    # Parameters:
+    #   Int image_x: x position of the image to draw the shape on (left)
+    #   Int image_y: y position of the image to draw the shape on (top)
+    #   Float scale: scale factor of the image
+    # Returns:
+    #   Rect rect: area of the screen covered by the shape and name label
+    def get_rect(self, image_x, image_y, scale):
+        rect = pygame.Rect(image_x + self.x*scale - (self.width*scale/2), image_y + self.y*scale - (self.height*scale/2),
+                           self.width*scale, self.height*scale)
+        if self.display_name:
+            font_size = min(int((self.width + self.height)*scale*.2), 20)
+            label_position = (image_x + self.x*scale, image_y + self.y*scale - (self.height*scale/2) -
+                              (self.line_width*4.5))
+            rect = rect.union(pygame.Rect(label_position, Font_Cache.get_font(font_size).size(self.name)))
+        return rect
+
     # Method: draw_shape
     # Purpose: draws a shape on the screen
     # Parameters:
@@ -281,7 +390,8 @@ class ShapeToDraw:
     #   Int image_x: x position of the image to draw the shape on (left)
     #   Int image_y: y position of the image to draw the shape on (top)
     #   Float scale: scale factor of the image
-    # Returns: N/A
+    # Returns:
+    #   Rect rect: area of the screen that was drawn on (shape and name label)
     def draw_shape(self, screen, image_x, image_y, scale):
 
         shape_color = (255,0,0) # color of the shape (default red)
@@ -301,142 +411,496 @@ class ShapeToDraw:
         font_size = int((self.width + self.height)*scale*.2)
         if font_size > 20:
             font_size = 20
-        font = pygame.font.SysFont("Times New Roman", size=font_size)  # font to use for the name label
+
+        rect = pygame.Rect(image_x + self.x*scale - (self.width*scale/2), image_y + self.y*scale - (self.height*scale/2),
+                           self.width*scale, self.height*scale)
 
         # Determines which shape to draw (0 = circle, 1 = rectangle)
         if self.shape == 0:
-            pygame.draw.ellipse(surface=screen, color=shape_color,
-                                rect=(image_x + self.x*scale - (self.width*scale/2), image_y + self.y*scale - (self.height*scale/2),
-                                      self.width*scale, self.height*scale),
-                                width=self.line_width)
+            pygame.draw.ellipse(surface=screen, color=shape_color, rect=rect, width=self.line_width)
         elif self.shape == 1:
-            pygame.draw.rect(surface=screen, color=shape_color,
-                             rect=(image_x + self.x*scale - (self.width*scale/2), image_y + self.y*scale - (self.height*scale/2),
-                                   self.width*scale, self.height*scale),
-                             width=self.line_width)
+            pygame.draw.rect(surface=screen, color=shape_color, rect=rect, width=self.line_width)
 
         # Displays the name of the inspection item
         if self.display_name:
-            name_label = font.render(self.name, True, shape_color, text_bg)
-            screen.blit(name_label, (image_x + self.x*scale, image_y + self.y*scale -
-                                     (self.height*scale/2) - (self.line_width*4.5)))
+            name_label = Font_Cache.render_text(self.name, font_size, shape_color, text_bg)
+            label_rect = screen.blit(name_label, (image_x + self.x*scale, image_y + self.y*scale -
+                                                  (self.height*scale/2) - (self.line_width*4.5)))
+            rect = rect.union(label_rect)
 
+        return rect
 
-# Method: gui
-# Purpose: Creates a pygame GUI
+
+# Method: draw_shapes_on_images
+# Purpose: draws the shapes of an inspection on the images they belong to (a shape on an image that isn't listed is
+#          drawn at the origin with scale 1)
 # Parameters:
-#   String image_file: filename of the image to display
-#   Array shapes_to_draw: Array of ShapeToDraw objects to display
+#   Surface screen: surface to draw the shapes on
+#   Array shapes_to_draw: ShapeToDraw objects or ShapeStore from get_inspection
+#   Dict image_positions: image -> (x, y, scale) of the images, relative to the origin
+#   Int origin_x: x position the image positions are relative to
+#   Int origin_y: y position the image positions are relative to
 # Returns: N/A
-def gui(image_1_file, image_2_file, image_3_file, inspection_results, json_file):
+def draw_shapes_on_images(screen, shapes_to_draw, image_positions, origin_x=0, origin_y=0):
+    if not isinstance(shapes_to_draw, Shape_Store.ShapeStore):
+        for shape in shapes_to_draw:
+            image_x, image_y, scale = image_positions.get(shape.image, (0, 0, 1))
+            shape.draw_shape(screen, origin_x + image_x, origin_y + image_y, scale)
+        return
+    image_x, image_y, scale = shapes_to_draw.get_image_offsets(image_positions)
+    image_x = image_x + origin_x
+    image_y = image_y + origin_y
+    Shape_Store.draw_shapes(screen, shapes_to_draw, shapes_to_draw.get_screen_rects(image_x, image_y, scale),
+                            shapes_to_draw.get_label_positions(image_x, image_y, scale, 4.5),
+                            shapes_to_draw.get_font_sizes(scale))
+
+
+# Class: InspectionViewer
+# Purpose: Long-lived pygame window that displays inspection results. The window, fonts, static images and layout are
+#          created once, and each new inspection only replaces the shapes and failed inspections being displayed.
+# Parameters:
+#   String image_1_file: filename of the first static image
+#   String image_2_file: filename of the second static image
+#   String image_3_file: filename of the third static image
+# Returns: N/A
+class InspectionViewer:
 
-    # Initialize the GUI
-    pygame.init()
-    size = (1920,1020)  # Size of the window
-    screen = pygame.display.set_mode(size)  # Create a surface with the window size created above
-    pygame.display.set_caption("Indicon Inspection Results")  # Sets the title of the window
-
-    # More Initialization
-    text_color = (220,220,225)  # Light gray
-    background = (51,51,51)  # Dark Gray
-    font = pygame.font.SysFont("Times New Roman", size=22)  # Font to use for text on the GUI
-
-    screen.fill(background)
-    image_1_image = pygame.image.load(image_1_file).convert()
-    image_2_image = pygame.image.load(image_2_file).convert()
-    image_3_image = pygame.image.load(image_3_file).convert()
-
-    # Button object allows the images to be manipulated easily
-    image_1_scale = 0.8
-    image_1 = Button.Button(x=510, y=35, image=image_1_image, scale=image_1_scale)
-    image_1.draw(screen)
-
-    image_2_scale = 0.8
-    image_2 = Button.Button(x=510, y=355, image=image_2_image, scale=image_2_scale)
-    image_2.draw(screen)
-
-    image_3_scale = 0.8
-    image_3 = Button.Button(x=510, y=675, image=image_3_image, scale=image_3_scale)
-    image_3.draw(screen)
-
-    shapes_to_draw, failed_inspections = inspection_results
-
-    image_offset_x = 0
-    image_offset_y = 0
-    image_scale = 1
-
-    # Display all ShapeToDraw objects
-    for shape in shapes_to_draw:
-        if shape.image == '1':
-            image_offset_x, image_offset_y = image_1.rect.topleft
-            image_scale = image_1_scale
-        elif shape.image == '2':
-            image_offset_x, image_offset_y = image_2.rect.topleft
-            image_scale = image_2_scale
-        elif shape.image == '3':
-            image_offset_x, image_offset_y = image_3.rect.topleft
-            image_scale = image_3_scale
-        shape.draw_shape(screen, image_offset_x, image_offset_y, image_scale)
-
-    # Set clock cycle to make the program less intensive
-    clock = pygame.time.Clock()
-
-    # Boolean value to show whether or not the current gui() instance is running
-    running = True
-    count = 0
-    index = 0
-    table_x = image_2.rect.right + 100
-    table_y = image_2.rect.bottom
-    table_rect = pygame.Rect(table_x, table_y, 400, 32)
-    live_image_scale = 0.1
-
-    # Runtime loop controls the GUI
-    while running:
-
-        clock.tick(60)  # Makes the program less intensive
-
-        # Handles user events
-        for event in pygame.event.get():
-
-            # Exits the program if the user closes the window
-            if event.type == pygame.QUIT:
-                running = False
-
-        if len(failed_inspections) > 0:
-            if count % 190 == 0:
-                clear_fail_rect = pygame.Rect(table_rect.left - 20, 0, screen.get_rect().right - image_2.rect.right,
-                                              screen.get_height())
-                pygame.draw.rect(screen, background, clear_fail_rect)
-                table_label = font.render(failed_inspections[index].inspection_name
-                                          + " result parameters:", True, (255, 0, 0))
-                screen.blit(table_label, (table_rect.left, table_y - 28))
-                failed_inspections[index].fill_table(screen, table_rect)
-                failed_inspections[index].display_image(screen, table_x, image_1.rect.top, live_image_scale)
-                failed_inspections[index].draw_shape(screen, table_x, image_1.rect.top, live_image_scale)
-                index = (index + 1) % len(failed_inspections)
-
-        # TODO: Make sure this gets the data from the TCP message properly
-        system_name = str(data)
-        # system_name = 'RHF122133072454630_YenFeng'
-        # Get the most recent json file from the directory
-        json_files = glob.iglob(directory + '\\' + '*.json')
-        system_json_files = []
-        count = 0
-        for file in json_files:
-            if file.__contains__(system_name):
-                system_json_files.insert(count, file)
-                count = count + 1
-        latest_json = max(system_json_files, key=os.path.getctime)
+    # Method: __init__
+    # Purpose: Initializes the pygame window and loads everything that stays the same between inspections
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, image_1_file, image_2_file, image_3_file):
+
+        # Initialize the GUI
+        pygame.init()
+        size = (1920,1020)  # Size of the window
+        self.screen = pygame.display.set_mode(size)  # Create a surface with the window size created above
+        pygame.display.set_caption("Indicon Inspection Results")  # Sets the title of the window
+
+        # More Initialization
+        self.text_color = (220,220,225)  # Light gray
+        self.background = (51,51,51)  # Dark Gray
+        self.font_size = 22  # Size of the font used for text on the GUI
+
+        # Button object allows the images to be manipulated easily, the images come already scaled from the static
+        # image cache (decoded once even if the three files are the same picture)
+        self.image_1_scale = 0.8
+        image_1_image = Image_Cache.static_image_cache.get(image_1_file, self.image_1_scale)
+        self.image_1 = Button.Button(x=510, y=35, image=image_1_image, scale=1)
+
+        self.image_2_scale = 0.8
+        image_2_image = Image_Cache.static_image_cache.get(image_2_file, self.image_2_scale)
+        self.image_2 = Button.Button(x=510, y=355, image=image_2_image, scale=1)
+
+        self.image_3_scale = 0.8
+        image_3_image = Image_Cache.static_image_cache.get(image_3_file, self.image_3_scale)
+        self.image_3 = Button.Button(x=510, y=675, image=image_3_image, scale=1)
+        self.image_positions = {'1': self.image_1.rect.topleft + (self.image_1_scale,),
+                                '2': self.image_2.rect.topleft + (self.image_2_scale,),
+                                '3': self.image_3.rect.topleft + (self.image_3_scale,)}
+
+        # Layout of the failed inspection panel
+        self.table_x = self.image_2.rect.right + 100
+        self.table_y = self.image_2.rect.bottom
+        self.table_rect = pygame.Rect(self.table_x, self.table_y, 400, 32)
+        self.clear_fail_rect = pygame.Rect(self.table_rect.left - 20, 0,
+                                           self.screen.get_rect().right - self.image_2.rect.right,
+                                           self.screen.get_height())
+        self.live_image_scale = live_image_scale
+
+        # Everything is drawn off-screen and copied to the window with one blit: the static images never change, the
+        # background layer is the static layer with the current inspection's shapes drawn on it, and each failed
+        # inspection's panel is drawn once (see render_panel)
+        self.static_layer = pygame.Surface(size).convert()
+        self.static_layer.fill(self.background)
+        self.image_1.draw(self.static_layer)
+        self.image_2.draw(self.static_layer)
+        self.image_3.draw(self.static_layer)
+        self.background_layer = self.static_layer.copy()
+
+        # Set clock cycle to make the program less intensive
+        self.clock = pygame.time.Clock()
+        self.active_fps = 60  # frame rate while something is changing on the screen
+        self.idle_timeout = 500  # longest time (ms) to sleep between frames while nothing is changing
+        self.idle_delay = 1000  # time (ms) without changes or events before the viewer goes idle
+        self.carousel_interval = 190 * 1000 // 60  # time (ms) each failed inspection is displayed
+        self.last_activity = 0  # time (ms) of the last event or change
+
+        # Areas of the screen that have changed since the display was last updated
+        self.dirty_rects = [self.screen.get_rect()]
+
+        # Results of the inspection currently being displayed
+        self.shapes_to_draw = []
+        self.shape_store = None  # shapes_to_draw as columns, when numpy is available (see set_shapes)
+        self.shape_offsets = []  # (image x, image y, image scale) arrays or tuples of each shape (see set_shapes)
+        self.shape_rects = []  # areas of the screen covered by each drawn shape
+        self.failed_inspections = []
+        self.json_file = None
+        self.system_name = trigger_server.latest  # system whose inspections are displayed
+        self.next_rotation = 0  # time (ms) the next failed inspection is displayed
+        self.first_flip_pending = False  # whether the current inspection has not been shown on the display yet
+        self.index = 0  # index of the next failed inspection to display
+        self.running = False
+
+    # Method: set_inspection
+    # Purpose: replaces the displayed inspection with a new one, redrawing only what changed if it follows the one
+    #          being displayed
+    # Parameters:
+    #   Tuple inspection_results: (shapes_to_draw, failed_inspections) from get_inspection
+    #   String json_file: file name of the json file the results came from
+    # Returns: N/A
+    def set_inspection(self, inspection_results, json_file):
+        shapes_to_draw, failed_inspections = inspection_results
+        diff = inspection_differ.update(self.system_name, json_file, shapes_to_draw, failed_inspections)
+        incremental = self.json_file is not None and diff.previous_json_file == self.json_file
+        self.json_file = json_file
+
+        if not incremental or diff.failures_changed():
+            self.next_rotation = pygame.time.get_ticks()
+            self.index = 0
+        self.failed_inspections = diff.failed_inspections
+        if not incremental:
+            self.set_shapes(diff.shapes_to_draw)
+            self.first_flip_pending = True
+            self.draw_inspection()
+            return
+
+        if diff.shapes_changed():
+            self.draw_changes(diff)
+        if diff.failures_changed():
+            # Cleared until the carousel shows the first of the new failed inspections
+            self.screen.blit(self.background_layer, self.clear_fail_rect, self.clear_fail_rect)
+            self.dirty_rects.append(self.clear_fail_rect)
+        elif len(self.failed_inspections) > 0:
+            # Shapes redrawn under the failure panel are covered by it again, and the shown failure is drawn again if
+            # it repeated on the new part with a new live image
+            shown = self.failed_inspections[(self.index - 1) % len(self.failed_inspections)]
+            refreshed = any(failure is shown and previous_failure.panel is not None
+                            for previous_failure, failure in diff.refreshed_failures)
+            if refreshed:
+                shown.panel = self.render_panel(shown)
+            if shown.panel is not None and (refreshed or self.clear_fail_rect.collidelist(self.dirty_rects) >= 0):
+                self.screen.blit(shown.panel, self.clear_fail_rect.topleft)
+                self.dirty_rects.append(self.clear_fail_rect)
+        self.first_flip_pending = len(self.dirty_rects) > 0
+
+    # Method: get_image
+    # Purpose: gets the static image a shape is drawn on
+    # Parameters:
+    #   String image: image number of the shape ('1', '2' or '3')
+    # Returns:
+    #   Button image: static image (None if the number doesn't match an image)
+    #   Float scale: scale factor of the static image
+    def get_image(self, image):
+        if image == '1':
+            return self.image_1, self.image_1_scale
+        elif image == '2':
+            return self.image_2, self.image_2_scale
+        elif image == '3':
+            return self.image_3, self.image_3_scale
+        return None, 1
+
+    # Method: compose_background
+    # Purpose: rebuilds the background layer: the static images with every shape of the current inspection drawn on
+    #          them
+    # Parameters: N/A
+    # Returns: N/A
+    def compose_background(self):
+        self.background_layer.blit(self.static_layer, (0, 0))
+        self.shape_rects = self.draw_shapes(self.background_layer, range(len(self.shapes_to_draw)))
+
+    # Method: set_shapes
+    # Purpose: replaces the shapes being displayed and works out which image each one is drawn on
+    # Parameters:
+    #   Array shapes_to_draw: ShapeToDraw objects or ShapeStore of the current inspection (from get_inspection)
+    # Returns: N/A
+    def set_shapes(self, shapes_to_draw):
+        if shapes_to_draw is self.shapes_to_draw:
+            return  # the same store with only its colors changed, every shape is on the same image as before
+        self.shapes_to_draw = shapes_to_draw
+        if not isinstance(shapes_to_draw, Shape_Store.ShapeStore):
+            self.shape_store = None
+            self.shape_offsets = self.get_shape_offsets()
+            return
+        self.shape_store = shapes_to_draw
+        self.shape_offsets = self.shape_store.get_image_offsets(self.image_positions, carry=True)
+
+    # Method: place_shapes
+    # Purpose: gets some of the shapes and where they are drawn, worked out for all of them at once
+    # Parameters:
+    #   Array indices: positions of the shapes in shapes_to_draw
+    #   Int shift_x: distance to move the shapes left (ex: to draw them on a surface that starts at this x)
+    #   Int shift_y: distance to move the shapes up
+    # Returns:
+    #   ShapeStore store: the shapes
+    #   Tuple rects: (left, top, width, height) arrays of the shapes
+    #   Tuple label_positions: (x, y) arrays of the name labels
+    #   Array font_sizes: font size of each name label
+    def place_shapes(self, indices, shift_x=0, shift_y=0):
+        indices = Shape_Store.numpy.asarray(indices, dtype=Shape_Store.numpy.intp)
+        store = self.shape_store.select(indices)
+        image_x = self.shape_offsets[0][indices] - shift_x
+        image_y = self.shape_offsets[1][indices] - shift_y
+        scale = self.shape_offsets[2][indices]
+        return (store, store.get_screen_rects(image_x, image_y, scale),
+                store.get_label_positions(image_x, image_y, scale, 4.5), store.get_font_sizes(scale))
+
+    # Method: draw_shapes
+    # Purpose: draws some of the shapes of the current inspection
+    # Parameters:
+    #   Surface surface: surface to draw the shapes on
+    #   Array indices: positions of the shapes in shapes_to_draw, in the order to draw them
+    #   Int shift_x: distance to move the shapes left (ex: to draw them on a surface that starts at this x)
+    #   Int shift_y: distance to move the shapes up
+    # Returns:
+    #   Array rects: area of the surface drawn on by each shape (shape and name label)
+    def draw_shapes(self, surface, indices, shift_x=0, shift_y=0):
+        if self.shape_store is None:
+            rects = []
+            for index in indices:
+                image_x, image_y, scale = self.shape_offsets[index]
+                rects.append(self.shapes_to_draw[index].draw_shape(surface, image_x - shift_x, image_y - shift_y,
+                                                                   scale))
+            return rects
+        return Shape_Store.draw_shapes(surface, *self.place_shapes(indices, shift_x, shift_y))
+
+    # Method: get_drawn_rects
+    # Purpose: gets the area of the screen draw_shapes draws on for some of the shapes, without drawing
+    # Parameters:
+    #   Array indices: positions of the shapes in shapes_to_draw
+    # Returns:
+    #   Array rects: area of the screen covered by each shape (shape and name label)
+    def get_drawn_rects(self, indices):
+        if self.shape_store is None:
+            return [self.shapes_to_draw[index].get_rect(*self.shape_offsets[index]) for index in indices]
+        return Shape_Store.get_drawn_rects(*self.place_shapes(indices))
+
+    # Method: get_shape_offsets
+    # Purpose: gets where each ShapeToDraw object of the current inspection is drawn (a shape on an image that doesn't
+    #          exist is drawn on the image of the shape before it)
+    # Parameters: N/A
+    # Returns:
+    #   Array offsets: (image x, image y, image scale) of each shape
+    def get_shape_offsets(self):
+        offsets = []
+        image_offset_x = 0
+        image_offset_y = 0
+        image_scale = 1
+        for shape in self.shapes_to_draw:
+            image, scale = self.get_image(shape.image)
+            if image is not None:
+                image_offset_x, image_offset_y = image.rect.topleft
+                image_scale = scale
+            offsets.append((image_offset_x, image_offset_y, image_scale))
+        return offsets
+
+    # Method: draw_changes
+    # Purpose: redraws only the areas of the background layer covered by shapes that were added, removed or changed
+    #          color, then copies those areas to the window
+    # Parameters:
+    #   InspectionDiff diff: changes from the inspection being displayed
+    # Returns: N/A
+    def draw_changes(self, diff):
+        old_rects = self.shape_rects
+        if self.shape_store is None:
+            old_positions = {id(shape): position for position, shape in enumerate(self.shapes_to_draw)}
+            removed = [old_positions[id(shape)] for shape in diff.removed_shapes]
+            changed = [old_positions[id(old_shape)] for old_shape, new_shape in diff.changed_shapes]
+        else:
+            removed = diff.removed_shapes  # a ShapeStore diff lists positions
+            changed = [old_position for old_position, new_position in diff.changed_shapes]
+        self.set_shapes(diff.shapes_to_draw)
+
+        # Shapes that were matched to a previous shape are where that shape was drawn last time, even if its color
+        # changed, so only added shapes have to be placed
+        rects = [old_rects[position] if position >= 0 else None for position in diff.previous_positions]
+        new_indices = [index for index, position in enumerate(diff.previous_positions) if position < 0]
+        new_rects = self.get_drawn_rects(new_indices)
+        for index, rect in zip(new_indices, new_rects):
+            rects[index] = rect
+        regions = [old_rects[position] for position in removed]
+        regions.extend(old_rects[position] for position in changed)
+        regions.extend(new_rects)
+
+        layer_rect = self.background_layer.get_rect()
+        regions = [region.inflate(2, 2).clip(layer_rect) for region in regions]
+        overlaps = [region.collidelistall(rects) for region in regions]
+        if sum(len(overlapping) for overlapping in overlaps) > len(rects):
+            self.draw_inspection()  # the changed areas are crowded, drawing every shape once is cheaper
+            return
+
+        # Every shape over a changed area is drawn again in order on a copy of the static images, so overlapping
+        # shapes end up the same as a full redraw. The copy is big enough to hold those shapes whole, because
+        # pygame.draw.rect outlines the clipped rectangle when a shape is cut off by a clip area.
+        for region, overlapping in zip(regions, overlaps):
+            area = region.unionall([rects[index] for index in overlapping]).inflate(2, 2).clip(layer_rect)
+            scratch = self.static_layer.subsurface(area).copy()
+            self.draw_shapes(scratch, overlapping, area.x, area.y)
+            self.background_layer.blit(scratch, region, region.move(-area.x, -area.y))
+            self.screen.blit(self.background_layer, region, region)
+            self.dirty_rects.append(region)
+        self.shape_rects = rects
+
+    # Method: draw_inspection
+    # Purpose: rebuilds the background layer for the current inspection and copies it to the window
+    # Parameters: N/A
+    # Returns: N/A
+    def draw_inspection(self):
+        # Only the images, the old and new shapes and the failure panel can change between inspections
+        self.dirty_rects.extend(self.shape_rects)
+        self.dirty_rects.extend([self.image_1.rect, self.image_2.rect, self.image_3.rect, self.clear_fail_rect])
+        self.compose_background()
+        self.screen.blit(self.background_layer, (0, 0))
+        self.dirty_rects.extend(self.shape_rects)
+
+    # Method: render_panel
+    # Purpose: draws a failed inspection's panel (live image, shape and result parameter table) off-screen
+    # Parameters:
+    #   FailedInspection failed_inspection: failed inspection to draw
+    # Returns:
+    #   Surface panel: the panel, the size of clear_fail_rect
+    def render_panel(self, failed_inspection):
+        panel = pygame.Surface(self.clear_fail_rect.size).convert()
+        panel.fill(self.background)
+        left, top = self.clear_fail_rect.topleft
+        table_label = Font_Cache.render_text(failed_inspection.inspection_name + " result parameters:", self.font_size,
+                                             (255, 0, 0))
+        panel.blit(table_label, (self.table_rect.left - left, self.table_y - 28 - top))
+        failed_inspection.fill_table(panel, self.table_rect.move(-left, -top))
+        image_x = self.table_x - left
+        image_y = self.image_1.rect.top - top
+        failed_inspection.display_image(panel, image_x, image_y, self.live_image_scale)
+        failed_inspection.draw_shape(panel, image_x, image_y, self.live_image_scale)
+        return panel
+
+    # Method: draw_failed_inspection
+    # Purpose: shows the next failed inspection in the failure panel (drawing its panel the first time it is shown)
+    # Parameters: N/A
+    # Returns: N/A
+    def draw_failed_inspection(self):
+        failed_inspection = self.failed_inspections[self.index]
+        if failed_inspection.panel is None:
+            failed_inspection.panel = self.render_panel(failed_inspection)
+        self.screen.blit(failed_inspection.panel, self.clear_fail_rect.topleft)
+        self.dirty_rects.append(self.clear_fail_rect)
+        self.index = (self.index + 1) % len(self.failed_inspections)
+
+    # Method: check_for_new_file
+    # Purpose: displays the newest json file for the system once the pipeline has finished loading it
+    # Parameters: N/A
+    # Returns: N/A
+    def check_for_new_file(self):
+        # Live images the pipeline loaded on a later try are drawn the next time their failure is shown
+        pipeline.apply_retried_images()
+
+        # Switch to the system named in the most recent TCP message, if any arrived since the last frame
+        messages = trigger_server.get_messages()
+        if len(messages) > 0 and messages[-1] != self.system_name:
+            self.system_name = messages[-1]
+            pipeline.set_systems([self.system_name])
+        if self.system_name is None:
+            return
+
+        # The pipeline has already parsed the file and decoded its images, nothing here reads from the disk
+        result = pipeline.get_ready(self.system_name)
 
         # if there is a new file, update the information and display
-        if latest_json != json_file:
-            running = False
-            print(latest_json)
-            gui(image_1_file, image_2_file, image_3_file, get_inspection(latest_json), latest_json)
+        if result is not None and result.json_file != self.json_file:
+            print(result.json_file)
+            Latency_Trace.tracer.bind_pending(result.json_file)  # the TCP messages that led to this file
+            self.set_inspection(result.get_results(), result.json_file)
+
+    # Method: update_display
+    # Purpose: updates only the areas of the window that have changed since the last update
+    # Parameters: N/A
+    # Returns: N/A
+    def update_display(self):
+        if len(self.dirty_rects) > 0:
+            with Latency_Trace.tracer.span('first_flip' if self.first_flip_pending else 'update', self.json_file):
+                pygame.display.update(self.dirty_rects)
+            self.first_flip_pending = False
+            self.dirty_rects = []
+            self.last_activity = pygame.time.get_ticks()
+
+    # Method: get_events
+    # Purpose: gets the user events, running at full frame rate while the screen is changing and sleeping until the
+    #          next event, carousel rotation or idle timeout while it isn't
+    # Parameters: N/A
+    # Returns:
+    #   Array events: pygame events that have arrived
+    def get_events(self):
+        now = pygame.time.get_ticks()
+        if now - self.last_activity < self.idle_delay:
+            self.clock.tick(self.active_fps)  # Makes the program less intensive
+            return pygame.event.get()
+
+        timeout = self.idle_timeout
+        if len(self.failed_inspections) > 0:
+            timeout = max(1, min(timeout, self.next_rotation - now))
+        event = pygame.event.wait(timeout)
+        self.clock.tick()
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event] + pygame.event.get()
+
+    # Method: run
+    # Purpose: runs the event loop until the user closes the window
+    # Parameters: N/A
+    # Returns: N/A
+    def run(self):
+        self.running = True
+
+        # Runtime loop controls the GUI
+        while self.running:
+
+            # Handles user events
+            for event in self.get_events():
+                self.last_activity = pygame.time.get_ticks()
+
+                # Exits the program if the user closes the window
+                if event.type == pygame.QUIT:
+                    self.running = False
+
+                # Redraw the whole window if it was covered up
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    self.dirty_rects.append(self.screen.get_rect())
+
+            if len(self.failed_inspections) > 0:
+                if pygame.time.get_ticks() >= self.next_rotation:
+                    self.draw_failed_inspection()
+                    self.next_rotation = pygame.time.get_ticks() + self.carousel_interval
+
+            self.check_for_new_file()
+
+            self.update_display()
+
+        print("Live image cache: " + str(live_image_cache.stats()))
+        print("Static image cache: " + str(Image_Cache.static_image_cache.stats()))
+        print("Thumbnails: " + str(thumbnail_service.stats()))
+        if share_mirror is not None:
+            print("Share mirror: " + str(share_mirror.stats()))
+        for client_stats in trigger_server.stats():
+            print("Trigger client: " + str(client_stats))
+        if TRACE_FILE is not None:
+            Latency_Trace.tracer.export(TRACE_FILE)
+            for name, stage_summary in Latency_Trace.tracer.summary().items():
+                print("Latency " + name + ": " + str(stage_summary))
+        pygame.quit()
 
-        count = count + 1
 
-        pygame.display.flip()
+# Method: gui
+# Purpose: Creates a pygame GUI and displays inspection results until the window is closed
+# Parameters:
+#   String image_1_file: filename of the first static image
+#   String image_2_file: filename of the second static image
+#   String image_3_file: filename of the third static image
+#   Tuple inspection_results: (shapes_to_draw, failed_inspections) from get_inspection
+#   String json_file: file name of the json file the results came from
+# Returns: N/A
+def gui(image_1_file, image_2_file, image_3_file, inspection_results, json_file):
+    viewer = InspectionViewer(image_1_file, image_2_file, image_3_file)
+    viewer.set_inspection(inspection_results, json_file)
+    viewer.run()
 
 
 # Method: main
@@ -445,31 +909,53 @@ def gui(image_1_file, image_2_file, image_3_file, inspection_results, json_file)
 # Returns: N/A
 def main():
 
-    # Do nothing until the TCP message is initially sent
-    while data is None:
-        looping = True
+    Latency_Trace.tracer.enabled = TRACE_FILE is not None
 
-    # TODO: Make sure this gets the data from the TCP message properly
-    system_name = str(data)
+    # Watch the shape files for changes saved from Shape_Setup.py
+    shape_cache.start()
+    live_shape_cache.start()
+
+    # Index the inspection files in the directory (or the mirror of it) and keep the index up to date. The listeners
+    # are added once the files already there are indexed, so only new files get thumbnails, and each new file's
+    # thumbnails are started before the pipeline loads it.
+    thumbnail_service.start()
+    start_watcher()
+    watcher.add_listener(thumbnail_service.submit)
+    watcher.add_listener(pipeline.wake)
+
+    # Listen for the stations and wake the viewer whenever one of them sends a message
+    trigger_server.add_listener(wake_viewer)
+    trigger_server.start()
+
+    # Do nothing until the TCP message is initially sent
+    system_name = trigger_server.wait_for_message()
     # system_name = 'RHF122133072454630_YenFeng'
-    # Get the most recent json file from the directory
-    json_files = glob.iglob(directory + '\\' + '*.json')
-    system_json_files = []
-    count = 0
-    for file in json_files:
-        if file.__contains__(system_name):
-            system_json_files.insert(count, file)
-            count = count + 1
-            print(file + '\n')
-    latest_json = max(system_json_files, key=os.path.getctime)
+    # Get the most recent json file from the directory, waiting for one if the system has none yet
+    latest_json = watcher.get_latest(system_name)
+    while latest_json is None:
+        watcher.new_file_event.wait(1)
+        watcher.new_file_event.clear()
+        latest_json = watcher.get_latest(system_name)
     file_name = latest_json  # File name of the initial json file
+    Latency_Trace.tracer.bind_pending(file_name)  # the TCP message that led to this file
+    thumbnail_service.submit(file_name)
+    inspection_results = get_inspection(file_name, report_shapes=True)
+    pipeline.prepare_images(inspection_results[1])
+
+    # Load the files that arrive from now on in the background, waking the viewer when each one is ready
+    pipeline.set_systems([system_name])
+    pipeline.mark_loaded(system_name, file_name)
+    pipeline.add_listener(wake_viewer)
+    pipeline.start()
 
     # TODO: Change these image files to the static image files to be used (Delete 2 and 3 to use a collage)
     image_1_file = "IP_Image_1.png"  # Image file to display on the GUI
     image_2_file = "IP_Image_1.png"
     image_3_file = "IP_Image_1.png"
 
-    gui(image_1_file, image_2_file, image_3_file, get_inspection(file_name), file_name)
+    gui(image_1_file, image_2_file, image_3_file, inspection_results, file_name)
+    stop_watcher()
+    thumbnail_service.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,393 @@
+# Author: Tyler Brunette
+# Company: Indicon Corporation
+
+import math
+import os
+import time
+import pygame
+import Font_Cache
+import Image_Cache
+import Indicon_Inspection_Visuals as Visuals
+import Latency_Trace
+
+
+# Systems shown on the dashboard, a station that sends a system name not in this list gets a tile added for it if the
+# system has inspection files (or a folder) in the inspection folder
+SYSTEMS = ['RHF122133072454630_YenFeng']  # TODO: Names of the inspection systems to monitor
+MAX_TILES = 16  # TODO: Most tiles the dashboard shows, stations can't add systems past it
+tile_live_image_scale = 0.05  # TODO: Scale factor of the live images in each tile's failure panel
+
+
+# Method: is_known_system
+# Purpose: checks whether a system named in a TCP message may get a tile, so a station sending anything else can't fill
+#          the dashboard with empty tiles
+# Parameters:
+#   String system_name: system name from the message
+# Returns:
+#   Bool known: whether the system is in SYSTEMS or has inspection files or a folder in the inspection folder
+def is_known_system(system_name):
+    if system_name in SYSTEMS:
+        return True
+    if system_name in ('.', '..') or os.path.basename(system_name) != system_name:
+        return False
+    return (os.path.isdir(os.path.join(Visuals.local_directory, system_name))
+            or len(Visuals.watcher.get_files(system_name)) > 0)
+
+
+# Class: SystemTile
+# Purpose: One system's area of the dashboard: its name, the static images with the inspection's shapes, and a
+#          failure panel that rotates through the failed inspections like the single-system viewer does
+# Parameters:
+#   String system_name: name of the system
+#   Rect rect: area of the dashboard window the tile is drawn in
+# Returns: N/A
+class SystemTile:
+
+    # Method: __init__
+    # Purpose: Initializes a SystemTile object
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, system_name, rect):
+        self.system_name = system_name
+        self.shapes_to_draw = []
+        self.failed_inspections = []
+        self.json_file = None
+        self.next_rotation = 0  # time (ms) the next failed inspection is displayed
+        self.index = 0  # index of the next failed inspection to display
+        self.first_flip_pending = False  # whether the current inspection has not been shown on the display yet
+        self.set_rect(rect)
+
+    # Method: set_rect
+    # Purpose: moves the tile to a new area of the window
+    # Parameters:
+    #   Rect rect: area of the dashboard window the tile is drawn in
+    # Returns: N/A
+    def set_rect(self, rect):
+        self.rect = rect
+        self.header_height = 26
+        static_width = int(rect.width * 0.6)
+        self.static_rect = pygame.Rect(rect.left + 4, rect.top + self.header_height, static_width - 8,
+                                       rect.height - self.header_height - 4)
+        self.panel_rect = pygame.Rect(rect.left + static_width, rect.top + self.header_height,
+                                      rect.width - static_width - 4, rect.height - self.header_height - 4)
+
+    # Method: set_inspection
+    # Purpose: replaces the tile's inspection with one finished by the pipeline
+    # Parameters:
+    #   InspectionResult result: finished inspection from the pipeline
+    # Returns: N/A
+    def set_inspection(self, result):
+        # Failed inspections that didn't change keep their decoded images, and listeners are told what changed
+        shapes_to_draw, failed_inspections = result.get_results()
+        diff = Visuals.inspection_differ.update(self.system_name, result.json_file, shapes_to_draw, failed_inspections)
+        self.shapes_to_draw = diff.shapes_to_draw
+        self.failed_inspections = diff.failed_inspections
+        self.json_file = result.json_file
+        self.next_rotation = pygame.time.get_ticks()
+        self.index = 0
+        self.first_flip_pending = True
+
+    # Method: draw
+    # Purpose: draws the header, static images and shapes of the tile
+    # Parameters:
+    #   Surface screen: surface to draw the tile on
+    #   Array static_layout: (image, x offset, y offset, scale) of each static image, relative to the static area
+    #   Tuple background: color of the tile background
+    # Returns: N/A
+    def draw(self, screen, static_layout, background):
+        screen.set_clip(self.rect)
+        pygame.draw.rect(screen, background, self.rect)
+
+        # Header: system name, then red with the number of failures or green when everything passed
+        header_color = (0, 255, 0)
+        status = "PASS"
+        if self.json_file is None:
+            header_color = (220, 220, 225)
+            status = "waiting"
+        elif len(self.failed_inspections) > 0:
+            header_color = (255, 0, 0)
+            status = str(len(self.failed_inspections)) + " failed"
+        header = Font_Cache.render_text(self.system_name + "  " + status, 18, header_color)
+        screen.blit(header, (self.rect.left + 4, self.rect.top + 4))
+
+        screen.set_clip(self.static_rect)
+        for image, x, y, scale in static_layout:
+            screen.blit(image, (self.static_rect.left + x, self.static_rect.top + y))
+        # Shapes on images that don't exist are drawn relative to the static area, like the viewer does
+        image_positions = {str(slot + 1): (x, y, scale) for slot, (image, x, y, scale) in enumerate(static_layout)}
+        Visuals.draw_shapes_on_images(screen, self.shapes_to_draw, image_positions, self.static_rect.left,
+                                      self.static_rect.top)
+        screen.set_clip(None)
+
+    # Method: draw_failed_inspection
+    # Purpose: draws the next failed inspection (name, live image and shape) in the tile's failure panel
+    # Parameters:
+    #   Surface screen: surface to draw the panel on
+    #   Tuple background: color of the tile background
+    # Returns: N/A
+    def draw_failed_inspection(self, screen, background):
+        failed_inspection = self.failed_inspections[self.index]
+        screen.set_clip(self.panel_rect)
+        pygame.draw.rect(screen, background, self.panel_rect)
+        label = Font_Cache.render_text(failed_inspection.inspection_name + " (" + str(self.index + 1) + "/" +
+                                       str(len(self.failed_inspections)) + ")", 16, (255, 0, 0))
+        screen.blit(label, self.panel_rect.topleft)
+        image_y = self.panel_rect.top + label.get_height() + 2
+        failed_inspection.display_image(screen, self.panel_rect.left, image_y, tile_live_image_scale)
+        failed_inspection.draw_shape(screen, self.panel_rect.left, image_y, tile_live_image_scale)
+        screen.set_clip(None)
+        self.index = (self.index + 1) % len(self.failed_inspections)
+
+
+# Class: InspectionDashboard
+# Purpose: One pygame window that monitors many inspection systems at once, one tile per system. Every tile shares the
+#          viewer's file watcher, background pipeline, shape libraries and image caches, so adding a system adds a
+#          tile instead of another process polling the share.
+# Parameters:
+#   Array system_names: names of the systems to monitor
+#   String image_1_file: filename of the first static image
+#   String image_2_file: filename of the second static image
+#   String image_3_file: filename of the third static image
+# Returns: N/A
+class InspectionDashboard:
+
+    # Method: __init__
+    # Purpose: Initializes the pygame window and the tiles
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, system_names, image_1_file, image_2_file, image_3_file):
+        pygame.init()
+        size = (1920,1020)  # Size of the window
+        self.screen = pygame.display.set_mode(size)
+        pygame.display.set_caption("Indicon Inspection Dashboard")
+
+        self.background = (51,51,51)  # Dark Gray
+        self.tile_background = (35,35,35)  # Darker Gray
+        self.static_files = [image_1_file, image_2_file, image_3_file]
+        self.static_images = [Image_Cache.static_image_cache.get(image_file) for image_file in self.static_files]
+        self.static_layout = []  # (image, x offset, y offset, scale) of each static image within a tile
+
+        self.clock = pygame.time.Clock()
+        self.active_fps = 60  # frame rate while something is changing on the screen
+        self.idle_timeout = 500  # longest time (ms) to sleep between frames while nothing is changing
+        self.idle_delay = 1000  # time (ms) without changes or events before the dashboard goes idle
+        self.carousel_interval = 190 * 1000 // 60  # time (ms) each failed inspection is displayed
+        self.last_activity = 0  # time (ms) of the last event or change
+        self.dirty_rects = []  # areas of the screen that have changed since the display was last updated
+
+        self.tiles = []
+        for system_name in system_names:
+            self.tiles.append(SystemTile(system_name, self.screen.get_rect()))
+        self.layout_tiles()
+        self.running = False
+
+    # Method: layout_tiles
+    # Purpose: arranges the tiles in a grid that fills the window and scales the static images to fit a tile
+    # Parameters: N/A
+    # Returns: N/A
+    def layout_tiles(self):
+        if len(self.tiles) == 0:
+            return
+        columns = math.ceil(math.sqrt(len(self.tiles)))
+        rows = math.ceil(len(self.tiles) / columns)
+        tile_width = self.screen.get_width() // columns
+        tile_height = self.screen.get_height() // rows
+        for index, tile in enumerate(self.tiles):
+            tile.set_rect(pygame.Rect((index % columns) * tile_width + 2, (index // columns) * tile_height + 2,
+                                      tile_width - 4, tile_height - 4))
+
+        # Every tile is the same size, so the static images are scaled once for all of them (stacked like the viewer)
+        static_rect = self.tiles[0].static_rect
+        slot_height = static_rect.height // len(self.static_images)
+        self.static_layout = []
+        for slot, image in enumerate(self.static_images):
+            scale = min(static_rect.width / image.get_width(), slot_height / image.get_height())
+            scaled_image = Image_Cache.static_image_cache.get(self.static_files[slot], scale)
+            self.static_layout.append((scaled_image, 0, slot * slot_height, scale))
+
+        self.draw_all()
+
+    # Method: add_system
+    # Purpose: adds a tile for a system and starts loading its inspections
+    # Parameters:
+    #   String system_name: name of the system
+    # Returns: N/A
+    def add_system(self, system_name):
+        self.tiles.append(SystemTile(system_name, self.screen.get_rect()))
+        Visuals.pipeline.set_systems([tile.system_name for tile in self.tiles])
+        self.layout_tiles()
+
+    # Method: draw_all
+    # Purpose: redraws every tile
+    # Parameters: N/A
+    # Returns: N/A
+    def draw_all(self):
+        self.screen.fill(self.background)
+        for tile in self.tiles:
+            self.draw_tile(tile)
+        self.dirty_rects = [self.screen.get_rect()]
+
+    # Method: draw_tile
+    # Purpose: redraws one tile and restarts its failure panel
+    # Parameters:
+    #   SystemTile tile: tile to draw
+    # Returns: N/A
+    def draw_tile(self, tile):
+        tile.draw(self.screen, self.static_layout, self.tile_background)
+        tile.next_rotation = pygame.time.get_ticks()
+        self.dirty_rects.append(tile.rect)
+
+    # Method: check_for_new_files
+    # Purpose: adds tiles for new systems and displays every inspection the pipeline has finished
+    # Parameters: N/A
+    # Returns: N/A
+    def check_for_new_files(self):
+        Visuals.pipeline.apply_retried_images()
+        for message in dict.fromkeys(Visuals.trigger_server.get_messages()):
+            if message in [tile.system_name for tile in self.tiles]:
+                continue
+            if len(self.tiles) >= MAX_TILES:
+                print("No tile added for " + message + ", the dashboard already has " + str(MAX_TILES))
+            elif not is_known_system(message):
+                print("No tile added for unknown system " + message)
+            else:
+                self.add_system(message)
+
+        for tile in self.tiles:
+            result = Visuals.pipeline.get_ready(tile.system_name)
+            if result is not None and result.json_file != tile.json_file:
+                print(tile.system_name + ": " + result.json_file)
+                Latency_Trace.tracer.bind_pending(result.json_file)
+                tile.set_inspection(result)
+                self.draw_tile(tile)
+
+    # Method: rotate_failures
+    # Purpose: draws the next failed inspection of every tile whose failure panel is due to rotate
+    # Parameters: N/A
+    # Returns: N/A
+    def rotate_failures(self):
+        now = pygame.time.get_ticks()
+        for tile in self.tiles:
+            if len(tile.failed_inspections) > 0 and now >= tile.next_rotation:
+                tile.draw_failed_inspection(self.screen, self.tile_background)
+                tile.next_rotation = now + self.carousel_interval
+                self.dirty_rects.append(tile.panel_rect)
+
+    # Method: update_display
+    # Purpose: updates only the areas of the window that have changed since the last update
+    # Parameters: N/A
+    # Returns: N/A
+    def update_display(self):
+        if len(self.dirty_rects) == 0:
+            return
+        pending_files = [tile.json_file for tile in self.tiles if tile.first_flip_pending]
+        with Latency_Trace.tracer.span('first_flip' if len(pending_files) > 0 else 'update',
+                                       pending_files[0] if len(pending_files) == 1 else None):
+            pygame.display.update(self.dirty_rects)
+        if len(pending_files) > 1 and Latency_Trace.tracer.enabled:
+            # One flip showed several inspections, give each of them its own end of trace
+            now = time.perf_counter()
+            for json_file in pending_files[1:]:
+                Latency_Trace.tracer.record('first_flip', now, now, json_file)
+        for tile in self.tiles:
+            tile.first_flip_pending = False
+        self.dirty_rects = []
+        self.last_activity = pygame.time.get_ticks()
+
+    # Method: get_events
+    # Purpose: gets the user events, running at full frame rate while the screen is changing and sleeping until the
+    #          next event, carousel rotation or idle timeout while it isn't
+    # Parameters: N/A
+    # Returns:
+    #   Array events: pygame events that have arrived
+    def get_events(self):
+        now = pygame.time.get_ticks()
+        if now - self.last_activity < self.idle_delay:
+            self.clock.tick(self.active_fps)
+            return pygame.event.get()
+
+        timeout = self.idle_timeout
+        for tile in self.tiles:
+            if len(tile.failed_inspections) > 0:
+                timeout = max(1, min(timeout, tile.next_rotation - now))
+        event = pygame.event.wait(timeout)
+        self.clock.tick()
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event] + pygame.event.get()
+
+    # Method: run
+    # Purpose: runs the event loop until the user closes the window
+    # Parameters: N/A
+    # Returns: N/A
+    def run(self):
+        self.running = True
+        while self.running:
+            for event in self.get_events():
+                self.last_activity = pygame.time.get_ticks()
+                if event.type == pygame.QUIT:
+                    self.running = False
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    self.dirty_rects.append(self.screen.get_rect())
+
+            self.check_for_new_files()
+            self.rotate_failures()
+            self.update_display()
+
+        print("Live image cache: " + str(Visuals.live_image_cache.stats()))
+        print("Static image cache: " + str(Image_Cache.static_image_cache.stats()))
+        print("Thumbnails: " + str(Visuals.thumbnail_service.stats()))
+        if Visuals.share_mirror is not None:
+            print("Share mirror: " + str(Visuals.share_mirror.stats()))
+        for client_stats in Visuals.trigger_server.stats():
+            print("Trigger client: " + str(client_stats))
+        if Visuals.TRACE_FILE is not None:
+            Latency_Trace.tracer.export(Visuals.TRACE_FILE)
+            for name, stage_summary in Latency_Trace.tracer.summary().items():
+                print("Latency " + name + ": " + str(stage_summary))
+        pygame.quit()
+
+
+# Method: main
+# Purpose: Starts the dashboard with every system in SYSTEMS (setup is shared with Indicon_Inspection_Visuals.py)
+# Parameters: N/A
+# Returns: N/A
+def main():
+
+    Latency_Trace.tracer.enabled = Visuals.TRACE_FILE is not None
+
+    # Watch the shape files for changes saved from Shape_Setup.py
+    Visuals.shape_cache.start()
+    Visuals.live_shape_cache.start()
+
+    # One watcher indexes the share (or the mirror of it) for every system, thumbnails are made at the tile scale for
+    # the files that arrive once the files already there are indexed
+    Visuals.thumbnail_service.scales = [tile_live_image_scale]
+    Visuals.thumbnail_service.start()
+    Visuals.start_watcher()
+    Visuals.watcher.add_listener(Visuals.thumbnail_service.submit)
+    Visuals.watcher.add_listener(Visuals.pipeline.wake)
+
+    # Stations only need to connect to add a system that isn't in SYSTEMS (if it has files, see is_known_system)
+    Visuals.trigger_server.add_listener(Visuals.wake_viewer)
+    Visuals.trigger_server.start()
+
+    # TODO: Change these image files to the static image files to be used
+    image_1_file = "IP_Image_1.png"  # Image file to display in each tile
+    image_2_file = "IP_Image_1.png"
+    image_3_file = "IP_Image_1.png"
+    dashboard = InspectionDashboard(SYSTEMS, image_1_file, image_2_file, image_3_file)
+
+    # One pipeline thread loads the newest file of every system, decoding live images at the tile scale
+    Visuals.pipeline.image_scales = [tile_live_image_scale]
+    Visuals.pipeline.set_systems(SYSTEMS)
+    Visuals.pipeline.add_listener(Visuals.wake_viewer)
+    Visuals.pipeline.start()
+
+    dashboard.run()
+    Visuals.stop_watcher()
+    Visuals.thumbnail_service.stop()
+
+
+if __name__ == "__main__":
+    main()
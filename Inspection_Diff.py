@@ -0,0 +1,273 @@
+# Author: Tyler Brunette
+# Company: Indicon Corporation
+
+import threading
+import Shape_Store
+
+
+# Method: get_shape_identity
+# Purpose: gets what identifies a drawn shape between inspections (its shape key and where it is drawn, but not its
+#          color, which comes from the inspection result)
+# Parameters:
+#   ShapeToDraw shape: shape from get_inspection
+# Returns:
+#   Tuple identity: hashable identity of the shape
+def get_shape_identity(shape):
+    return (shape.shape_key, shape.image, shape.name, shape.shape, shape.display_name, shape.x, shape.y, shape.width,
+            shape.height)
+
+
+# Method: get_store_identities
+# Purpose: gets the identity of every shape of a ShapeStore (the same values get_shape_identity uses)
+# Parameters:
+#   ShapeStore store: shapes from get_inspection
+# Returns:
+#   Iterator identities: hashable identity of each shape, in order
+def get_store_identities(store):
+    strings = store.strings.strings
+    return zip([strings[number] for number in store.key.tolist()],
+               [strings[number] for number in store.image.tolist()],
+               [strings[number] for number in store.name.tolist()], store.shape.tolist(),
+               store.display_name.tolist(), store.x.tolist(), store.y.tolist(), store.width.tolist(),
+               store.height.tolist())
+
+
+# Method: get_failure_identity
+# Purpose: gets what identifies a failed inspection between inspections (the same inspection failing the same way on
+#          the same shape). The live image file is left out, it is different for every part, so a failure that repeats
+#          on the next part is matched and only its image is refreshed.
+# Parameters:
+#   FailedInspection failure: failed inspection from get_inspection
+# Returns:
+#   Tuple identity: hashable identity of the failed inspection
+def get_failure_identity(failure):
+    shape = failure.shape_to_draw
+    return (failure.inspection_name, tuple(failure.keys), tuple(failure.values), shape['key'], shape['image'],
+            shape['x'], shape['y'], shape['width'], shape['height'])
+
+
+# Class: InspectionDiff
+# Purpose: Changes from one inspection of a system to the next. Shapes are matched by shape key (and position) and are
+#          changed when their result code (color) is different. Failed inspections are matched by everything their
+#          failure panel shows except the live image, and are refreshed when only the image is different.
+#          shapes_to_draw and failed_inspections are the new inspection's results with the previous inspection's
+#          objects kept wherever nothing changed. When the shapes are a ShapeStore (get_inspection with numpy), the
+#          shape changes are positions in the stores instead of objects, and if only colors changed the previous
+#          store is kept with its color column updated.
+# Parameters:
+#   String system_name: system the inspections came from
+#   String json_file: file name of the new inspection
+#   String previous_json_file: file name of the inspection it was compared to (None if it is the system's first)
+# Returns: N/A
+class InspectionDiff:
+
+    # Method: __init__
+    # Purpose: Initializes an empty InspectionDiff object (filled in by diff_inspections)
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, system_name, json_file, previous_json_file):
+        self.system_name = system_name
+        self.json_file = json_file
+        self.previous_json_file = previous_json_file
+        self.shapes_to_draw = []  # every shape of the new inspection, unchanged ones are the previous objects
+        self.failed_inspections = []  # every failed inspection of the new inspection, same as shapes_to_draw
+        self.added_shapes = []  # shapes that weren't in the previous inspection
+        self.removed_shapes = []  # shapes of the previous inspection that aren't in the new one
+        self.changed_shapes = []  # (previous shape, new shape) of shapes whose result changed
+        self.previous_positions = []  # position in the previous shapes of each shape (-1 for added shapes)
+        self.added_failures = []  # failed inspections that weren't in the previous inspection
+        self.removed_failures = []  # failed inspections of the previous inspection that aren't in the new one
+        self.refreshed_failures = []  # (previous failure, new failure) of failed inspections with a new live image
+
+    # Method: shapes_changed
+    # Purpose: checks whether any shape was added, removed or changed
+    # Parameters: N/A
+    # Returns:
+    #   Bool changed: whether the shapes to draw are different
+    def shapes_changed(self):
+        return len(self.added_shapes) > 0 or len(self.removed_shapes) > 0 or len(self.changed_shapes) > 0
+
+    # Method: failures_changed
+    # Purpose: checks whether any failed inspection was added or removed
+    # Parameters: N/A
+    # Returns:
+    #   Bool changed: whether the failure panels are different
+    def failures_changed(self):
+        return len(self.added_failures) > 0 or len(self.removed_failures) > 0
+
+    # Method: summary
+    # Purpose: gets the number of each kind of change (ex: for a log line)
+    # Parameters: N/A
+    # Returns:
+    #   Dict summary: change counts
+    def summary(self):
+        return {'system': self.system_name, 'json_file': self.json_file, 'shapes': len(self.shapes_to_draw),
+                'added_shapes': len(self.added_shapes), 'removed_shapes': len(self.removed_shapes),
+                'changed_shapes': len(self.changed_shapes), 'failures': len(self.failed_inspections),
+                'added_failures': len(self.added_failures), 'removed_failures': len(self.removed_failures),
+                'refreshed_failures': len(self.refreshed_failures)}
+
+
+# Method: diff_inspections
+# Purpose: compares an inspection to the one before it
+# Parameters:
+#   InspectionDiff diff: empty diff to fill in
+#   Array previous_shapes: ShapeToDraw objects (or ShapeStore) of the previous inspection
+#   Array previous_failures: FailedInspection objects of the previous inspection
+#   Array shapes_to_draw: ShapeToDraw objects (or ShapeStore) of the new inspection
+#   Array failed_inspections: FailedInspection objects of the new inspection
+# Returns:
+#   InspectionDiff diff: the filled in diff
+def diff_inspections(diff, previous_shapes, previous_failures, shapes_to_draw, failed_inspections):
+    if isinstance(shapes_to_draw, Shape_Store.ShapeStore):
+        diff_shape_stores(diff, previous_shapes, shapes_to_draw)
+    else:
+        diff_shape_lists(diff, previous_shapes, shapes_to_draw)
+
+    previous = {}
+    for failure in previous_failures:
+        previous.setdefault(get_failure_identity(failure), []).append(failure)
+    for failure in failed_inspections:
+        matches = previous.get(get_failure_identity(failure))
+        if not matches:
+            diff.added_failures.append(failure)
+            diff.failed_inspections.append(failure)
+            continue
+        previous_failure = matches.pop(0)
+        if previous_failure.image_file == failure.image_file:
+            diff.failed_inspections.append(previous_failure)  # keeps its decoded image and drawn panel
+        else:
+            # The same failure on a new part, the new object already has the new image decoded by the pipeline
+            failure.drawable_shape = previous_failure.drawable_shape
+            diff.refreshed_failures.append((previous_failure, failure))
+            diff.failed_inspections.append(failure)
+    for matches in previous.values():
+        diff.removed_failures.extend(matches)
+    return diff
+
+
+# Method: diff_shape_lists
+# Purpose: compares the ShapeToDraw objects of an inspection to the ones before it (see diff_inspections)
+# Parameters:
+#   InspectionDiff diff: diff to fill in
+#   Array previous_shapes: ShapeToDraw objects of the previous inspection
+#   Array shapes_to_draw: ShapeToDraw objects of the new inspection
+# Returns: N/A
+def diff_shape_lists(diff, previous_shapes, shapes_to_draw):
+    # The same shape can be drawn more than once (ex: two inspections with the same key), so each identity keeps a
+    # list and the nth new copy is matched to the nth previous copy
+    previous = {}
+    for position, shape in enumerate(previous_shapes):
+        previous.setdefault(get_shape_identity(shape), []).append((position, shape))
+    for shape in shapes_to_draw:
+        matches = previous.get(get_shape_identity(shape))
+        if not matches:
+            diff.added_shapes.append(shape)
+            diff.shapes_to_draw.append(shape)
+            diff.previous_positions.append(-1)
+            continue
+        position, previous_shape = matches.pop(0)
+        diff.previous_positions.append(position)
+        if previous_shape.color == shape.color:
+            diff.shapes_to_draw.append(previous_shape)
+        else:
+            diff.changed_shapes.append((previous_shape, shape))
+            diff.shapes_to_draw.append(shape)
+    for matches in previous.values():
+        diff.removed_shapes.extend(shape for position, shape in matches)
+
+
+# Method: diff_shape_stores
+# Purpose: compares the shapes of an inspection to the ones before it when they are ShapeStores (see
+#          diff_inspections), filling in positions instead of objects: added_shapes are positions in the new store,
+#          removed_shapes positions in the previous store and changed_shapes (previous position, new position)
+# Parameters:
+#   InspectionDiff diff: diff to fill in
+#   ShapeStore previous_shapes: shapes of the previous inspection (an empty list if there wasn't one)
+#   ShapeStore shapes_to_draw: shapes of the new inspection
+# Returns: N/A
+def diff_shape_stores(diff, previous_shapes, shapes_to_draw):
+    if not isinstance(previous_shapes, Shape_Store.ShapeStore):
+        diff.shapes_to_draw = shapes_to_draw
+        diff.added_shapes = list(range(len(shapes_to_draw)))
+        diff.removed_shapes = list(range(len(previous_shapes)))
+        diff.previous_positions = [-1] * len(shapes_to_draw)
+        return
+
+    # The usual case: the same inspections matched the same shapes of the same library and only results changed, so
+    # the previous store is kept and only its color column is updated
+    identity_columns = ('key', 'image', 'name', 'shape', 'display_name', 'x', 'y', 'width', 'height')
+    if previous_shapes.strings is shapes_to_draw.strings and len(previous_shapes) == len(shapes_to_draw) and all(
+            Shape_Store.numpy.array_equal(getattr(previous_shapes, column), getattr(shapes_to_draw, column))
+            for column in identity_columns):
+        changed = Shape_Store.numpy.flatnonzero(previous_shapes.color != shapes_to_draw.color)
+        previous_shapes.color[changed] = shapes_to_draw.color[changed]
+        diff.shapes_to_draw = previous_shapes
+        diff.changed_shapes = [(position, position) for position in changed.tolist()]
+        diff.previous_positions = list(range(len(shapes_to_draw)))
+        return
+
+    # Otherwise shapes are matched like diff_shape_lists does, nth copy to nth copy
+    previous = {}
+    for position, identity in enumerate(get_store_identities(previous_shapes)):
+        previous.setdefault(identity, []).append(position)
+    previous_colors = previous_shapes.color.tolist()
+    colors = shapes_to_draw.color.tolist()
+    for position, identity in enumerate(get_store_identities(shapes_to_draw)):
+        matches = previous.get(identity)
+        if not matches:
+            diff.added_shapes.append(position)
+            diff.previous_positions.append(-1)
+            continue
+        previous_position = matches.pop(0)
+        diff.previous_positions.append(previous_position)
+        if previous_colors[previous_position] != colors[position]:
+            diff.changed_shapes.append((previous_position, position))
+    for matches in previous.values():
+        diff.removed_shapes.extend(matches)
+    diff.shapes_to_draw = shapes_to_draw
+
+
+# Class: InspectionDiffer
+# Purpose: Remembers the last inspection of each system and compares every new one to it, passing the changes on to
+#          listeners (ex: logging or statistics) so they don't have to compare whole inspections themselves
+# Parameters: N/A
+# Returns: N/A
+class InspectionDiffer:
+
+    # Method: __init__
+    # Purpose: Initializes an InspectionDiffer object
+    # Parameters: N/A
+    # Returns: N/A
+    def __init__(self):
+        self.previous = {}  # system name -> (json file, shapes_to_draw, failed_inspections) of its last inspection
+        self.listeners = []  # functions called with every InspectionDiff
+        self.lock = threading.Lock()
+
+    # Method: add_listener
+    # Purpose: registers a function to call with the changes of every new inspection (called on the thread that
+    #          called update, the viewer's main thread)
+    # Parameters:
+    #   Function listener: function that takes an InspectionDiff
+    # Returns: N/A
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    # Method: update
+    # Purpose: compares a system's new inspection to its last one, remembers it and tells the listeners
+    # Parameters:
+    #   String system_name: system the inspection came from
+    #   String json_file: file name of the inspection
+    #   Array shapes_to_draw: ShapeToDraw objects (or ShapeStore) from get_inspection
+    #   Array failed_inspections: FailedInspection objects from get_inspection
+    # Returns:
+    #   InspectionDiff diff: changes from the system's last inspection
+    def update(self, system_name, json_file, shapes_to_draw, failed_inspections):
+        with self.lock:
+            previous_json_file, previous_shapes, previous_failures = self.previous.get(system_name, (None, [], []))
+            diff = InspectionDiff(system_name, json_file, previous_json_file)
+            diff_inspections(diff, previous_shapes, previous_failures, shapes_to_draw, failed_inspections)
+            self.previous[system_name] = (json_file, diff.shapes_to_draw, diff.failed_inspections)
+        for listener in self.listeners:
+            listener(diff)
+        return diff
@@ -0,0 +1,290 @@
+# Author: Tyler Brunette
+# Company: Indicon Corporation
+
+# Keeps a local SQLite database of every inspection file so the history can be searched without opening the files.
+# Index a folder tree (only new and changed files are read):  python Inspection_Index.py index D:\Images\Left
+# Count failures per shape key:  python Inspection_Index.py failures --system System00 --since 2022-04-28
+#                                                                   --until 2022-04-29T12:00
+
+import argparse
+import concurrent.futures
+import datetime
+import os
+import re
+import sqlite3
+import time
+import Inspection_Parser
+import Inspection_Watcher
+import Shape_Library
+
+DATABASE = "inspection_index.db"  # TODO: Location of the index database (keep it on a local disk, not the share)
+
+# Parts of an inspection file that are indexed (see Inspection_Parser.viewer_fields)
+index_fields = {
+    'Name': True,
+    'Result': True,
+    'BuildData': True,
+    'Timestamp_InspectionStart': True,
+    'Timestamp_InspectionEnd': True,
+    'Cameras': {
+        'Name': True,
+        'ImageLocations': True,
+        'Inspections': {
+            'Name': True,
+            'Result': True,
+            'ResultParameters': True,
+        },
+    },
+}
+
+schema = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    system TEXT,
+    serial TEXT,
+    fgpn TEXT,
+    result TEXT,
+    start_time TEXT,
+    end_time TEXT
+);
+CREATE TABLE IF NOT EXISTS inspections (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    camera TEXT,
+    name TEXT,
+    result TEXT,
+    shape_key TEXT,
+    image_path TEXT
+);
+CREATE INDEX IF NOT EXISTS inspections_file ON inspections(file_id);
+CREATE INDEX IF NOT EXISTS inspections_key ON inspections(shape_key, result);
+CREATE INDEX IF NOT EXISTS files_time ON files(start_time);
+CREATE INDEX IF NOT EXISTS files_system ON files(system);
+"""
+
+FRACTION = re.compile(r'(\.\d{6})\d+')  # fromisoformat only takes up to 6 digits of fractional seconds
+
+
+# Method: to_utc
+# Purpose: converts a timestamp to UTC text, so timestamps from stations in different time zones sort correctly
+# Parameters:
+#   String timestamp: ISO 8601 timestamp (ex: 2022-04-28T14:45:36.1063252-05:00), local time if it has no offset
+# Returns:
+#   String utc: the timestamp in UTC as YYYY-MM-DDTHH:MM:SS.ffffff (None if the timestamp can't be read)
+def to_utc(timestamp):
+    if not timestamp:
+        return None
+    try:
+        moment = datetime.datetime.fromisoformat(FRACTION.sub(r'\1', timestamp.replace('Z', '+00:00')))
+    except ValueError:
+        return None
+    return moment.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')
+
+
+# Method: parse_time
+# Purpose: checks a --since or --until time from the command line (used as its argparse type)
+# Parameters:
+#   String text: ISO 8601 time (ex: 2022-04-28 or 2022-04-28T06:00)
+# Returns:
+#   String text: the same time, if it can be read
+def parse_time(text):
+    if to_utc(text) is None:
+        raise argparse.ArgumentTypeError("not an ISO 8601 time (ex: 2022-04-28T06:00): '" + text + "'")
+    return text
+
+
+# Method: open_database
+# Purpose: opens the index database, creating its tables if they don't exist
+# Parameters:
+#   String file_name: database file
+# Returns:
+#   Connection connection: open database connection
+def open_database(file_name=DATABASE):
+    connection = sqlite3.connect(file_name)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA foreign_keys=ON")
+    connection.executescript(schema)
+    return connection
+
+
+# Method: extract_file
+# Purpose: reads the indexed parts of an inspection file (runs in a worker process)
+# Parameters:
+#   String path: inspection file
+# Returns:
+#   String path: the inspection file
+#   Tuple file_row: (mtime_ns, system, serial, fgpn, result, start_time, end_time), None if the file couldn't be read
+#   Array inspection_rows: (camera, name, result, shape_key, image_path) of each inspection, or the error text
+def extract_file(path):
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+        variables = Inspection_Parser.load_inspection(path, index_fields)
+    except (OSError, ValueError) as error:
+        return path, None, str(error)
+
+    # A file laid out differently (ex: an inspection without a Name) is reported instead of stopping the whole run
+    try:
+        build_data = variables.get('BuildData') or {}
+        file_row = (mtime_ns, variables.get('Name'), build_data.get('SERIALNUMBER'), build_data.get('FGPN'),
+                    variables.get('Result'), to_utc(variables.get('Timestamp_InspectionStart')),
+                    to_utc(variables.get('Timestamp_InspectionEnd')))
+
+        inspection_rows = []
+        for camera in variables.get('Cameras', []):
+            # Same live image the viewer shows for the camera's failures
+            image_path = None
+            for image in camera.get('ImageLocations', []):
+                if image['StorageType'] == 'ID' and image['ImageType'] == 'Png':
+                    image_path = image['FileName']
+            for inspection in camera.get('Inspections', []):
+                shape_key = Shape_Library.get_shape_key(inspection['ResultParameters'])
+                inspection_rows.append((camera.get('Name'), inspection['Name'], inspection['Result'], shape_key,
+                                        image_path))
+    except (KeyError, TypeError, AttributeError) as error:
+        return path, None, "unexpected file layout (" + type(error).__name__ + ": " + str(error) + ")"
+    return path, file_row, inspection_rows
+
+
+# Method: store_file
+# Purpose: replaces the rows of an inspection file in the database (call inside a transaction)
+# Parameters:
+#   Connection connection: open database connection
+#   String path: inspection file
+#   Tuple file_row: see extract_file
+#   Array inspection_rows: see extract_file
+# Returns: N/A
+def store_file(connection, path, file_row, inspection_rows):
+    connection.execute("DELETE FROM files WHERE path = ?", (path,))
+    cursor = connection.execute("INSERT INTO files (path, mtime_ns, system, serial, fgpn, result, start_time, "
+                                "end_time) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (path,) + file_row)
+    file_id = cursor.lastrowid
+    connection.executemany("INSERT INTO inspections (file_id, camera, name, result, shape_key, image_path) "
+                           "VALUES (?, ?, ?, ?, ?, ?)", [(file_id,) + row for row in inspection_rows])
+
+
+# Method: index_folder
+# Purpose: adds new and changed inspection files in a folder tree to the database and removes deleted ones
+# Parameters:
+#   Connection connection: open database connection
+#   String root: folder to index (searched with its subfolders)
+#   Int workers: number of worker processes that read the files
+#   Int batch_size: files written per transaction
+# Returns:
+#   Dict counts: number of files 'indexed', 'unchanged', 'removed' and 'failed'
+def index_folder(connection, root, workers=None, batch_size=500):
+    root = os.path.abspath(root)
+    known = {path: mtime_ns for path, mtime_ns in connection.execute("SELECT path, mtime_ns FROM files")
+             if path.startswith(os.path.join(root, ''))}
+
+    # A file only has to be read again if its modified time has changed since it was indexed
+    paths = []
+    found = set()
+    for path in Inspection_Watcher.find_inspection_files(root):
+        found.add(path)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+        if known.get(path) != mtime_ns:
+            paths.append(path)
+    removed = [path for path in known if path not in found]
+    counts = {'indexed': 0, 'unchanged': len(found) - len(paths), 'removed': len(removed), 'failed': 0}
+
+    with connection:
+        connection.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in removed])
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = 0
+        connection.execute("BEGIN")
+        for path, file_row, inspection_rows in executor.map(extract_file, paths, chunksize=16):
+            if file_row is None:
+                print("Could not index " + path + ": " + inspection_rows)
+                counts['failed'] = counts['failed'] + 1
+                continue
+            store_file(connection, path, file_row, inspection_rows)
+            counts['indexed'] = counts['indexed'] + 1
+            pending = pending + 1
+            if pending >= batch_size:
+                connection.commit()
+                connection.execute("BEGIN")
+                pending = 0
+        connection.commit()
+    return counts
+
+
+# Method: count_failures
+# Purpose: counts failed inspections per shape key
+# Parameters:
+#   Connection connection: open database connection
+#   String system: only count files from this system (None for every system)
+#   String since: only count inspections that started at or after this time (ISO 8601, None for no limit)
+#   String until: only count inspections that started before this time (ISO 8601, None for no limit)
+#   Bool per_system: count each system separately
+#   Int limit: most rows to return
+# Returns:
+#   Array rows: (shape_key, system or None, failures, inspections) sorted by most failures first
+def count_failures(connection, system=None, since=None, until=None, per_system=False, limit=20):
+    conditions = []
+    parameters = []
+    if system is not None:
+        conditions.append("f.system = ?")
+        parameters.append(system)
+    for name, time_text, condition in (('since', since, "f.start_time >= ?"), ('until', until, "f.start_time < ?")):
+        if time_text is None:
+            continue
+        utc = to_utc(time_text)
+        if utc is None:
+            raise ValueError(name + " is not an ISO 8601 time: '" + time_text + "'")
+        conditions.append(condition)
+        parameters.append(utc)
+    where = "WHERE " + " AND ".join(conditions) if len(conditions) > 0 else ""
+    system_column = "f.system" if per_system else "NULL"
+    query = ("SELECT i.shape_key, " + system_column + ", SUM(i.result = 'F') AS failures, COUNT(*) "
+             "FROM inspections i JOIN files f ON f.id = i.file_id " + where +
+             " GROUP BY i.shape_key, " + system_column + " HAVING failures > 0 ORDER BY failures DESC LIMIT ?")
+    return connection.execute(query, parameters + [limit]).fetchall()
+
+
+# Method: main
+# Purpose: runs the index or failures command given on the command line
+# Parameters: N/A
+# Returns: N/A
+def main():
+    parser = argparse.ArgumentParser(description="Index inspection files in SQLite and query their history.")
+    parser.add_argument("--database", default=DATABASE, help="index database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = commands.add_parser("index", help="add new and changed inspection files to the index")
+    index_parser.add_argument("root", help="folder of inspection json files (searched with its subfolders)")
+    index_parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    index_parser.add_argument("--batch", type=int, default=500, help="files written per transaction")
+
+    failures_parser = commands.add_parser("failures", help="count failed inspections per shape key")
+    failures_parser.add_argument("--system", default=None, help="only count this system (ex: System00)")
+    failures_parser.add_argument("--since", type=parse_time, default=None,
+                                 help="start of the time range (ex: 2022-04-28T06:00)")
+    failures_parser.add_argument("--until", type=parse_time, default=None, help="end of the time range")
+    failures_parser.add_argument("--per-system", action="store_true", help="count each system separately")
+    failures_parser.add_argument("--limit", type=int, default=20, help="most shape keys to list")
+    args = parser.parse_args()
+
+    connection = open_database(args.database)
+    if args.command == "index":
+        start_time = time.perf_counter()
+        counts = index_folder(connection, args.root, args.workers, args.batch)
+        seconds = time.perf_counter() - start_time
+        print("Indexed " + str(counts['indexed']) + " files in " + "{:.2f}".format(seconds) + " s (" +
+              str(counts['unchanged']) + " unchanged, " + str(counts['removed']) + " removed, " +
+              str(counts['failed']) + " failed)")
+    else:
+        rows = count_failures(connection, args.system, args.since, args.until, args.per_system, args.limit)
+        print("{:>8} {:>8}  {}".format("Failures", "Total", "Shape key"))
+        for shape_key, system, failures, total in rows:
+            label = shape_key if system is None else system + ": " + shape_key
+            print("{:>8} {:>8}  {}".format(failures, total, label))
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Author: Tyler Brunette
+# Company: Indicon Corporation
+
+import json
+import os
+
+# Parts of an inspection result file the viewer uses. True means the whole value is kept, a dict means the value
+# (an object, or an array of objects) is walked and only the listed keys are kept. Everything else is dropped.
+viewer_fields = {
+    'Result': True,
+    'BuildData': True,
+    'Cameras': {
+        'Name': True,
+        'ImageLocations': True,
+        'Inspections': {
+            'Name': True,
+            'Result': True,
+            'ResultParameters': True,
+        },
+    },
+}
+
+# Parts of an inspection file needed to find its failure images (see get_failure_images)
+failure_image_fields = {
+    'Cameras': {
+        'ImageLocations': True,
+        'Inspections': {
+            'Result': True,
+        },
+    },
+}
+
+
+# Method: select_fields
+# Purpose: copies only the listed parts of an already decoded json value
+# Parameters:
+#   Object value: decoded json value (dict, or list of dicts)
+#   Dict fields: keys to keep (see viewer_fields)
+# Returns:
+#   Object selected: the kept keys, laid out the same as the original value
+def select_fields(value, fields):
+    if isinstance(value, list):
+        return [select_fields(item, fields) for item in value]
+    if not isinstance(value, dict):
+        return value
+    selected = {}
+    for key, key_fields in fields.items():
+        if key in value:
+            if key_fields is True:
+                selected[key] = value[key]
+            else:
+                selected[key] = select_fields(value[key], key_fields)
+    return selected
+
+
+# Method: parse_inspection
+# Purpose: decodes an inspection result json text, keeping only the listed parts of it
+# Parameters:
+#   String text: json text of an inspection result file
+#   Dict fields: keys to keep (see viewer_fields)
+# Returns:
+#   Dict variables: the kept keys, laid out the same as json.load would return them
+def parse_inspection(text, fields=None):
+    if fields is None:
+        fields = viewer_fields
+    # The json module's C decoder builds the whole tree faster than Python code can skip the unused parts of it
+    # (see benchmarks/Parse_Benchmark.py), so the tree is decoded and then trimmed
+    return select_fields(json.loads(text), fields)
+
+
+# Method: load_inspection
+# Purpose: reads an inspection result json file, keeping only the listed parts of it
+# Parameters:
+#   String file_name: inspection result json file
+#   Dict fields: keys to keep (see viewer_fields)
+# Returns:
+#   Dict variables: the kept keys, laid out the same as json.load would return them
+def load_inspection(file_name, fields=None):
+    with open(file_name) as json_file:
+        text = json_file.read()
+    return parse_inspection(text, fields)
+
+
+# Method: get_failure_images
+# Purpose: gets the live image of every camera with a failed inspection in an inspection file (the images the
+#          failure panel shows)
+# Parameters:
+#   String json_file: inspection file
+#   String image_directory: directory the live images are stored in
+# Returns:
+#   Array image_files: file locations of the live images
+def get_failure_images(json_file, image_directory):
+    variables = load_inspection(json_file, failure_image_fields)
+    image_files = []
+    for camera in variables.get('Cameras', []):
+        if not any(inspection['Result'] == 'F' for inspection in camera.get('Inspections', [])):
+            continue
+        for image in camera.get('ImageLocations', []):
+            if image['StorageType'] == 'ID' and image['ImageType'] == 'Png':
+                image_files.append(os.path.join(image_directory, image['FileName']))
+    return image_files
@@ -0,0 +1,245 @@
+# Author: Tyler Brunette
+# Company: Indicon Corporation
+
+import threading
+import pygame
+
+
+# Class: InspectionResult
+# Purpose: An inspection that has been parsed and had its failure images decoded, ready for the render loop to draw
+# Parameters:
+#   String system_name: system the inspection belongs to
+#   String json_file: file name of the json file the results came from
+#   Array shapes_to_draw: Array of ShapeToDraw objects
+#   Array failed_inspections: Array of FailedInspection objects (with their live images already prepared)
+# Returns: N/A
+class InspectionResult:
+
+    # Method: __init__
+    # Purpose: Initializes an InspectionResult object
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, system_name, json_file, shapes_to_draw, failed_inspections):
+        self.system_name = system_name
+        self.json_file = json_file
+        self.shapes_to_draw = shapes_to_draw
+        self.failed_inspections = failed_inspections
+
+    # Method: get_results
+    # Purpose: gets the results in the form returned by get_inspection
+    # Parameters: N/A
+    # Returns:
+    #   Tuple inspection_results: (shapes_to_draw, failed_inspections)
+    def get_results(self):
+        return self.shapes_to_draw, self.failed_inspections
+
+
+# Class: InspectionPipeline
+# Purpose: Does the blocking work for new inspections on a worker thread: finds the newest file for each watched
+#          system, parses it, and decodes and scales its failure images. Finished InspectionResults are handed to the
+#          render loop, which only has to pick them up and draw them.
+# Parameters:
+#   InspectionWatcher watcher: index of the inspection files
+#   Function load_inspection: function that takes a json file name and returns (shapes_to_draw, failed_inspections)
+#   Array image_scales: scale factors to prepare each failure's live image at
+#   Int image_retries: number of times to try loading a live image again (ex: it hadn't finished copying yet)
+# Returns: N/A
+class InspectionPipeline:
+
+    # Method: __init__
+    # Purpose: Initializes an InspectionPipeline object
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, watcher, load_inspection, image_scales, image_retries=5):
+        self.watcher = watcher
+        self.load_inspection = load_inspection
+        self.image_scales = image_scales
+        self.image_retries = image_retries
+        self.missing_images = []  # [failed inspection, scale, tries left] of live images that could not be loaded
+        self.retried_images = []  # (failed inspection, scale, live image) loaded by retry_images, not yet applied
+        self.systems = {}  # watched system name -> json file most recently loaded for it
+        self.ready = {}  # system name -> newest InspectionResult the render loop has not picked up yet
+        self.listeners = []  # functions called with every finished InspectionResult (called on the worker thread)
+        self.lock = threading.Lock()
+        self.wake_event = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    # Method: add_listener
+    # Purpose: registers a function to call with every finished InspectionResult (called on the worker thread)
+    # Parameters:
+    #   Function listener: function that takes an InspectionResult
+    # Returns: N/A
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    # Method: set_systems
+    # Purpose: sets which systems the pipeline loads inspections for
+    # Parameters:
+    #   Array system_names: names of the systems to watch
+    # Returns: N/A
+    def set_systems(self, system_names):
+        with self.lock:
+            self.systems = {name: self.systems.get(name) for name in system_names}
+            self.ready = {name: result for name, result in self.ready.items() if name in self.systems}
+        self.wake()
+
+    # Method: mark_loaded
+    # Purpose: tells the pipeline a file has already been loaded for a system (so it isn't loaded again)
+    # Parameters:
+    #   String system_name: name of the system
+    #   String json_file: file that was loaded
+    # Returns: N/A
+    def mark_loaded(self, system_name, json_file):
+        with self.lock:
+            if system_name in self.systems:
+                self.systems[system_name] = json_file
+
+    # Method: wake
+    # Purpose: makes the worker check for new files now (safe to call from any thread, ex: as a watcher listener)
+    # Parameters:
+    #   String file_name: new inspection file, if one is the reason for the wake up (unused)
+    # Returns: N/A
+    def wake(self, file_name=None):
+        self.wake_event.set()
+
+    # Method: get_ready
+    # Purpose: takes the newest finished inspection for a system, if there is one (called by the render loop)
+    # Parameters:
+    #   String system_name: name of the system
+    # Returns:
+    #   InspectionResult result: finished inspection, or None if nothing new is ready
+    def get_ready(self, system_name):
+        with self.lock:
+            return self.ready.pop(system_name, None)
+
+    # Method: prepare
+    # Purpose: loads the newest file of a system and decodes its failure images
+    # Parameters:
+    #   String system_name: name of the system
+    #   String json_file: file to load
+    # Returns:
+    #   InspectionResult result: finished inspection
+    def prepare(self, system_name, json_file):
+        shapes_to_draw, failed_inspections = self.load_inspection(json_file)
+        self.prepare_images(failed_inspections)
+        return InspectionResult(system_name, json_file, shapes_to_draw, failed_inspections)
+
+    # Method: prepare_images
+    # Purpose: decodes the live images of failed inspections, so the render loop never has to read an image file.
+    #          An image that can't be loaded is recorded as missing (the failure panel is drawn without it) and tried
+    #          again by retry_images.
+    # Parameters:
+    #   Array failed_inspections: FailedInspection objects from load_inspection
+    # Returns: N/A
+    def prepare_images(self, failed_inspections):
+        for failed_inspection in failed_inspections:
+            for scale in self.image_scales:
+                try:
+                    failed_inspection.prepare_image(scale)
+                except (OSError, ValueError, pygame.error) as error:
+                    print("Could not load " + failed_inspection.image_file + ": " + str(error))
+                    failed_inspection.prepared_images[scale] = None
+                    with self.lock:
+                        self.missing_images.append([failed_inspection, scale, self.image_retries])
+
+    # Method: retry_images
+    # Purpose: tries loading the missing live images again. The failed inspections may already be drawn by the render
+    #          loop, so the images that load are only handed over (see apply_retried_images).
+    # Parameters: N/A
+    # Returns: N/A
+    def retry_images(self):
+        with self.lock:
+            missing_images = self.missing_images
+            self.missing_images = []
+        still_missing = []
+        retried_images = []
+        for failed_inspection, scale, tries_left in missing_images:
+            try:
+                retried_images.append((failed_inspection, scale,
+                                       failed_inspection.load_image(scale, wait_for_thumbnail=False)))
+            except (OSError, ValueError, pygame.error):
+                if tries_left > 1:
+                    still_missing.append([failed_inspection, scale, tries_left - 1])
+        with self.lock:
+            self.missing_images = still_missing + self.missing_images
+            self.retried_images.extend(retried_images)
+
+    # Method: apply_retried_images
+    # Purpose: gives the failed inspections the live images retry_images loaded, so their failure panels are drawn
+    #          again the next time they are shown (called by the render loop)
+    # Parameters: N/A
+    # Returns: N/A
+    def apply_retried_images(self):
+        with self.lock:
+            if len(self.retried_images) == 0:
+                return
+            retried_images = self.retried_images
+            self.retried_images = []
+        for failed_inspection, scale, live_image in retried_images:
+            failed_inspection.prepared_images[scale] = live_image
+            failed_inspection.panel = None
+
+    # Method: check_systems
+    # Purpose: loads a new file for every watched system whose newest file hasn't been loaded yet
+    # Parameters: N/A
+    # Returns: N/A
+    def check_systems(self):
+        with self.lock:
+            systems = list(self.systems.items())
+        for system_name, loaded_file in systems:
+            latest_json = self.watcher.get_latest(system_name)
+            if latest_json is None or latest_json == loaded_file:
+                continue
+            with self.lock:
+                self.systems[system_name] = latest_json  # don't retry a file that fails to load
+            try:
+                result = self.prepare(system_name, latest_json)
+            except (OSError, ValueError, KeyError, pygame.error) as error:
+                print("Could not load " + latest_json + ": " + str(error))
+                continue
+            with self.lock:
+                if system_name not in self.systems:
+                    continue  # no longer watched
+                self.ready[system_name] = result
+            for listener in self.listeners:
+                listener(result)
+
+    # Method: start
+    # Purpose: starts the worker thread
+    # Parameters: N/A
+    # Returns: N/A
+    def start(self):
+        if self.thread is not None:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.work, daemon=True)
+        self.thread.start()
+
+    # Method: stop
+    # Purpose: stops the worker thread
+    # Parameters: N/A
+    # Returns: N/A
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    # Method: work
+    # Purpose: loads new inspections whenever woken until stop() is called (runs on the thread from start()), one bad
+    #          file never stops the thread
+    # Parameters: N/A
+    # Returns: N/A
+    def work(self):
+        while not self.stop_event.is_set():
+            self.wake_event.wait(1)
+            self.wake_event.clear()
+            if self.stop_event.is_set():
+                break
+            try:
+                self.check_systems()
+                self.retry_images()
+            except Exception as error:
+                print("Inspection pipeline error: " + repr(error))
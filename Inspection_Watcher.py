@@ -0,0 +1,332 @@
+# Author: Tyler Brunette
+# Company: Indicon Corporation
+
+import bisect
+import os
+import threading
+import time
+import Latency_Trace
+
+# watchdog is optional, it lets the watcher wake up on file system events (inotify on Linux,
+# ReadDirectoryChangesW on Windows) instead of rescanning the directory on a timer
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+
+# Class: InspectionEventHandler
+# Purpose: Passes file system events from watchdog on to an InspectionWatcher
+# Parameters:
+#   InspectionWatcher watcher: watcher to notify
+# Returns: N/A
+class InspectionEventHandler(FileSystemEventHandler):
+
+    # Method: __init__
+    # Purpose: Initializes an InspectionEventHandler object
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, watcher):
+        super().__init__()
+        self.watcher = watcher
+
+    # Method: on_any_event
+    # Purpose: tells the watcher about a created, modified or moved file
+    # Parameters:
+    #   FileSystemEvent event: event from watchdog
+    # Returns: N/A
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        if event.event_type in ('created', 'modified', 'closed'):
+            self.watcher.notify(event.src_path)
+        elif event.event_type == 'moved':
+            self.watcher.notify(event.dest_path)
+
+
+# Class: InspectionWatcher
+# Purpose: Keeps an index of the inspection json files in a directory, sorted by creation time, so the newest file for
+#          a system can be found without scanning the directory. New files are only published once their size has
+#          stopped changing, so a half-written json file is never handed to the parser.
+# Parameters:
+#   String directory: directory the inspection json files are saved to
+#   Float poll_interval: seconds between directory scans when watchdog is not available
+#   Float settle_time: seconds a new file's size must stay the same before it is published
+#   Float rescan_interval: seconds between full scans when watchdog is available (catches missed events on shares)
+# Returns: N/A
+class InspectionWatcher:
+
+    # Method: __init__
+    # Purpose: Initializes an InspectionWatcher object
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, directory, poll_interval=1.0, settle_time=0.5, rescan_interval=60.0):
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.rescan_interval = rescan_interval
+        self.ctimes = {}  # published file path -> creation time
+        self.sorted_files = []  # (creation time, path) of every published file, oldest first
+        self.systems = {}  # system name -> (creation time, path) of its published files, oldest first
+        self.pending = {}  # file path -> (size, time the size was last seen changing) of files still being written
+        self.first_seen = {}  # file path -> time.perf_counter() when a pending file was first noticed
+        self.listeners = []  # functions called with the path of every newly published file
+        self.lock = threading.Lock()
+        self.wake_event = threading.Event()  # set when a file system event arrives
+        self.new_file_event = threading.Event()  # set whenever a file is published
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.observer = None
+        self.scan_count = 0  # number of full directory scans
+
+    # Method: is_inspection_file
+    # Purpose: checks whether a file name is an inspection json file
+    # Parameters:
+    #   String file_name: name or path of the file
+    # Returns:
+    #   Bool is_json: whether the file has a .json extension (any case)
+    @staticmethod
+    def is_inspection_file(file_name):
+        return file_name.lower().endswith('.json')
+
+    # Method: add_listener
+    # Purpose: registers a function to call with the path of every newly published file (called on the watcher thread)
+    # Parameters:
+    #   Function listener: function that takes a file path
+    # Returns: N/A
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    # Method: get_latest
+    # Purpose: gets the newest published inspection file for a system
+    # Parameters:
+    #   String system_name: name the file path must contain
+    # Returns:
+    #   String latest_json: path of the newest matching file, or None if there isn't one
+    def get_latest(self, system_name):
+        with self.lock:
+            system_files = self.systems.get(system_name)
+            if system_files is None:
+                # First request for this system, index it from every file published so far
+                system_files = [entry for entry in self.sorted_files if system_name in entry[1]]
+                self.systems[system_name] = system_files
+            if len(system_files) == 0:
+                return None
+            return system_files[-1][1]
+
+    # Method: get_files
+    # Purpose: gets every published inspection file for a system
+    # Parameters:
+    #   String system_name: name the file path must contain (None for every file)
+    # Returns:
+    #   Array files: file paths, oldest first
+    def get_files(self, system_name=None):
+        with self.lock:
+            return [path for ctime, path in self.sorted_files if system_name is None or system_name in path]
+
+    # Method: notify
+    # Purpose: marks a file as possibly new or changed so it is checked on the next pass
+    # Parameters:
+    #   String path: path of the file
+    # Returns: N/A
+    def notify(self, path):
+        if not self.is_inspection_file(path):
+            return
+        with self.lock:
+            if path not in self.pending and path not in self.ctimes:
+                self.pending[path] = (-1, time.monotonic())
+                self.first_seen[path] = time.perf_counter()
+        self.wake_event.set()
+
+    # Method: scan
+    # Purpose: scans the whole directory, queueing new files and removing deleted ones from the index
+    # Parameters: N/A
+    # Returns: N/A
+    def scan(self):
+        try:
+            with os.scandir(self.directory) as entries:
+                found = set(entry.path for entry in entries
+                            if self.is_inspection_file(entry.name) and entry.is_file())
+        except OSError as error:
+            print("Could not scan " + self.directory + ": " + str(error))
+            return
+        self.scan_count = self.scan_count + 1
+
+        now = time.monotonic()
+        with self.lock:
+            for path in found:
+                if path not in self.ctimes and path not in self.pending:
+                    self.pending[path] = (-1, now)
+                    self.first_seen[path] = time.perf_counter()
+            for path in [path for path in self.ctimes if path not in found]:
+                self.remove(path)
+
+    # Method: remove
+    # Purpose: removes a deleted file from the index (lock must be held)
+    # Parameters:
+    #   String path: path of the file
+    # Returns: N/A
+    def remove(self, path):
+        entry = (self.ctimes.pop(path), path)
+        self.sorted_files.remove(entry)
+        for system_files in self.systems.values():
+            if entry in system_files:
+                system_files.remove(entry)
+
+    # Method: discard
+    # Purpose: removes a file from the index if it is there (ex: a file that was just deleted)
+    # Parameters:
+    #   String path: path of the file
+    # Returns: N/A
+    def discard(self, path):
+        with self.lock:
+            self.pending.pop(path, None)
+            self.first_seen.pop(path, None)
+            if path in self.ctimes:
+                self.remove(path)
+
+    # Method: insert
+    # Purpose: adds a published file to the index (lock must be held)
+    # Parameters:
+    #   String path: path of the file
+    #   Float ctime: creation time the file is sorted by
+    # Returns: N/A
+    def insert(self, path, ctime):
+        entry = (ctime, path)
+        self.ctimes[path] = ctime
+        bisect.insort(self.sorted_files, entry)
+        for system_name, system_files in self.systems.items():
+            if system_name in path:
+                bisect.insort(system_files, entry)
+
+    # Method: publish
+    # Purpose: adds a file that is known to be complete to the index right away, without waiting for it to settle
+    #          (ex: a file that was copied and renamed into place)
+    # Parameters:
+    #   String path: path of the file
+    #   Float ctime: creation time to sort the file by (None for the file's own creation time)
+    # Returns: N/A
+    def publish(self, path, ctime=None):
+        if ctime is None:
+            ctime = os.stat(path).st_ctime
+        with self.lock:
+            self.pending.pop(path, None)
+            self.first_seen.pop(path, None)
+            if path in self.ctimes:
+                return
+            self.insert(path, ctime)
+        for listener in self.listeners:
+            listener(path)
+        self.new_file_event.set()
+
+    # Method: check_pending
+    # Purpose: publishes every pending file whose size has not changed for settle_time seconds
+    # Parameters:
+    #   Bool settled: publish every pending file that isn't empty without waiting for its size to settle
+    # Returns: N/A
+    def check_pending(self, settled=False):
+        now = time.monotonic()
+        published = []
+        with self.lock:
+            for path, (last_size, changed_time) in list(self.pending.items()):
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    del self.pending[path]  # deleted (or renamed) before it finished writing
+                    self.first_seen.pop(path, None)
+                    continue
+                if stat.st_size == 0 or (stat.st_size != last_size and not settled):
+                    self.pending[path] = (stat.st_size, now)
+                elif settled or now - changed_time >= self.settle_time:
+                    del self.pending[path]
+                    first_seen = self.first_seen.pop(path)
+                    if not settled:
+                        Latency_Trace.tracer.record('file_detect', first_seen, time.perf_counter(), path)
+                    self.insert(path, stat.st_ctime)
+                    published.append(path)
+
+        for path in published:
+            for listener in self.listeners:
+                listener(path)
+        if len(published) > 0:
+            self.new_file_event.set()
+
+    # Method: start
+    # Purpose: indexes the files already in the directory, then keeps the index up to date on a separate thread
+    # Parameters: N/A
+    # Returns: N/A
+    def start(self):
+        if self.thread is not None:
+            return
+        self.stop_event.clear()
+        self.scan()
+
+        self.check_pending(settled=True)  # files that are already there have finished writing
+
+        if Observer is not None:
+            try:
+                self.observer = Observer()
+                self.observer.schedule(InspectionEventHandler(self), self.directory, recursive=False)
+                self.observer.start()
+            except OSError as error:
+                print("File events not available for " + self.directory + ", polling instead: " + str(error))
+                self.observer = None
+
+        self.thread = threading.Thread(target=self.watch, daemon=True)
+        self.thread.start()
+
+    # Method: stop
+    # Purpose: stops the thread started by start()
+    # Parameters: N/A
+    # Returns: N/A
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+            self.observer = None
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    # Method: watch
+    # Purpose: keeps the index up to date until stop() is called (runs on the thread from start())
+    # Parameters: N/A
+    # Returns: N/A
+    def watch(self):
+        last_scan = time.monotonic()
+        while not self.stop_event.is_set():
+            # Scan on a timer when polling, or rarely as a safety net when file events are available
+            interval = self.poll_interval if self.observer is None else self.rescan_interval
+            if len(self.pending) > 0:
+                wait_time = self.settle_time / 2
+            else:
+                wait_time = max(0.0, interval - (time.monotonic() - last_scan))
+            self.wake_event.wait(wait_time)
+            self.wake_event.clear()
+            if self.stop_event.is_set():
+                break
+
+            if time.monotonic() - last_scan >= interval:
+                self.scan()
+                last_scan = time.monotonic()
+            self.check_pending()
+
+
+# Method: find_inspection_files
+# Purpose: finds every inspection json file in a folder and its subfolders
+# Parameters:
+#   String root: folder to search
+# Returns:
+#   Array json_files: paths of the inspection files, sorted
+def find_inspection_files(root):
+    json_files = []
+    for folder, folder_names, file_names in os.walk(root):
+        for file_name in file_names:
+            if InspectionWatcher.is_inspection_file(file_name):
+                json_files.append(os.path.join(folder, file_name))
+    json_files.sort()
+    return json_files
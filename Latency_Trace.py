@@ -0,0 +1,154 @@
+# Author: Tyler Brunette
+# Company: Indicon Corporation
+
+import contextlib
+import json
+import math
+import os
+import threading
+import time
+
+
+# Method: percentile
+# Purpose: gets a percentile of a list of numbers (nearest rank)
+# Parameters:
+#   Array values: numbers sorted smallest to largest
+#   Float percent: percentile to get (0-100)
+# Returns:
+#   Float value: the percentile (None if the list is empty)
+def percentile(values, percent):
+    if len(values) == 0:
+        return None
+    rank = max(1, math.ceil(percent / 100 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+# Class: Tracer
+# Purpose: Records timed spans of the stages between a station's TCP message and the result appearing on screen.
+#          Every span carries a correlation ID (the inspection file it belongs to). Spans recorded before the file is
+#          known (such as the TCP message) are kept as pending and given the ID of the next file that is bound.
+#          Spans can be exported as a Chrome/Perfetto trace file with p50/p95/p99 summaries.
+# Parameters:
+#   Bool enabled: whether spans are recorded (when False, span() costs almost nothing)
+#   Int max_spans: most spans kept, the oldest are dropped past this
+#   String end_span: name of the span that ends an inspection's end-to-end time
+# Returns: N/A
+class Tracer:
+
+    # Method: __init__
+    # Purpose: Initializes a Tracer object
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, enabled=False, max_spans=100000, end_span='first_flip'):
+        self.enabled = enabled
+        self.max_spans = max_spans
+        self.end_span = end_span
+        self.spans = []  # [name, correlation ID, start, end, thread name], times from time.perf_counter()
+        self.pending = []  # spans recorded without a correlation ID
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()  # start of the trace
+
+    # Method: record
+    # Purpose: records a span that has already finished
+    # Parameters:
+    #   String name: stage the span measured
+    #   Float start: time.perf_counter() when the stage started
+    #   Float end: time.perf_counter() when the stage ended
+    #   String correlation_id: inspection file the span belongs to (None if it isn't known yet)
+    # Returns: N/A
+    def record(self, name, start, end, correlation_id=None):
+        if not self.enabled:
+            return
+        span = [name, correlation_id, start, end, threading.current_thread().name]
+        with self.lock:
+            if correlation_id is None:
+                self.pending.append(span)
+                if len(self.pending) > self.max_spans:
+                    del self.pending[0]
+            self.spans.append(span)
+            if len(self.spans) > self.max_spans:
+                del self.spans[0]
+
+    # Method: span
+    # Purpose: times the code inside a with block
+    # Parameters:
+    #   String name: stage being measured
+    #   String correlation_id: inspection file the span belongs to (None if it isn't known yet)
+    # Returns:
+    #   Context manager: use as "with tracer.span('parse', file_name):"
+    @contextlib.contextmanager
+    def span(self, name, correlation_id=None):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter(), correlation_id)
+
+    # Method: bind_pending
+    # Purpose: gives every span recorded without a correlation ID the ID of an inspection file
+    # Parameters:
+    #   String correlation_id: inspection file the pending spans led to
+    # Returns: N/A
+    def bind_pending(self, correlation_id):
+        with self.lock:
+            for span in self.pending:
+                span[1] = correlation_id
+            self.pending = []
+
+    # Method: summary
+    # Purpose: gets the count and p50/p95/p99/max of each stage and of the end-to-end time per inspection
+    # Parameters: N/A
+    # Returns:
+    #   Dict summary: stage name -> {'count', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'}
+    def summary(self):
+        with self.lock:
+            spans = [list(span) for span in self.spans]
+
+        durations = {}
+        first_start = {}  # correlation ID -> earliest start of any of its spans
+        end_time = {}  # correlation ID -> end of its first end_span
+        for name, correlation_id, start, end, thread_name in spans:
+            durations.setdefault(name, []).append(end - start)
+            if correlation_id is None:
+                continue
+            if correlation_id not in first_start or start < first_start[correlation_id]:
+                first_start[correlation_id] = start
+            if name == self.end_span and correlation_id not in end_time:
+                end_time[correlation_id] = end
+        durations['end_to_end'] = [end_time[key] - first_start[key] for key in end_time]
+
+        summary = {}
+        for name, values in durations.items():
+            if len(values) == 0:
+                continue
+            values.sort()
+            summary[name] = {'count': len(values),
+                             'p50_ms': percentile(values, 50) * 1000,
+                             'p95_ms': percentile(values, 95) * 1000,
+                             'p99_ms': percentile(values, 99) * 1000,
+                             'max_ms': values[-1] * 1000}
+        return summary
+
+    # Method: export
+    # Purpose: writes the spans as a Chrome trace event file (open in chrome://tracing or ui.perfetto.dev), with
+    #          the summary under the "summary" key
+    # Parameters:
+    #   String file_name: trace file to write
+    # Returns: N/A
+    def export(self, file_name):
+        with self.lock:
+            spans = [list(span) for span in self.spans]
+        events = []
+        for name, correlation_id, start, end, thread_name in spans:
+            events.append({'name': name, 'ph': 'X', 'pid': os.getpid(), 'tid': thread_name,
+                           'ts': (start - self.origin) * 1e6, 'dur': (end - start) * 1e6,
+                           'args': {'id': correlation_id}})
+        trace = {'traceEvents': events, 'displayTimeUnit': 'ms', 'summary': self.summary()}
+        with open(file_name, 'w') as trace_file:
+            json.dump(trace, trace_file, indent=1)
+
+
+tracer = Tracer()  # Shared by every module that records spans, enable with tracer.enabled = True
@@ -0,0 +1,401 @@
+# Author: Tyler Brunette
+# Company: Indicon Corporation
+
+# Compiles shape data json files into a binary file the viewer can load without parsing any json.
+# Compile:  python Shape_Binary.py ShapeData.json LiveImageShapes.json  (writes ShapeData.bin and LiveImageShapes.bin)
+# The viewer loads the .bin file when it was compiled from the current json file and reads the json file otherwise.
+#
+# File layout (little-endian, every section starts on an 8 byte boundary):
+#   header      magic, version, size and modified time of the json file it was compiled from, counts
+#   columns     x, y, width, height (float64 per shape), then shape, color, display_name, line_width, name, key,
+#               image (int32 per shape, name / key / image are string table numbers)
+#   strings     offset of each string (uint32, one more than the number of strings) then the UTF-8 text
+#   key index   key string number, first position in the order array and number of shapes (uint32 per key, keys
+#               sorted by their UTF-8 bytes), then the order array (shape numbers grouped by key, in file order)
+
+import array
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+import Shape_Session
+
+MAGIC = b'ISHP'
+VERSION = 1
+# magic, version, unused, json modified time (ns), json size, number of shapes, strings and keys
+header = struct.Struct('<4sHHqqIII')
+float_columns = ('x', 'y', 'width', 'height')
+int_columns = ('shape', 'color', 'display_name', 'line_width')
+string_columns = ('name', 'key', 'image')
+
+
+# Method: get_binary_file_name
+# Purpose: gets the name of the compiled copy of a shape data json file
+# Parameters:
+#   String file_name: shape data json file (ex: ShapeData.json)
+# Returns:
+#   String binary_file_name: compiled file (ex: ShapeData.bin)
+def get_binary_file_name(file_name):
+    return os.path.splitext(file_name)[0] + ".bin"
+
+
+# Method: get_json_signature
+# Purpose: gets the modified time and size of a json file, which a compiled file must match to be used
+# Parameters:
+#   String file_name: shape data json file
+# Returns:
+#   Tuple signature: (modified time in ns, size), or (0, 0) if the file doesn't exist
+def get_json_signature(file_name):
+    try:
+        stat = os.stat(file_name)
+    except OSError:
+        return 0, 0
+    return stat.st_mtime_ns, stat.st_size
+
+
+# Method: align
+# Purpose: pads a buffer with zero bytes up to the next 8 byte boundary
+# Parameters:
+#   Bytearray data: buffer to pad
+# Returns: N/A
+def align(data):
+    data.extend(bytes(-len(data) % 8))
+
+
+# Method: to_little_endian
+# Purpose: gets the bytes of an array in little-endian order
+# Parameters:
+#   Array values: array to convert
+# Returns:
+#   Bytes data: the array's bytes
+def to_little_endian(values):
+    if sys.byteorder == 'big':
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+# Method: compile_shapes
+# Purpose: converts shape dicts to the binary layout
+# Parameters:
+#   Array shapes: shape dicts (the 'Shapes' list of ShapeData.json / LiveImageShapes.json)
+#   Tuple json_signature: (modified time in ns, size) of the json file the shapes came from
+# Returns:
+#   Bytes data: contents of the compiled file
+def compile_shapes(shapes, json_signature=(0, 0)):
+    # Every name, key and image is stored once and referred to by number
+    strings = []
+    string_numbers = {}
+    columns = {name: array.array('d') for name in float_columns}
+    columns.update({name: array.array('i') for name in int_columns + string_columns})
+    key_shapes = {}  # key -> shape numbers with that key, in file order
+    for number, shape in enumerate(shapes):
+        for name in float_columns:
+            columns[name].append(float(shape[name]))
+        columns['shape'].append(int(shape['shape']))
+        columns['color'].append(int(shape.get('color', 1)))
+        columns['display_name'].append(int(shape.get('display_name', 1)))
+        columns['line_width'].append(int(shape.get('line_width', 5)))
+        for name in string_columns:
+            text = str(shape[name])
+            if text not in string_numbers:
+                string_numbers[text] = len(strings)
+                strings.append(text)
+            columns[name].append(string_numbers[text])
+        key_shapes.setdefault(str(shape['key']), []).append(number)
+
+    data = bytearray(header.pack(MAGIC, VERSION, 0, json_signature[0], json_signature[1], len(shapes), len(strings),
+                                 len(key_shapes)))
+    align(data)
+    for name in float_columns + int_columns + string_columns:
+        data.extend(to_little_endian(columns[name]))
+        align(data)
+
+    encoded = [text.encode('utf-8') for text in strings]
+    offsets = array.array('I', [0])
+    for text in encoded:
+        offsets.append(offsets[-1] + len(text))
+    data.extend(to_little_endian(offsets))
+    align(data)
+    data.extend(b''.join(encoded))
+    align(data)
+
+    key_numbers = array.array('I')
+    key_starts = array.array('I')
+    key_counts = array.array('I')
+    order = array.array('I')
+    for key in sorted(key_shapes, key=lambda key: key.encode('utf-8')):
+        key_numbers.append(string_numbers[key])
+        key_starts.append(len(order))
+        key_counts.append(len(key_shapes[key]))
+        order.extend(key_shapes[key])
+    for values in (key_numbers, key_starts, key_counts, order):
+        data.extend(to_little_endian(values))
+        align(data)
+    return bytes(data)
+
+
+# Method: compile_shape_library
+# Purpose: compiles a shape data json file into its .bin file
+# Parameters:
+#   String file_name: shape data json file (ex: ShapeData.json)
+# Returns:
+#   String binary_file_name: the compiled file
+def compile_shape_library(file_name):
+    # The signature is taken before reading, so a save during the compile makes the .bin file look out of date
+    json_signature = get_json_signature(file_name)
+    with open(file_name) as shape_json:
+        shape_data = json.load(shape_json)
+    binary_file_name = get_binary_file_name(file_name)
+    Shape_Session.write_file_atomic(binary_file_name, compile_shapes(shape_data['Shapes'], json_signature))
+    return binary_file_name
+
+
+# Method: update_binary
+# Purpose: recompiles a shape data json file if it has already been compiled (called after the json file is saved)
+# Parameters:
+#   String file_name: shape data json file
+# Returns: N/A
+def update_binary(file_name):
+    if os.path.exists(get_binary_file_name(file_name)):
+        try:
+            compile_shape_library(file_name)
+        except (OSError, ValueError, KeyError) as error:
+            print("Could not compile " + file_name + ": " + str(error))
+
+
+# Class: BinaryShapeLibrary
+# Purpose: Shape library read from a compiled .bin file. Loading only checks the header and wraps the file's sections,
+#          nothing is parsed until a key is looked up. Has the same find and report methods as
+#          Shape_Library.ShapeLibrary.
+# Parameters:
+#   Bytes data: contents of the compiled file (bytes or an mmap)
+#   String source: file the shapes were loaded from (used in reports)
+# Returns: N/A
+class BinaryShapeLibrary:
+
+    # Method: __init__
+    # Purpose: Initializes a BinaryShapeLibrary object, locating each section of the file (raises ValueError if the
+    #          file is truncated or isn't a shape library)
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, data, source=""):
+        self.data = data
+        self.source = source
+        if len(data) < header.size:
+            raise ValueError(source + " is too short to be a shape library")
+        magic, version, unused, json_mtime_ns, json_size, shape_count, string_count, key_count = \
+            header.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(source + " is not a version " + str(VERSION) + " shape library")
+        self.json_signature = (json_mtime_ns, json_size)
+        self.shape_count = shape_count
+        self.string_count = string_count
+        self.key_count = key_count
+        self.found = {}  # shape key -> Array of shape dicts, built the first time the key is looked up
+        self.found_rows = {}  # shape key -> Array of shape numbers, found the first time the key is looked up
+        self.unmatched_keys = set()  # shape keys that were looked up but had no shape in the library
+        self.store = None  # every shape as a Shape_Store.ShapeStore, built by Shape_Store.get_library_store
+
+        view = memoryview(data)
+        offset = header.size + (-header.size % 8)
+        self.columns = {}
+        for name in float_columns + int_columns + string_columns:
+            typecode = 'd' if name in float_columns else 'i'
+            self.columns[name], offset = self.get_section(view, offset, typecode, shape_count)
+        self.string_offsets, offset = self.get_section(view, offset, 'I', string_count + 1)
+        if offset + self.string_offsets[string_count] > len(view):
+            raise ValueError(source + " is truncated (string table)")
+        self.string_data = view[offset:offset + self.string_offsets[string_count]]
+        offset = offset + self.string_offsets[string_count]
+        offset = offset + (-offset % 8)
+        self.key_numbers, offset = self.get_section(view, offset, 'I', key_count)
+        self.key_starts, offset = self.get_section(view, offset, 'I', key_count)
+        self.key_counts, offset = self.get_section(view, offset, 'I', key_count)
+        self.order, offset = self.get_section(view, offset, 'I', shape_count)
+        self.sorted_keys = KeyList(self)
+
+    # Method: get_section
+    # Purpose: gets an array section of the file without copying it (copied only on big-endian computers), raises
+    #          ValueError if the file ends before the section does
+    # Parameters:
+    #   Memoryview view: the whole file
+    #   Int offset: where the section starts
+    #   String typecode: type of the values ('d', 'i' or 'I')
+    #   Int count: number of values
+    # Returns:
+    #   Memoryview values: the section's values
+    #   Int next_offset: where the next section starts
+    @staticmethod
+    def get_section(view, offset, typecode, count):
+        size = array.array(typecode).itemsize * count
+        if offset + size > len(view):
+            raise ValueError("shape library is truncated (section at byte " + str(offset) + ")")
+        values = view[offset:offset + size].cast(typecode)
+        if sys.byteorder == 'big':
+            values = array.array(typecode, values)
+            values.byteswap()
+        return values, offset + size + (-size % 8)
+
+    # Method: get_string
+    # Purpose: gets a string from the string table
+    # Parameters:
+    #   Int number: string number
+    # Returns:
+    #   String text: the string
+    def get_string(self, number):
+        return self.get_string_bytes(number).decode('utf-8')
+
+    # Method: get_string_bytes
+    # Purpose: gets the UTF-8 bytes of a string from the string table
+    # Parameters:
+    #   Int number: string number
+    # Returns:
+    #   Bytes text: the string's bytes
+    def get_string_bytes(self, number):
+        return bytes(self.string_data[self.string_offsets[number]:self.string_offsets[number + 1]])
+
+    # Method: get_shape
+    # Purpose: builds the shape dict of a shape (same values as in the json file)
+    # Parameters:
+    #   Int number: shape number (position in the json file)
+    # Returns:
+    #   Dict shape: shape dict
+    def get_shape(self, number):
+        shape = {}
+        for name in float_columns + int_columns:
+            shape[name] = self.columns[name][number]
+        for name in string_columns:
+            shape[name] = self.get_string(self.columns[name][number])
+        return shape
+
+    # Method: find
+    # Purpose: gets every shape with the given key
+    # Parameters:
+    #   String shape_key: key that corresponds to the ResultParameters
+    # Returns:
+    #   Array shapes: shape dicts with the given key (empty if no shape matches)
+    def find(self, shape_key):
+        shapes = self.found.get(shape_key)
+        if shapes is not None:
+            return shapes
+        shapes = [self.get_shape(number) for number in self.find_rows(shape_key)]
+        if len(shapes) > 0:
+            self.found[shape_key] = shapes
+        return shapes
+
+    # Method: find_rows
+    # Purpose: gets the shape number (position in the json file) of every shape with the given key
+    # Parameters:
+    #   String shape_key: key that corresponds to the ResultParameters
+    # Returns:
+    #   Array rows: shape numbers of the shapes with the given key (empty if no shape matches)
+    def find_rows(self, shape_key):
+        rows = self.found_rows.get(shape_key)
+        if rows is not None:
+            return rows
+        key_bytes = shape_key.encode('utf-8')
+        position = bisect.bisect_left(self.sorted_keys, key_bytes)
+        if position == self.key_count or self.sorted_keys[position] != key_bytes:
+            self.unmatched_keys.add(shape_key)
+            return []
+        start = self.key_starts[position]
+        rows = self.order[start:start + self.key_counts[position]].tolist()
+        self.found_rows[shape_key] = rows
+        return rows
+
+    # Method: report
+    # Purpose: creates a summary of key collisions and inspections that matched no shape
+    # Parameters: N/A
+    # Returns:
+    #   String report: readable summary of the library
+    def report(self):
+        lines = [self.source + ": " + str(self.shape_count) + " shapes, " + str(self.key_count) + " keys"]
+        for position in range(self.key_count):
+            if self.key_counts[position] > 1:
+                lines.append("  key collision: '" + self.get_string(self.key_numbers[position]) + "' is used by " +
+                             str(self.key_counts[position]) + " shapes")
+        for key in sorted(self.unmatched_keys):
+            lines.append("  no shape for key: '" + key + "'")
+        return "\n".join(lines)
+
+
+# Class: KeyList
+# Purpose: Read-only list of a BinaryShapeLibrary's keys as UTF-8 bytes in sorted order, so bisect can search the
+#          key index without building a list of every key
+# Parameters:
+#   BinaryShapeLibrary library: library whose keys are listed
+# Returns: N/A
+class KeyList:
+
+    # Method: __init__
+    # Purpose: Initializes a KeyList object
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, library):
+        self.library = library
+
+    # Method: __len__
+    # Purpose: gets the number of keys
+    # Parameters: N/A
+    # Returns:
+    #   Int count: number of keys
+    def __len__(self):
+        return self.library.key_count
+
+    # Method: __getitem__
+    # Purpose: gets a key by its position in sorted order
+    # Parameters:
+    #   Int position: position of the key
+    # Returns:
+    #   Bytes key: the key's UTF-8 bytes
+    def __getitem__(self, position):
+        return self.library.get_string_bytes(self.library.key_numbers[position])
+
+
+# Method: load_binary_shape_library
+# Purpose: loads a compiled shape library if it was compiled from the json file as it is now
+# Parameters:
+#   String file_name: shape data json file (ex: ShapeData.json), doesn't need to exist if its .bin file does
+#   Bool use_mmap: map the file instead of reading it (the file can't be replaced while it is mapped on Windows, so
+#                  the editor and compiler can only update it once the library is no longer used)
+# Returns:
+#   BinaryShapeLibrary library: the compiled library, or None if there is no .bin file or it is out of date or
+#                               damaged (the json file is read instead)
+def load_binary_shape_library(file_name, use_mmap=False):
+    binary_file_name = get_binary_file_name(file_name)
+    if not os.path.exists(binary_file_name):
+        return None
+    try:
+        with open(binary_file_name, 'rb') as binary_file:
+            if use_mmap:
+                data = mmap.mmap(binary_file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                data = binary_file.read()
+        library = BinaryShapeLibrary(data, binary_file_name)
+    except ValueError as error:
+        print("Could not read " + binary_file_name + ", reading " + file_name + " instead (compile it again): " +
+              str(error))
+        return None
+    if os.path.exists(file_name) and library.json_signature != get_json_signature(file_name):
+        print(binary_file_name + " is out of date, reading " + file_name + " instead (compile it again)")
+        return None
+    return library
+
+
+# Method: main
+# Purpose: compiles the shape data json files given on the command line
+# Parameters: N/A
+# Returns: N/A
+def main():
+    file_names = sys.argv[1:] or ["ShapeData.json", "LiveImageShapes.json"]
+    for file_name in file_names:
+        binary_file_name = compile_shape_library(file_name)
+        print("Compiled " + file_name + " to " + binary_file_name + " (" + str(os.path.getsize(file_name)) +
+              " -> " + str(os.path.getsize(binary_file_name)) + " bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+# Author: Tyler Brunette
+# Company: Indicon Corporation
+
+import json
+import math
+
+
+# Class: SpatialGrid
+# Purpose: Uniform grid over an image that finds the items under a point or inside an area without checking every
+#          item. Each item is stored in every grid cell its rectangle overlaps.
+# Parameters:
+#   Int cell_size: width and height of a grid cell (image pixels)
+# Returns: N/A
+class SpatialGrid:
+
+    # Method: __init__
+    # Purpose: Initializes a SpatialGrid object
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {}  # (column, row) -> set of item IDs overlapping that cell
+        self.bounds = {}  # item ID -> (left, top, right, bottom)
+
+    # Method: get_cells
+    # Purpose: gets every grid cell a rectangle overlaps
+    # Parameters:
+    #   Tuple bounds: (left, top, right, bottom) of the rectangle
+    # Returns:
+    #   Array cells: (column, row) of each cell
+    def get_cells(self, bounds):
+        left, top, right, bottom = bounds
+        first_column = math.floor(left / self.cell_size)
+        last_column = math.floor(right / self.cell_size)
+        first_row = math.floor(top / self.cell_size)
+        last_row = math.floor(bottom / self.cell_size)
+        return [(column, row) for column in range(first_column, last_column + 1)
+                for row in range(first_row, last_row + 1)]
+
+    # Method: insert
+    # Purpose: adds an item to the grid (replacing it if it is already there)
+    # Parameters:
+    #   Int item_id: ID of the item
+    #   Tuple bounds: (left, top, right, bottom) of the item
+    # Returns: N/A
+    def insert(self, item_id, bounds):
+        if item_id in self.bounds:
+            self.remove(item_id)
+        self.bounds[item_id] = bounds
+        for cell in self.get_cells(bounds):
+            self.cells.setdefault(cell, set()).add(item_id)
+
+    # Method: remove
+    # Purpose: removes an item from the grid
+    # Parameters:
+    #   Int item_id: ID of the item
+    # Returns: N/A
+    def remove(self, item_id):
+        bounds = self.bounds.pop(item_id, None)
+        if bounds is None:
+            return
+        for cell in self.get_cells(bounds):
+            items = self.cells.get(cell)
+            if items is not None:
+                items.discard(item_id)
+                if len(items) == 0:
+                    del self.cells[cell]
+
+    # Method: query_rect
+    # Purpose: gets every item whose rectangle overlaps an area
+    # Parameters:
+    #   Tuple bounds: (left, top, right, bottom) of the area
+    # Returns:
+    #   Set item_ids: IDs of the overlapping items
+    def query_rect(self, bounds):
+        left, top, right, bottom = bounds
+        found = set()
+        for cell in self.get_cells(bounds):
+            for item_id in self.cells.get(cell, ()):
+                if item_id in found:
+                    continue
+                item_left, item_top, item_right, item_bottom = self.bounds[item_id]
+                if item_left <= right and item_right >= left and item_top <= bottom and item_bottom >= top:
+                    found.add(item_id)
+        return found
+
+    # Method: query_point
+    # Purpose: gets every item whose rectangle contains a point
+    # Parameters:
+    #   Float x: x position of the point
+    #   Float y: y position of the point
+    # Returns:
+    #   Set item_ids: IDs of the items under the point
+    def query_point(self, x, y):
+        cell = (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+        found = set()
+        for item_id in self.cells.get(cell, ()):
+            left, top, right, bottom = self.bounds[item_id]
+            if left <= x <= right and top <= y <= bottom:
+                found.add(item_id)
+        return found
+
+
+# Method: get_shape_bounds
+# Purpose: gets the rectangle a shape covers on its image
+# Parameters:
+#   Dict shape: shape dict (as saved in ShapeData.json)
+# Returns:
+#   Tuple bounds: (left, top, right, bottom) in image pixels
+def get_shape_bounds(shape):
+    half_width = float(shape['width']) / 2
+    half_height = float(shape['height']) / 2
+    return (shape['x'] - half_width, shape['y'] - half_height, shape['x'] + half_width, shape['y'] + half_height)
+
+
+# Class: ShapeIndex
+# Purpose: Every shape of a shape library with a SpatialGrid per image, so the editor can draw only the shapes in
+#          view and find the shape that was clicked without looping over the whole library
+# Parameters:
+#   Array shapes: shape dicts (the 'Shapes' list of ShapeData.json / LiveImageShapes.json)
+#   String image: image every shape is placed on (None to use each shape's 'image' value)
+#   Int cell_size: width and height of a grid cell (image pixels)
+# Returns: N/A
+class ShapeIndex:
+
+    # Method: __init__
+    # Purpose: Initializes a ShapeIndex object and adds every shape to the grids
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, shapes, image=None, cell_size=64):
+        self.image = image
+        self.cell_size = cell_size
+        self.shapes = {}  # shape ID -> shape dict, IDs count up in the order the shapes were added
+        self.grids = {}  # image -> SpatialGrid of the shapes on that image
+        self.next_id = 0
+        for shape in shapes:
+            self.add(shape)
+
+    # Method: get_image
+    # Purpose: gets the image a shape is placed on
+    # Parameters:
+    #   Dict shape: shape dict
+    # Returns:
+    #   String image: image of the shape
+    def get_image(self, shape):
+        if self.image is not None:
+            return self.image
+        return shape['image']
+
+    # Method: add
+    # Purpose: adds a shape to the index
+    # Parameters:
+    #   Dict shape: shape dict
+    #   Int shape_id: ID to give the shape (None for the next unused ID)
+    # Returns:
+    #   Int shape_id: ID of the shape
+    def add(self, shape, shape_id=None):
+        if shape_id is None:
+            shape_id = self.next_id
+        self.next_id = max(self.next_id, shape_id + 1)
+        self.shapes[shape_id] = shape
+        grid = self.grids.setdefault(self.get_image(shape), SpatialGrid(self.cell_size))
+        grid.insert(shape_id, get_shape_bounds(shape))
+        return shape_id
+
+    # Method: update
+    # Purpose: replaces a shape, moving it in the grids
+    # Parameters:
+    #   Int shape_id: ID of the shape
+    #   Dict shape: new shape dict
+    # Returns: N/A
+    def update(self, shape_id, shape):
+        self.grids[self.get_image(self.shapes[shape_id])].remove(shape_id)
+        self.shapes[shape_id] = shape
+        grid = self.grids.setdefault(self.get_image(shape), SpatialGrid(self.cell_size))
+        grid.insert(shape_id, get_shape_bounds(shape))
+
+    # Method: remove
+    # Purpose: removes a shape from the index
+    # Parameters:
+    #   Int shape_id: ID of the shape
+    # Returns: N/A
+    def remove(self, shape_id):
+        shape = self.shapes.pop(shape_id)
+        self.grids[self.get_image(shape)].remove(shape_id)
+
+    # Method: find_visible
+    # Purpose: gets the shapes on an image that overlap an area (ex: the part of the image shown on screen)
+    # Parameters:
+    #   String image: image to search
+    #   Tuple bounds: (left, top, right, bottom) of the area in image pixels
+    # Returns:
+    #   Array shape_ids: IDs of the shapes in the order they were added (the order to draw them in)
+    def find_visible(self, image, bounds):
+        grid = self.grids.get(image)
+        if grid is None:
+            return []
+        return sorted(grid.query_rect(bounds))
+
+    # Method: find_at
+    # Purpose: gets the shape on an image under a point, the most recently added one if several overlap (the one
+    #          drawn on top)
+    # Parameters:
+    #   String image: image to search
+    #   Float x: x position on the image (image pixels)
+    #   Float y: y position on the image (image pixels)
+    # Returns:
+    #   Int shape_id: ID of the shape, or None if there is no shape under the point
+    def find_at(self, image, x, y):
+        grid = self.grids.get(image)
+        if grid is None:
+            return None
+        shape_ids = grid.query_point(x, y)
+        if len(shape_ids) == 0:
+            return None
+        return max(shape_ids)
+
+
+# Method: load_shape_index
+# Purpose: reads a shape data json file and builds a ShapeIndex from it
+# Parameters:
+#   String file_name: shape data json file (ex: ShapeData.json)
+#   String image: image every shape is placed on (None to use each shape's 'image' value)
+# Returns:
+#   ShapeIndex index: index of every shape in the file
+def load_shape_index(file_name, image=None):
+    with open(file_name) as shape_json:
+        shape_data = json.load(shape_json)
+    return ShapeIndex(shape_data['Shapes'], image)
@@ -0,0 +1,229 @@
+# Author: Tyler Brunette
+# Company: Indicon Corporation
+
+import json
+import os
+import threading
+import Shape_Binary
+
+
+# Method: get_shape_key
+# Purpose: builds the shape key of an inspection from its result parameters
+# Parameters:
+#   Array result_parameters: [key, value] pairs from the inspection's ResultParameters
+# Returns:
+#   String shape_key: the parameter values joined with a space
+def get_shape_key(result_parameters):
+    shape_key = ""
+    for parameter in result_parameters:
+        if len(shape_key) == 0:
+            shape_key = parameter[1]
+        else:
+            shape_key = shape_key + " " + parameter[1]
+    return shape_key
+
+
+# Class: ShapeLibrary
+# Purpose: Holds every shape from a shape data json file, indexed by shape key so an inspection's shapes can be found
+#          without looping over the whole library
+# Parameters:
+#   Array shapes: Array of shape dicts (the 'Shapes' list of ShapeData.json / LiveImageShapes.json)
+#   String source: file the shapes were loaded from (used in reports)
+# Returns: N/A
+class ShapeLibrary:
+
+    # Method: __init__
+    # Purpose: Initializes a ShapeLibrary object and builds the key index
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, shapes, source=""):
+        self.shapes = shapes
+        self.source = source
+        self.index = {}  # shape key -> Array of shape dicts with that key (in file order)
+        self.rows = {}  # shape key -> Array of positions in shapes of the shapes with that key
+        self.collisions = {}  # shape key -> number of shapes sharing that key (only keys with more than 1 shape)
+        self.unmatched_keys = set()  # shape keys that were looked up but had no shape in the library
+        self.store = None  # every shape as a Shape_Store.ShapeStore, built by Shape_Store.get_library_store
+
+        for position, shape in enumerate(shapes):
+            key = shape['key']
+            if key in self.index:
+                self.index[key].append(shape)
+                self.rows[key].append(position)
+                self.collisions[key] = len(self.index[key])
+            else:
+                self.index[key] = [shape]
+                self.rows[key] = [position]
+
+    # Method: find
+    # Purpose: gets every shape with the given key
+    # Parameters:
+    #   String shape_key: key that corresponds to the ResultParameters
+    # Returns:
+    #   Array shapes: shape dicts with the given key (empty if no shape matches)
+    def find(self, shape_key):
+        shapes = self.index.get(shape_key)
+        if shapes is None:
+            self.unmatched_keys.add(shape_key)
+            return []
+        return shapes
+
+    # Method: find_rows
+    # Purpose: gets the position in the file of every shape with the given key
+    # Parameters:
+    #   String shape_key: key that corresponds to the ResultParameters
+    # Returns:
+    #   Array rows: positions of the shapes with the given key (empty if no shape matches)
+    def find_rows(self, shape_key):
+        rows = self.rows.get(shape_key)
+        if rows is None:
+            self.unmatched_keys.add(shape_key)
+            return []
+        return rows
+
+    # Method: report
+    # Purpose: creates a summary of key collisions and inspections that matched no shape
+    # Parameters: N/A
+    # Returns:
+    #   String report: readable summary of the library
+    def report(self):
+        lines = [self.source + ": " + str(len(self.shapes)) + " shapes, " + str(len(self.index)) + " keys"]
+        for key, count in sorted(self.collisions.items()):
+            lines.append("  key collision: '" + key + "' is used by " + str(count) + " shapes")
+        for key in sorted(self.unmatched_keys):
+            lines.append("  no shape for key: '" + key + "'")
+        return "\n".join(lines)
+
+
+# Method: load_shape_library
+# Purpose: loads the compiled copy of a shape data json file (see Shape_Binary) if it is up to date, otherwise reads
+#          the json file and builds a ShapeLibrary from it
+# Parameters:
+#   String file_name: shape data json file (ex: ShapeData.json)
+# Returns:
+#   ShapeLibrary library: library holding every shape in the file (a BinaryShapeLibrary if it was compiled)
+def load_shape_library(file_name):
+    library = Shape_Binary.load_binary_shape_library(file_name)
+    if library is not None:
+        return library
+    with open(file_name) as shape_json:
+        shape_data = json.load(shape_json)
+    return ShapeLibrary(shape_data['Shapes'], file_name)
+
+
+# Method: get_file_signature
+# Purpose: gets the values used to tell whether a file has changed since it was last read
+# Parameters:
+#   String file_name: file to check
+# Returns:
+#   Tuple signature: (modified time, size) of the file, or None if the file can't be read
+def get_file_signature(file_name):
+    try:
+        stat = os.stat(file_name)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+# Method: get_library_signature
+# Purpose: gets the values used to tell whether a shape data json file or its compiled copy has changed
+# Parameters:
+#   String file_name: shape data json file
+# Returns:
+#   Tuple signature: signatures of the json file and its .bin file (see get_file_signature)
+def get_library_signature(file_name):
+    return get_file_signature(file_name), get_file_signature(Shape_Binary.get_binary_file_name(file_name))
+
+
+# Class: ShapeLibraryCache
+# Purpose: Keeps a parsed ShapeLibrary in memory and only re-parses the file when its modified time or size changes.
+#          Once started, the file is checked and re-parsed on a separate thread and the new library is swapped in
+#          whole, so the render loop never waits on a parse.
+# Parameters:
+#   String file_name: shape data json file (ex: ShapeData.json)
+#   Float check_interval: seconds between checks for a changed file
+# Returns: N/A
+class ShapeLibraryCache:
+
+    # Method: __init__
+    # Purpose: Initializes a ShapeLibraryCache object
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, file_name, check_interval=1.0):
+        self.file_name = file_name
+        self.check_interval = check_interval
+        self.library = None  # ShapeLibrary currently in use (replaced whole, never modified in place)
+        self.signature = None  # signature of the files the library was loaded from (see get_library_signature)
+        self.load_count = 0  # number of times the file has been parsed
+        self.lock = threading.Lock()  # only one parse at a time
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    # Method: get
+    # Purpose: gets the current ShapeLibrary, parsing the file first if it has never been loaded
+    # Parameters: N/A
+    # Returns:
+    #   ShapeLibrary library: most recently parsed library
+    def get(self):
+        library = self.library
+        if library is None:
+            self.reload()
+            library = self.library
+        return library
+
+    # Method: reload
+    # Purpose: parses the file if it has changed since the last parse and swaps in the new library
+    # Parameters:
+    #   Bool force: parse the file even if it looks unchanged
+    # Returns:
+    #   Bool reloaded: whether a new library was swapped in
+    def reload(self, force=False):
+        with self.lock:
+            signature = get_library_signature(self.file_name)
+            if not force and self.library is not None and signature == self.signature:
+                return False
+            try:
+                library = load_shape_library(self.file_name)
+            except (OSError, ValueError, KeyError) as error:
+                # Keep the old library if the file is missing or half-saved, the next check will try again
+                if self.library is None:
+                    raise
+                print("Could not reload " + self.file_name + ": " + str(error))
+                return False
+            self.library = library
+            self.signature = signature
+            self.load_count = self.load_count + 1
+            return True
+
+    # Method: start
+    # Purpose: starts checking the file for changes on a separate thread
+    # Parameters: N/A
+    # Returns: N/A
+    def start(self):
+        if self.thread is not None:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.watch, daemon=True)
+        self.thread.start()
+
+    # Method: stop
+    # Purpose: stops the thread started by start()
+    # Parameters: N/A
+    # Returns: N/A
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    # Method: watch
+    # Purpose: re-parses the file whenever it changes until stop() is called (runs on the thread from start())
+    # Parameters: N/A
+    # Returns: N/A
+    def watch(self):
+        while not self.stop_event.is_set():
+            try:
+                self.reload()
+            except (OSError, ValueError, KeyError) as error:
+                print("Could not load " + self.file_name + ": " + str(error))
+            self.stop_event.wait(self.check_interval)
@@ -0,0 +1,228 @@
+# Author: Tyler Brunette
+# Company: Indicon Corporation
+
+import json
+import os
+import time
+
+
+# Method: write_file_atomic
+# Purpose: writes a file so that readers only ever see the old or the new contents, never a partly written file
+# Parameters:
+#   String file_name: file to write
+#   String/Bytes contents: new contents of the file (bytes are written as a binary file)
+# Returns: N/A
+def write_file_atomic(file_name, contents):
+    temp_file_name = file_name + ".tmp"
+    with open(temp_file_name, 'wb' if isinstance(contents, bytes) else 'w') as temp_file:
+        temp_file.write(contents)
+        temp_file.flush()
+        os.fsync(temp_file.fileno())
+    os.replace(temp_file_name, file_name)
+
+
+# Class: ShapeEditSession
+# Purpose: Edits a shape data json file (ShapeData.json / LiveImageShapes.json) without rewriting it on every change.
+#          Adds, changes and deletes are applied in memory and appended to a journal file, and every so often the
+#          shapes are compacted into the json file with an atomic replace. The json file the viewer reads is always
+#          a complete snapshot, and after a crash the journal is replayed onto it. Every edit can be undone.
+# Parameters:
+#   String file_name: shape data json file
+#   Int compact_every: number of edits after which the json file is rewritten
+#   Float compact_interval: seconds after an edit after which the json file is rewritten (see maybe_compact)
+# Returns: N/A
+class ShapeEditSession:
+
+    # Method: __init__
+    # Purpose: Initializes a ShapeEditSession object, reading the json file and replaying its journal
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, file_name, compact_every=20, compact_interval=5.0):
+        self.file_name = file_name
+        self.journal_file_name = file_name + ".journal"
+        self.compact_every = compact_every
+        self.compact_interval = compact_interval
+        self.shapes = {}  # shape ID -> shape dict, IDs count up in the order the shapes were added
+        self.next_id = 0
+        self.revision = 0  # increases every time the json file is rewritten
+        self.undo_stack = []  # edits that can be undone, most recent last
+        self.pending = 0  # edits since the json file was last rewritten
+        self.first_pending_time = None  # time.monotonic() of the first of those edits
+        self.journal = None
+        self.listeners = []  # functions called with the file name after the json file is rewritten
+
+        with open(file_name) as shape_json:
+            shape_data = json.load(shape_json)
+        self.revision = shape_data.get('Revision', 0)
+        ids = list(range(len(shape_data['Shapes'])))
+        records = self.read_journal()
+
+        # The journal only applies to the revision it was started from. If the json file is newer, the journal's
+        # edits were compacted into it before the journal could be cleared.
+        if len(records) > 0 and records[0].get('revision') == self.revision and \
+                len(records[0].get('ids', [])) == len(ids):
+            ids = records[0]['ids']
+            records = records[1:]
+        else:
+            records = []
+        for shape_id, shape in zip(ids, shape_data['Shapes']):
+            self.shapes[shape_id] = shape
+        self.next_id = max(ids, default=-1) + 1
+
+        for record in records:
+            self.apply(record)
+        self.pending = len(records)
+        if self.pending > 0:
+            self.first_pending_time = time.monotonic()
+            print("Recovered " + str(self.pending) + " unsaved edits to " + file_name)
+            self.compact()
+        else:
+            self.start_journal()
+
+    # Method: read_journal
+    # Purpose: reads the records in the journal file
+    # Parameters: N/A
+    # Returns:
+    #   Array records: journal records in the order they were written (empty if there is no journal)
+    def read_journal(self):
+        records = []
+        if not os.path.exists(self.journal_file_name):
+            return records
+        with open(self.journal_file_name) as journal:
+            for line in journal:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break  # the last record was only partly written when the editor stopped
+        return records
+
+    # Method: add_listener
+    # Purpose: adds a function to call after the json file is rewritten (ex: to rebuild a compiled copy of it)
+    # Parameters:
+    #   Function listener: function that takes the json file name
+    # Returns: N/A
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    # Method: start_journal
+    # Purpose: starts a new journal for the current revision of the json file
+    # Parameters: N/A
+    # Returns: N/A
+    def start_journal(self):
+        if self.journal is not None:
+            self.journal.close()
+        base = {'op': 'base', 'revision': self.revision, 'ids': list(self.shapes)}
+        write_file_atomic(self.journal_file_name, json.dumps(base) + "\n")
+        self.journal = open(self.journal_file_name, 'a')
+
+    # Method: apply
+    # Purpose: applies an edit record to the shapes in memory
+    # Parameters:
+    #   Dict record: edit ({'op': 'add', 'modify' or 'delete', 'id': shape ID, 'shape': new shape dict})
+    # Returns: N/A
+    def apply(self, record):
+        shape_id = record['id']
+        if record['op'] == 'delete':
+            self.shapes.pop(shape_id, None)
+        else:
+            self.shapes[shape_id] = record['shape']
+        self.next_id = max(self.next_id, shape_id + 1)
+
+    # Method: record
+    # Purpose: applies an edit, appends it to the journal and rewrites the json file if enough edits are pending
+    # Parameters:
+    #   Dict record: edit to apply (see apply)
+    # Returns: N/A
+    def record(self, record):
+        self.apply(record)
+        self.journal.write(json.dumps(record) + "\n")
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+        self.pending = self.pending + 1
+        if self.first_pending_time is None:
+            self.first_pending_time = time.monotonic()
+        if self.pending >= self.compact_every:
+            self.compact()
+
+    # Method: add
+    # Purpose: adds a shape
+    # Parameters:
+    #   Dict shape: shape dict
+    # Returns:
+    #   Int shape_id: ID of the new shape
+    def add(self, shape):
+        shape_id = self.next_id
+        self.record({'op': 'add', 'id': shape_id, 'shape': shape})
+        self.undo_stack.append({'op': 'delete', 'id': shape_id})
+        return shape_id
+
+    # Method: modify
+    # Purpose: replaces a shape
+    # Parameters:
+    #   Int shape_id: ID of the shape
+    #   Dict shape: new shape dict
+    # Returns: N/A
+    def modify(self, shape_id, shape):
+        old_shape = self.shapes[shape_id]
+        self.record({'op': 'modify', 'id': shape_id, 'shape': shape})
+        self.undo_stack.append({'op': 'modify', 'id': shape_id, 'shape': old_shape})
+
+    # Method: delete
+    # Purpose: deletes a shape
+    # Parameters:
+    #   Int shape_id: ID of the shape
+    # Returns: N/A
+    def delete(self, shape_id):
+        old_shape = self.shapes[shape_id]
+        self.record({'op': 'delete', 'id': shape_id})
+        self.undo_stack.append({'op': 'add', 'id': shape_id, 'shape': old_shape})
+
+    # Method: undo
+    # Purpose: undoes the most recent edit (the undo is itself journaled, so it survives a crash too)
+    # Parameters: N/A
+    # Returns:
+    #   Dict record: edit that was applied to undo it, or None if there is nothing to undo
+    def undo(self):
+        if len(self.undo_stack) == 0:
+            return None
+        record = self.undo_stack.pop()
+        self.record(record)
+        return record
+
+    # Method: compact
+    # Purpose: rewrites the json file with every shape and starts a new journal
+    # Parameters: N/A
+    # Returns: N/A
+    def compact(self):
+        self.revision = self.revision + 1
+        shape_data = {'Shapes': list(self.shapes.values()), 'Revision': self.revision}
+        write_file_atomic(self.file_name, json.dumps(obj=shape_data, indent=4))
+        self.start_journal()
+        self.pending = 0
+        self.first_pending_time = None
+        for listener in self.listeners:
+            listener(self.file_name)
+
+    # Method: maybe_compact
+    # Purpose: rewrites the json file if an edit has been waiting longer than compact_interval (call periodically)
+    # Parameters: N/A
+    # Returns:
+    #   Bool compacted: whether the json file was rewritten
+    def maybe_compact(self):
+        if self.first_pending_time is None:
+            return False
+        if time.monotonic() - self.first_pending_time < self.compact_interval:
+            return False
+        self.compact()
+        return True
+
+    # Method: close
+    # Purpose: writes any pending edits to the json file and closes the journal
+    # Parameters: N/A
+    # Returns: N/A
+    def close(self):
+        if self.pending > 0:
+            self.compact()
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
@@ -1,30 +1,181 @@
-import json
 import os.path
 import pygame
 from pygame import K_v, K_LCTRL
 import Button
+import Font_Cache
+import Image_Cache
+import Shape_Binary
+import Shape_Index
+import Shape_Session
+import Shape_Store
 
 current_directory = os.getcwd()  # Current directory of the python script
 global directory
 directory = 'D:\\Images\\Left\\2022-05-16\\RHF122133072454630'  # TODO: Directory containing the live images
+static_output_file = "ShapeData.json"  # TODO: Change to your static image shape data json file
+live_output_file = "LiveImageShapes.json"  # TODO: Change to your live image shape data json file
 
+# Images being edited are kept in memory only (the least recently shown are dropped once over the budget), so typing
+# a new scale never leaves another scaled copy in the static image cache's folder
+editor_image_cache_bytes = 128 * 1024 * 1024  # TODO: Memory budget of the images being edited (bytes)
+editor_image_cache = Image_Cache.SurfaceCache(editor_image_cache_bytes)
 
-# Method: save_shape_data
-# Purpose: Adds a ShapeToDraw object to the Shape array in the json file
+# Edit session of each output file (see get_shape_session), edits are journaled and written to the json file in
+# batches, so the viewer only ever reads a complete file
+shape_sessions = {}
+
+# Saved shapes of each output file, indexed by their position on each image (see get_shape_index)
+shape_indexes = {}
+
+
+# Method: get_shape_session
+# Purpose: gets the edit session of a shape data json file, opening it the first time
+# Parameters:
+#   String file_name: shape data json file
+# Returns:
+#   ShapeEditSession session: edit session of the file (None if the file can't be read)
+def get_shape_session(file_name):
+    if file_name not in shape_sessions:
+        try:
+            session = Shape_Session.ShapeEditSession(file_name)
+        except (OSError, ValueError, KeyError) as error:
+            print("Could not load " + file_name + ": " + str(error))
+            return None
+        # Keep a compiled copy of the file (if there is one) up to date for the viewer
+        session.add_listener(Shape_Binary.update_binary)
+        if Shape_Binary.load_binary_shape_library(file_name) is None:
+            Shape_Binary.update_binary(file_name)
+        shape_sessions[file_name] = session
+    return shape_sessions[file_name]
+
+
+# Method: close_shape_sessions
+# Purpose: writes every pending edit to its json file and closes the edit sessions
+# Parameters: N/A
+# Returns: N/A
+def close_shape_sessions():
+    for session in shape_sessions.values():
+        session.close()
+    shape_sessions.clear()
+    shape_indexes.clear()
+
+
+# Method: get_shape_index
+# Purpose: gets the index of every shape saved in a shape data json file, building it only the first time
+# Parameters:
+#   String file_name: shape data json file
+#   String image: image every shape is placed on (None to use each shape's 'image' value)
+# Returns:
+#   ShapeIndex shape_index: index of the saved shapes, with the same IDs as the edit session (None if the file
+#                           can't be read)
+def get_shape_index(file_name, image=None):
+    if file_name not in shape_indexes:
+        session = get_shape_session(file_name)
+        if session is None:
+            return None
+        shape_index = Shape_Index.ShapeIndex([], image)
+        for shape_id, shape in session.shapes.items():
+            shape_index.add(shape, shape_id)
+        shape_indexes[file_name] = shape_index
+    return shape_indexes[file_name]
+
+
+# Method: get_image_shape_file
+# Purpose: gets the shape data json file of the shapes that belong on the displayed image
+# Parameters:
+#   String image_text: image being displayed ('1', '2' or '3' for a static image, '4' for a live image)
+# Returns:
+#   String file_name: shape data json file
+def get_image_shape_file(image_text):
+    if image_text == '4':
+        return live_output_file
+    return static_output_file
+
+
+# Method: get_image_shapes
+# Purpose: gets the saved shapes that belong on the displayed image
+# Parameters:
+#   String image_text: image being displayed ('1', '2' or '3' for a static image, '4' for a live image)
+# Returns:
+#   ShapeIndex shape_index: index of the saved shapes (None if the file can't be read)
+#   String index_image: image to search in the index
+def get_image_shapes(image_text):
+    if image_text == '4':
+        # Live image shapes can be placed on any live image, so they are all shown
+        return get_shape_index(live_output_file, '4'), '4'
+    return get_shape_index(static_output_file), image_text
+
+
+# Method: update_shape_index
+# Purpose: applies an edit to the index of a shape data json file, if the index has been built
 # Parameters:
-#   ShapeToDraw shape: ShapeToDraw object to add to the json file
+#   String file_name: shape data json file
+#   Dict record: edit that was made (see ShapeEditSession.apply)
 # Returns: N/A
-def save_shape_data(shape, output_file):
+def update_shape_index(file_name, record):
+    shape_index = shape_indexes.get(file_name)
+    if shape_index is None:
+        return
+    shape_id = record['id']
+    if record['op'] == 'delete':
+        shape_index.remove(shape_id)
+    elif shape_id in shape_index.shapes:
+        shape_index.update(shape_id, record['shape'])
+    else:
+        shape_index.add(record['shape'], shape_id)
+
 
-    file = output_file
-    shape_to_save = shape.__dict__
+# Method: save_shape_data
+# Purpose: Adds a shape to the json file, or replaces a saved shape with it
+# Parameters:
+#   Dict shape: shape dict to save (see ShapeToDraw.get_scaled_shape)
+#   String output_file: shape data json file
+#   Int shape_id: ID of the saved shape to replace (None to add a new shape)
+# Returns:
+#   Int shape_id: ID of the saved shape (None if the file can't be read)
+def save_shape_data(shape, output_file, shape_id=None):
+    session = get_shape_session(output_file)
+    if session is None:
+        return None
+    shape_to_save = dict(shape)
+    if shape_id is None:
+        shape_id = session.add(shape_to_save)
+        update_shape_index(output_file, {'op': 'add', 'id': shape_id, 'shape': shape_to_save})
+    else:
+        session.modify(shape_id, shape_to_save)
+        update_shape_index(output_file, {'op': 'modify', 'id': shape_id, 'shape': shape_to_save})
+    return shape_id
+
+
+# Method: delete_shape_data
+# Purpose: deletes a saved shape from the json file
+# Parameters:
+#   String output_file: shape data json file
+#   Int shape_id: ID of the saved shape
+# Returns: N/A
+def delete_shape_data(output_file, shape_id):
+    session = get_shape_session(output_file)
+    if session is None:
+        return
+    session.delete(shape_id)
+    update_shape_index(output_file, {'op': 'delete', 'id': shape_id})
 
-    shape_json = open(file)
-    shape_data = json.load(shape_json)
-    shape_data['Shapes'].append(shape_to_save)
 
-    with open(file, "w") as outfile:
-        json.dump(obj=shape_data, indent=4, fp=outfile)
+# Method: undo_shape_data
+# Purpose: undoes the most recent edit to a json file
+# Parameters:
+#   String output_file: shape data json file
+# Returns:
+#   Bool undone: whether there was an edit to undo
+def undo_shape_data(output_file):
+    session = get_shape_session(output_file)
+    if session is None:
+        return False
+    record = session.undo()
+    if record is None:
+        return False
+    update_shape_index(output_file, record)
+    return True
 
 
 # Class: ShapeToDraw
@@ -66,10 +217,10 @@ class ShapeToDraw:
     #   Surface screen: surface to draw the shape on
     #   Int image_x: x position of the image to draw the shape on (left)
     #   Int image_y: y position of the image to draw the shape on (top)
-    #   Float scale: scale factor of the image
+    #   Float scale: scale factor of the image (1 if the shape's position and size are already scaled)
     # Returns:
-    #   Rect rect: rectangle of the shape
-    def draw_shape(self, screen, image_x, image_y):
+    #   Rect rect: area of the screen that was drawn on (shape and name label)
+    def draw_shape(self, screen, image_x, image_y, scale=1):
 
         shape_color = (255, 0, 0)
         match self.color:
@@ -85,25 +236,53 @@ class ShapeToDraw:
                 shape_color = (255,165,0)
 
         text_bg = (0,0,0)
-        font = pygame.font.SysFont("Times New Roman", size=12)
+        x = self.x * scale
+        y = self.y * scale
+        width = self.width * scale
+        height = self.height * scale
         if self.shape == 0:
             pygame.draw.ellipse(surface=screen, color=shape_color,
-                                rect=(image_x + self.x - (self.width / 2), image_y + self.y - (self.height / 2),
-                                      self.width, self.height),
+                                rect=(image_x + x - (width / 2), image_y + y - (height / 2), width, height),
                                 width=self.line_width)
         elif self.shape == 1:
             pygame.draw.rect(surface=screen, color=shape_color,
-                             rect=(image_x + self.x - (self.width/2), image_y + self.y - (self.height/2),
-                                   self.width, self.height),
+                             rect=(image_x + x - (width/2), image_y + y - (height/2), width, height),
                              width=self.line_width)
 
-        rect = pygame.Rect(image_x + self.x - (self.width / 2), image_y + self.y - (self.height / 2),
-                           self.width, self.height)
+        rect = pygame.Rect(image_x + x - (width / 2), image_y + y - (height / 2), width, height)
 
         if self.display_name:
-            name_label = font.render(self.name, True, shape_color, text_bg)
-            screen.blit(name_label, (image_x + self.x, image_y + self.y - (self.height/2) - (self.line_width*3)))
+            name_label = Font_Cache.render_text(self.name, 12, shape_color, text_bg)
+            label_rect = screen.blit(name_label, (image_x + x, image_y + y - (height/2) - (self.line_width*3)))
+            rect = rect.union(label_rect)
+
+        return rect
 
+    # Method: get_rect
+    # Purpose: gets the rectangle of the shape on the screen (without its name label)
+    # Parameters:
+    #   Int image_x: x position of the image the shape is on (left)
+    #   Int image_y: y position of the image the shape is on (top)
+    #   Float scale: scale factor of the image (1 if the shape's position and size are already scaled)
+    # Returns:
+    #   Rect rect: rectangle of the shape
+    def get_rect(self, image_x, image_y, scale=1):
+        return pygame.Rect(image_x + (self.x - self.width / 2) * scale, image_y + (self.y - self.height / 2) * scale,
+                           self.width * scale, self.height * scale)
+
+    # Method: get_drawn_rect
+    # Purpose: gets the area of the screen draw_shape draws on (shape and name label) without drawing
+    # Parameters:
+    #   Int image_x: x position of the image the shape is on (left)
+    #   Int image_y: y position of the image the shape is on (top)
+    # Returns:
+    #   Rect rect: area of the shape and its name label
+    def get_drawn_rect(self, image_x, image_y):
+        rect = self.get_rect(image_x, image_y)
+        if self.display_name:
+            name_width, name_height = Font_Cache.get_font(12).size(self.name)
+            rect = rect.union(pygame.Rect(image_x + self.x, image_y + self.y - (self.height/2) - (self.line_width*3),
+                                          name_width, name_height))
         return rect
 
     # Method: get_scaled_shape
@@ -111,20 +290,11 @@ class ShapeToDraw:
     # Parameters:
     #   Float scale: scale factor of the image
     # Returns:
-    #   ShapeToDraw scaled_shape: scaled version of the shape
+    #   Dict scaled_shape: scaled version of the shape, laid out like the shape data json file
     def get_scaled_shape(self, scale):
-        name = self.name
-        shape = self.shape
-        color = self.color
-        display_name = self.display_name
-        x = self.x * 1/scale
-        y = self.y * 1/scale
-        height = self.height * 1/scale
-        width = self.width * 1/scale
-        key = self.key
-        image = self.image
-        scaled_shape = ShapeToDraw(name, shape, color, display_name, x, y, height, width, key, image)
-        return scaled_shape
+        return {'name': self.name, 'shape': self.shape, 'color': self.color, 'display_name': self.display_name,
+                'x': self.x / scale, 'y': self.y / scale, 'height': self.height / scale, 'width': self.width / scale,
+                'key': self.key, 'image': self.image, 'line_width': self.line_width}
 
 
 # Method: set_user_text
@@ -153,8 +323,417 @@ def set_user_text(event, user_text):
     return user_text
 
 
+# Class: ShapeEditor
+# Purpose: Long-lived pygame window for placing shapes on the static and live images. The window, button images,
+#          input boxes and displayed image are created once. Dragging the shape only redraws the area it moved
+#          across, and typing only redraws the input box being edited.
+# Parameters:
+#   Int pos_x: x position of the shape (center, relative to the image)
+#   Int pos_y: y position of the shape (center, relative to the image)
+#   String height: height of the shape
+#   String width: width of the shape
+#   String shape: type of shape to draw (0 = ellipse, 1 = rectangle)
+#   String name: name of the shape (shown on label above shape)
+#   String image_number: which image the shape is linked to
+#   String key: key that corresponds to the ResultParameters
+#   String image_scale: scale factor of the image
+#   String live_image: live image filename
+# Returns: N/A
+class ShapeEditor:
+
+    # Method: __init__
+    # Purpose: Initializes the pygame window and everything that stays the same while editing
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, pos_x, pos_y, height, width, shape, name, image_number, key, image_scale, live_image):
+
+        # Initialize the GUI
+        pygame.init()
+        size = (1920,1010)
+        self.screen = pygame.display.set_mode(size)
+        pygame.display.set_caption("Indicon Inspection Results")
+
+        # Color constants
+        self.text_color = (220,220,225)
+        self.background = (51,51,51)
+        self.dark_text_color = (20,20,20)
+        self.font_size = 22
+
+        # Initialize buttons
+        new_shape_button_image = Image_Cache.static_image_cache.get("generate_button.png")
+        save_static_data_button_image = Image_Cache.static_image_cache.get("save_static_data_button.png")
+        save_live_data_button_image = Image_Cache.static_image_cache.get("save_live_data_button.png")
+        self.new_shape_button = Button.Button(x=75, y=450, image=new_shape_button_image, scale=1)
+        self.save_static_data_button = Button.Button(x=75, y=500, image=save_static_data_button_image, scale=1)
+        self.save_live_data_button = Button.Button(x=75, y=550, image=save_live_data_button_image, scale=1)
+
+        # Input boxes: name -> [label, Rect, text], the order they are drawn in
+        input_box_width = 125
+        input_box_height = 30
+        self.input_boxes = {}
+        for box_name, label, x, y, text in (('scale', "scale:", 100, 50, image_scale),
+                                            ('key', "key:", 100, 100, key),
+                                            ('image', "image:", 100, 150, image_number),
+                                            ('height', "height:", 100, 200, height),
+                                            ('width', "width:", 100, 250, width),
+                                            ('shape', "shape:", 100, 300, shape),
+                                            ('name', "name:", 100, 350, name),
+                                            ('live_image', "live image:", 140, 400, live_image)):
+            self.input_boxes[box_name] = [label, pygame.Rect(x, y, input_box_width, input_box_height), text]
+        self.active_box = None  # name of the input box being typed in
+
+        # Images are decoded once and scaled once per scale factor (see editor_image_cache)
+        self.image_display = None  # Button showing the image being edited
+        self.image_scale = float(image_scale)
+        self.image_text = image_number
+
+        # The shape being placed, its position is relative to the image's top left
+        self.shape_to_draw = ShapeToDraw(name=name, shape=int(shape), color=1, display_name=1, x=pos_x, y=pos_y,
+                                         height=float(height), width=float(width), key=key, image=image_number)
+        self.shape_rect = pygame.Rect(0, 0, 0, 0)  # area of the screen covered by the shape (for clicking it)
+        self.drawn_rect = pygame.Rect(0, 0, 0, 0)  # area of the screen covered by the shape and its name
+        self.move_shape = False  # Shows whether the shape is being moved or not
+        self.selected = None  # (shape data json file, shape ID) of the saved shape being edited, None for a new shape
+        self.edited_files = []  # shape data json file of each edit that can be undone, most recent last
+
+        self.dirty_rects = []  # areas of the screen that have changed since the display was last updated
+        self.clock = pygame.time.Clock()
+        self.running = False
+
+        # Initialize the clipboard capability
+        pygame.scrap.init()
+        pygame.scrap.set_mode(pygame.SCRAP_CLIPBOARD)
+
+        self.load_image()
+        self.draw_all()
+
+    # Method: get_image_file
+    # Purpose: chooses the displayed image based on the user's input
+    # Parameters: N/A
+    # Returns:
+    #   String image_file: file of the image to display
+    def get_image_file(self):
+        image_file = "doge_wink.JPG"  # Default Image
+        live_image_text = self.input_boxes['live_image'][2]
+        # TODO: Put your images here that you want to draw shapes on
+        match self.image_text:
+            case '1':
+                image_file = "IP_Image_1.png"  # Ex: Top View
+            case '2':
+                image_file = "IP_Image_1.png"  # Ex: Front View
+            case '3':
+                image_file = "IP_Image_1.png"  # Ex: Bottom View
+            case '4':
+                if live_image_text != "":
+                    image_file = directory + '\\' + live_image_text
+        return image_file
+
+    # Method: load_image
+    # Purpose: sets up the displayed image, only decoding or scaling it if it hasn't been displayed before
+    # Parameters: N/A
+    # Returns: N/A
+    def load_image(self):
+        image = editor_image_cache.get(self.get_image_file(), self.image_scale)
+        self.image_display = Button.Button(x=510, y=35, image=image, scale=1)
+
+    # Method: generate
+    # Purpose: applies the values in the input boxes to the image and the shape (the "Generate" button)
+    # Parameters: N/A
+    # Returns: N/A
+    def generate(self):
+        texts = {box_name: box[2] for box_name, box in self.input_boxes.items()}
+        try:
+            image_scale = float(texts['scale'])
+            shape = int(texts['shape'])
+            height = float(texts['height'])
+            width = float(texts['width'])
+        except ValueError as error:
+            print("Could not generate the shape: " + str(error))
+            return
+        self.image_scale = image_scale
+        self.image_text = texts['image']
+        self.shape_to_draw = ShapeToDraw(name=texts['name'], shape=shape, color=1, display_name=1,
+                                         x=self.shape_to_draw.x, y=self.shape_to_draw.y, height=height, width=width,
+                                         key=texts['key'], image=self.image_text)
+        try:
+            self.load_image()
+        except (FileNotFoundError, pygame.error) as error:
+            print("Could not load the image: " + str(error))
+        self.draw_all()
+
+    # Method: load_saved_shape
+    # Purpose: loads a saved shape's data into the input boxes and the shape being placed
+    # Parameters:
+    #   Dict saved: shape dict from the shape data json file
+    # Returns: N/A
+    def load_saved_shape(self, saved):
+        scale = self.image_scale
+        self.input_boxes['height'][2] = str(saved['height'] * scale)
+        self.input_boxes['width'][2] = str(saved['width'] * scale)
+        self.input_boxes['shape'][2] = str(saved['shape'])
+        self.input_boxes['name'][2] = saved['name']
+        self.input_boxes['key'][2] = saved['key']
+        self.shape_to_draw.x = saved['x'] * scale
+        self.shape_to_draw.y = saved['y'] * scale
+        self.generate()
+
+    # Method: draw_input_box
+    # Purpose: draws an input box with its text, extending the box if the text is too long
+    # Parameters:
+    #   String box_name: name of the input box
+    # Returns: N/A
+    def draw_input_box(self, box_name):
+        label, rect, text = self.input_boxes[box_name]
+        old_rect = rect.copy()
+        text_label = Font_Cache.render_text(text, self.font_size, self.dark_text_color)
+        rect.w = max(100, text_label.get_width() + 10)
+        pygame.draw.rect(self.screen, self.background, old_rect)
+        pygame.draw.rect(self.screen, self.text_color, rect=rect)
+        self.screen.blit(text_label, rect.topleft)
+        self.dirty_rects.append(old_rect.union(rect))
+
+    # Method: draw_image_area
+    # Purpose: redraws the image, the saved shapes and the shape being placed inside an area of the screen
+    # Parameters:
+    #   Rect area: area of the screen to redraw
+    # Returns: N/A
+    def draw_image_area(self, area):
+        self.screen.set_clip(area)
+        self.screen.fill(self.background, area)
+        self.image_display.draw(self.screen)
+        image_x, image_y = self.image_display.rect.topleft
+
+        # Draw the saved shapes in view (cyan, the selected one yellow), the index skips the rest of the library
+        shape_index, index_image = get_image_shapes(self.image_text)
+        selected_id = None
+        if self.selected is not None and self.selected[0] == get_image_shape_file(self.image_text):
+            selected_id = self.selected[1]
+        if shape_index is not None:
+            visible_rect = area.clip(self.image_display.rect)
+            view = ((visible_rect.left - image_x) / self.image_scale, (visible_rect.top - image_y) / self.image_scale,
+                    (visible_rect.right - image_x) / self.image_scale,
+                    (visible_rect.bottom - image_y) / self.image_scale)
+            shape_ids = shape_index.find_visible(index_image, view)
+            if Shape_Store.numpy is not None:
+                # Every visible shape is placed on the screen at once, then drawn
+                saved_shapes = Shape_Store.ShapeStore([shape_index.shapes[shape_id] for shape_id in shape_ids])
+                saved_shapes.color[:] = 3
+                saved_shapes.color[[position for position, shape_id in enumerate(shape_ids)
+                                    if shape_id == selected_id]] = 2
+                Shape_Store.draw_shapes(self.screen, saved_shapes,
+                                        saved_shapes.get_screen_rects(image_x, image_y, self.image_scale),
+                                        saved_shapes.get_label_positions(image_x, image_y, self.image_scale, 3), 12)
+            else:
+                for shape_id in shape_ids:
+                    saved = shape_index.shapes[shape_id]
+                    color = 2 if shape_id == selected_id else 3
+                    saved_shape = ShapeToDraw(name=saved['name'], shape=saved['shape'], color=color,
+                                              display_name=saved['display_name'], x=saved['x'], y=saved['y'],
+                                              height=float(saved['height']), width=float(saved['width']),
+                                              key=saved['key'], image=saved['image'])
+                    saved_shape.draw_shape(self.screen, image_x, image_y, self.image_scale)
+
+        self.shape_rect = self.shape_to_draw.get_rect(image_x, image_y)
+        self.drawn_rect = self.shape_to_draw.draw_shape(self.screen, image_x, image_y)
+        self.screen.set_clip(None)
+        self.dirty_rects.append(area)
+
+    # Method: draw_all
+    # Purpose: redraws the whole window
+    # Parameters: N/A
+    # Returns: N/A
+    def draw_all(self):
+        self.screen.fill(self.background)
+        for box_name, (label, rect, text) in self.input_boxes.items():
+            input_label = Font_Cache.render_text(label, self.font_size, self.text_color)
+            self.screen.blit(input_label, (25, rect.top))
+            self.draw_input_box(box_name)
+        self.new_shape_button.draw(self.screen)
+        self.save_static_data_button.draw(self.screen)
+        self.save_live_data_button.draw(self.screen)
+
+        image_label = Font_Cache.render_text("Image " + self.image_text + ":", self.font_size, self.text_color)
+        self.screen.blit(image_label, (420, 35))
+        self.draw_image_area(self.screen.get_rect().clip(pygame.Rect(510, 0, self.screen.get_width() - 510,
+                                                                     self.screen.get_height())))
+        self.dirty_rects = [self.screen.get_rect()]
+
+    # Method: move_shape_to
+    # Purpose: moves the shape being placed so it is centered on a point, redrawing only the area it moved across
+    # Parameters:
+    #   Tuple pos: (x, y) screen position
+    # Returns: N/A
+    def move_shape_to(self, pos):
+        image_x, image_y = self.image_display.rect.topleft
+        old_rect = self.drawn_rect
+        self.shape_to_draw.x = pos[0] - image_x
+        self.shape_to_draw.y = pos[1] - image_y
+        new_rect = self.shape_to_draw.get_drawn_rect(image_x, image_y)
+        # The line is drawn half outside the shape's rect, so a little extra is redrawn
+        area = old_rect.union(new_rect).inflate(self.shape_to_draw.line_width * 2, self.shape_to_draw.line_width * 2)
+        self.draw_image_area(area.clip(pygame.Rect(510, 0, self.screen.get_width() - 510,
+                                                   self.screen.get_height())))
+
+    # Method: handle_click
+    # Purpose: handles a mouse click on the shape, a saved shape, a button or an input box
+    # Parameters:
+    #   Tuple pos: (x, y) screen position of the click
+    # Returns: N/A
+    def handle_click(self, pos):
+        self.active_box = None
+        image_x, image_y = self.image_display.rect.topleft
+
+        # Set move_shape to True if the user clicks the shape
+        if self.shape_rect.collidepoint(pos):
+            self.move_shape = True
+
+        # If the user clicks a saved shape, load its data so it can be used as the new shape
+        elif self.image_display.rect.collidepoint(pos):
+            shape_index, index_image = get_image_shapes(self.image_text)
+            if shape_index is not None:
+                shape_id = shape_index.find_at(index_image, (pos[0] - image_x) / self.image_scale,
+                                               (pos[1] - image_y) / self.image_scale)
+                if shape_id is not None:
+                    self.selected = (get_image_shape_file(self.image_text), shape_id)
+                    self.load_saved_shape(shape_index.shapes[shape_id])
+
+        # If new shape button is clicked, refresh the display with the new shape data
+        if self.new_shape_button.is_clicked():
+            self.generate()
+
+        # If one of the save data buttons is clicked, save the shape data to the correct json file
+        if self.save_static_data_button.is_clicked():
+            self.save_shape(static_output_file)
+
+        if self.save_live_data_button.is_clicked():
+            self.save_shape(live_output_file)
+
+        # If the user clicks an input box, set it as active
+        for box_name, (label, rect, text) in self.input_boxes.items():
+            if rect.collidepoint(pos):
+                self.active_box = box_name
+                break
+
+    # Method: save_shape
+    # Purpose: saves the shape being placed, replacing the selected saved shape if it is from the same json file
+    # Parameters:
+    #   String output_file: shape data json file
+    # Returns: N/A
+    def save_shape(self, output_file):
+        shape_id = None
+        if self.selected is not None and self.selected[0] == output_file:
+            shape_id = self.selected[1]
+        if save_shape_data(self.shape_to_draw.get_scaled_shape(self.image_scale), output_file, shape_id) is not None:
+            self.edited_files.append(output_file)
+        self.draw_image_area(self.image_display.rect)
+
+    # Method: delete_selected
+    # Purpose: deletes the selected saved shape
+    # Parameters: N/A
+    # Returns: N/A
+    def delete_selected(self):
+        if self.selected is None:
+            return
+        delete_shape_data(*self.selected)
+        self.edited_files.append(self.selected[0])
+        self.selected = None
+        self.draw_image_area(self.image_display.rect)
+
+    # Method: undo
+    # Purpose: undoes the most recent save or delete
+    # Parameters: N/A
+    # Returns: N/A
+    def undo(self):
+        if len(self.edited_files) == 0:
+            return
+        output_file = self.edited_files.pop()
+        undo_shape_data(output_file)
+        # The selected shape is gone if the undo removed it
+        if self.selected is not None and self.selected[0] == output_file:
+            shape_index = get_shape_index(output_file)
+            if shape_index is None or self.selected[1] not in shape_index.shapes:
+                self.selected = None
+        self.draw_image_area(self.image_display.rect)
+
+    # Method: handle_key
+    # Purpose: handles a key press that isn't typing in an input box (undo, delete and deselect)
+    # Parameters:
+    #   Event event: KEYDOWN event
+    # Returns:
+    #   Bool handled: whether the key did something
+    def handle_key(self, event):
+        if event.key == pygame.K_z and event.mod & pygame.KMOD_CTRL:
+            self.undo()
+        elif self.active_box is not None:
+            return False
+        elif event.key == pygame.K_DELETE:
+            self.delete_selected()
+        elif event.key == pygame.K_ESCAPE:
+            # The next save adds a new shape
+            self.selected = None
+            self.draw_image_area(self.image_display.rect)
+        else:
+            return False
+        return True
+
+    # Method: run
+    # Purpose: runs the event loop until the user closes the window
+    # Parameters: N/A
+    # Returns: N/A
+    def run(self):
+        self.running = True
+
+        # Runtime loop controls the GUI
+        while self.running:
+
+            # Set clock cycle to make the program less intensive
+            self.clock.tick(60)
+
+            # Handles user events
+            for event in pygame.event.get():
+
+                if event.type == pygame.QUIT:
+                    self.running = False
+
+                elif event.type == pygame.MOUSEBUTTONDOWN:
+                    self.handle_click(event.pos)
+
+                # Set move_shape to False if the user releases the mouse
+                elif event.type == pygame.MOUSEBUTTONUP:
+                    self.move_shape = False
+
+                # Undo, delete and deselect keys, otherwise if an input box is active, add the text to that box
+                elif event.type == pygame.KEYDOWN:
+                    if not self.handle_key(event) and self.active_box is not None:
+                        box = self.input_boxes[self.active_box]
+                        box[2] = set_user_text(event, box[2])
+                        self.draw_input_box(self.active_box)
+
+                # Redraw the whole window if it was covered up
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    self.dirty_rects.append(self.screen.get_rect())
+
+            # Update the position of the shape if it is being moved
+            if self.move_shape:
+                pos = pygame.mouse.get_pos()
+                image_x, image_y = self.image_display.rect.topleft
+                if (pos[0] - image_x, pos[1] - image_y) != (self.shape_to_draw.x, self.shape_to_draw.y):
+                    self.move_shape_to(pos)
+
+            if len(self.dirty_rects) > 0:
+                pygame.display.update(self.dirty_rects)
+                self.dirty_rects = []
+
+            # Write edits that have been waiting a while to the json files
+            for session in shape_sessions.values():
+                session.maybe_compact()
+
+        close_shape_sessions()
+        pygame.quit()
+
+
 # Method: gui
-# Purpose: Creates and runs a pygame GUI
+# Purpose: Creates a pygame GUI and runs it until the window is closed
 # Parameters:
 #   Int pos_x: x position of the shape (left)
 #   Int pos_y: y position of the shape (top)
@@ -169,271 +748,9 @@ def set_user_text(event, user_text):
 #   String live_image: live image filename
 # Returns: N/A
 def gui(pos_x, pos_y, height, width, shape, name, image_number, move_shape, key, image_scale, live_image):
-
-    # Initialize the GUI
-    pygame.init()
-    size = (1920,1010)
-    screen = pygame.display.set_mode(size)
-    pygame.display.set_caption("Indicon Inspection Results")
-
-    # Color constants
-    text_color = (220,220,225)
-    background = (51,51,51)
-    dark_text_color = (20,20,20)
-
-    # Initialize images for buttons
-    new_shape_button_image = pygame.image.load("generate_button.png").convert()
-    save_static_data_button_image = pygame.image.load("save_static_data_button.png").convert()
-    save_live_data_button_image = pygame.image.load("save_live_data_button.png").convert()
-
-    screen.fill(background)
-    font = pygame.font.SysFont("Times New Roman", size=22)
-
-    # Constants for input box dimensions
-    input_box_width = 125
-    input_box_height = 30
-
-    # Initialize input boxes
-    image_scale_input_label = font.render("scale:", True, text_color)
-    screen.blit(image_scale_input_label, (25, 50))
-    image_scale_input_rect = pygame.Rect(100, 50, input_box_width, input_box_height)
-    image_scale_text = image_scale
-
-    shape_key_input_label = font.render("key:", True, text_color)
-    screen.blit(shape_key_input_label, (25, 100))
-    shape_key_input_rect = pygame.Rect(100, 100, input_box_width, input_box_height)
-    shape_key_text = key
-
-    image_input_label = font.render("image:", True, text_color)
-    screen.blit(image_input_label, (25, 150))
-    image_input_rect = pygame.Rect(100, 150, input_box_width, input_box_height)
-    image_text = image_number
-
-    pos_x = pos_x
-    pos_y = pos_y
-
-    height_input_label = font.render("height:", True, text_color)
-    screen.blit(height_input_label, (25, 200))
-    height_input_rect = pygame.Rect(100, 200, input_box_width, input_box_height)
-    height_text = height
-
-    width_input_label = font.render("width:", True, text_color)
-    screen.blit(width_input_label, (25, 250))
-    width_input_rect = pygame.Rect(100, 250, input_box_width, input_box_height)
-    width_text = width
-
-    shape_input_label = font.render("shape:", True, text_color)
-    screen.blit(shape_input_label, (25, 300))
-    shape_input_rect = pygame.Rect(100, 300, input_box_width, input_box_height)
-    shape_text = shape
-
-    name_input_label = font.render("name:", True, text_color)
-    screen.blit(name_input_label, (25, 350))
-    name_input_rect = pygame.Rect(100, 350, input_box_width, input_box_height)
-    name_text = name
-
-    live_image_input_label = font.render("live image:", True, text_color)
-    screen.blit(live_image_input_label, (25, 400))
-    live_image_input_rect = pygame.Rect(140, 400, input_box_width, input_box_height)
-    live_image_text = live_image
-
-    # Initialize buttons
-    new_shape_button = Button.Button(x=75, y=450, image=new_shape_button_image, scale=1)
-    new_shape_button.draw(screen)
-
-    save_static_data_button = Button.Button(x=75, y=500, image=save_static_data_button_image, scale=1)
-    save_static_data_button.draw(screen)
-
-    save_live_data_button = Button.Button(x=75, y=550, image=save_live_data_button_image, scale=1)
-    save_live_data_button.draw(screen)
-
-    # Chooses the displayed image based on the user's input
-    image_file = "doge_wink.JPG"  # Default Image
-    # TODO: Put your images here that you want to draw shapes on
-    match image_text:
-        case '1':
-            image_file = "IP_Image_1.png"  # Ex: Top View
-        case '2':
-            image_file = "IP_Image_1.png"  # Ex: Front View
-        case '3':
-            image_file = "IP_Image_1.png"  # Ex: Bottom View
-        case '4':
-            if live_image_text == "":
-                image_file = image_file
-            else:
-                image_file = directory + '\\' + live_image_text
-
-    image = pygame.image.load(image_file).convert()
-
-    # Display the image on the screen
-    image_label = font.render("Image " + image_text + ":", True, text_color)
-    screen.blit(image_label, (420, 35))
-    image_scale = float(image_scale_text)
-    image_display = Button.Button(x=510, y=35, image=image, scale=image_scale)
-    image_display.draw(screen)
-
-    image_offset_x, image_offset_y = image_display.rect.topleft
-
-    # Initialize the shape to be drawn on the screen
-    shape_to_draw = ShapeToDraw(name=name_text, shape=int(shape_text), color=1, display_name=1, x=pos_x, y=pos_y,
-                                height=float(height_text), width=float(width_text), key=shape_key_text,
-                                image=image_text)
-    # draw shape and get the rect of the shape
-    shape_rect = shape_to_draw.draw_shape(screen, image_offset_x, image_offset_y)
-
-    # Set clock cycle to make the program less intensive
-    clock = pygame.time.Clock()
-
-    running = True  # Boolean value to show whether the current gui() instance is running or not
-
-    # Booleans show whether the given input box is active or not
-    height_active = False
-    width_active = False
-    shape_active = False
-    name_active = False
-    image_active = False
-    shape_key_active = False
-    scale_active = False
-    live_image_active = False
-
-    # Shows whether the shape is being moved or not
-    move_shape = move_shape
-
-    # Initialize the clipboard capability
-    pygame.scrap.init()
-    pygame.scrap.set_mode(pygame.SCRAP_CLIPBOARD)
-
-    # Runtime loop controls the GUI
-    while running:
-
-        clock.tick(60)
-
-        # Handles user events
-        for event in pygame.event.get():
-
-            if event.type == pygame.QUIT:
-                running = False
-
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                # Reset all input box bools to False
-                height_active = False
-                width_active = False
-                shape_active = False
-                name_active = False
-                image_active = False
-                shape_key_active = False
-                scale_active = False
-                live_image_active = False
-
-                # Set move_shape to True if the user clicks the shape
-                if shape_rect.collidepoint(event.pos):
-                    move_shape = True
-
-                # If new shape button is clicked, refresh the display with the new shape data
-                if new_shape_button.is_clicked():
-                    running = False
-                    gui(pos_x, pos_y, height_text, width_text, shape_text, name_text,
-                        image_text, False, shape_key_text, image_scale_text, live_image_text)
-
-                # If one of the save data buttons is clicked, save the shape data to the correct json file
-                if save_static_data_button.is_clicked():
-                    output_file = "ShapeData.json"  # TODO: Change to your static image shape data json file
-                    save_shape_data(shape_to_draw.get_scaled_shape(image_scale), output_file)
-
-                if save_live_data_button.is_clicked():
-                    output_file = "LiveImageShapes.json"  # TODO: Change to your live image shape data json file
-                    save_shape_data(shape_to_draw.get_scaled_shape(image_scale), output_file)
-
-                # If the user clicks an input box, set its boolean as active
-                if height_input_rect.collidepoint(event.pos):
-                    height_active = True
-                elif width_input_rect.collidepoint(event.pos):
-                    width_active = True
-                elif shape_input_rect.collidepoint(event.pos):
-                    shape_active = True
-                elif name_input_rect.collidepoint(event.pos):
-                    name_active = True
-                elif image_input_rect.collidepoint(event.pos):
-                    image_active = True
-                elif shape_key_input_rect.collidepoint(event.pos):
-                    shape_key_active = True
-                elif image_scale_input_rect.collidepoint(event.pos):
-                    scale_active = True
-                elif live_image_input_rect.collidepoint(event.pos):
-                    live_image_active = True
-
-            # Set move_shape to False if the user releases the mouse
-            if event.type == pygame.MOUSEBUTTONUP:
-                move_shape = False
-
-            if event.type == pygame.KEYDOWN:
-
-                # If an input box is active, add the text to that box
-                if height_active:
-                    height_text = set_user_text(event, height_text)
-                elif width_active:
-                    width_text = set_user_text(event, width_text)
-                elif shape_active:
-                    shape_text = set_user_text(event, shape_text)
-                elif name_active:
-                    name_text = set_user_text(event, name_text)
-                elif image_active:
-                    image_text = set_user_text(event, image_text)
-                elif shape_key_active:
-                    shape_key_text = set_user_text(event, shape_key_text)
-                elif scale_active:
-                    image_scale_text = set_user_text(event, image_scale_text)
-                elif live_image_active:
-                    live_image_text = set_user_text(event, live_image_text)
-
-        # Update the position of the shape if it is being moved
-        if move_shape:
-            running = False
-            pos_x, pos_y = pygame.mouse.get_pos()
-            gui(pos_x - image_offset_x, pos_y - image_offset_y, height_text, width_text, shape_text, name_text,
-                image_text, True, shape_key_text, image_scale_text, live_image_text)
-
-        # Draw all input boxes
-        pygame.draw.rect(screen, text_color, rect=height_input_rect)
-        pygame.draw.rect(screen, text_color, rect=width_input_rect)
-        pygame.draw.rect(screen, text_color, rect=shape_input_rect)
-        pygame.draw.rect(screen, text_color, rect=name_input_rect)
-        pygame.draw.rect(screen, text_color, rect=image_input_rect)
-        pygame.draw.rect(screen, text_color, rect=shape_key_input_rect)
-        pygame.draw.rect(screen, text_color, rect=image_scale_input_rect)
-        pygame.draw.rect(screen, text_color, rect=live_image_input_rect)
-
-        # Create labels with the text
-        height_label = font.render(height_text, True, dark_text_color)
-        width_label = font.render(width_text, True, dark_text_color)
-        shape_label = font.render(shape_text, True, dark_text_color)
-        name_label = font.render(name_text, True, dark_text_color)
-        image_label = font.render(image_text, True, dark_text_color)
-        shape_key_label = font.render(shape_key_text, True, dark_text_color)
-        image_scale_label = font.render(image_scale_text, True, dark_text_color)
-        live_image_label = font.render(live_image_text, True, dark_text_color)
-
-        # Draw all labels
-        screen.blit(height_label, height_input_rect.topleft)
-        screen.blit(width_label, width_input_rect.topleft)
-        screen.blit(shape_label, shape_input_rect.topleft)
-        screen.blit(name_label, name_input_rect.topleft)
-        screen.blit(image_label, image_input_rect.topleft)
-        screen.blit(shape_key_label, shape_key_input_rect.topleft)
-        screen.blit(image_scale_label, image_scale_input_rect.topleft)
-        screen.blit(live_image_label, live_image_input_rect.topleft)
-
-        # Extend the input boxes if needed
-        height_input_rect.w = max(100, height_label.get_width() + 10)
-        width_input_rect.w = max(100, width_label.get_width() + 10)
-        shape_input_rect.w = max(100, shape_label.get_width() + 10)
-        name_input_rect.w = max(100, name_label.get_width() + 10)
-        image_input_rect.w = max(100, image_label.get_width() + 10)
-        shape_key_input_rect.w = max(100, shape_key_label.get_width() + 10)
-        image_scale_input_rect.w = max(100, image_scale_label.get_width() + 10)
-        live_image_input_rect.w = max(100, live_image_label.get_width() + 10)
-
-        pygame.display.flip()
+    editor = ShapeEditor(pos_x, pos_y, height, width, shape, name, image_number, key, image_scale, live_image)
+    editor.move_shape = move_shape
+    editor.run()
 
 
 # Method: main
@@ -0,0 +1,302 @@
+# Author: Tyler Brunette
+# Company: Indicon Corporation
+
+import pygame
+import Font_Cache
+
+# numpy is optional, it lets a whole list of shapes be placed on the screen with a few array operations instead of
+# working out each shape's rectangle in python (the viewer and shape editor draw shape by shape without it)
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Color of each shape color number (0 = Green, 1 = Red, 2 = Yellow, 3 = Cyan, 4 = Orange), anything else is red
+shape_colors = {0: (0, 255, 0), 1: (255, 0, 0), 2: (255, 240, 31), 3: (0, 255, 255), 4: (255, 165, 0)}
+text_background = (0, 0, 0)  # background of the name labels (black)
+
+
+# Class: StringTable
+# Purpose: Keeps one copy of each string and gives it a number, so a column of strings can be stored as numbers
+# Parameters: N/A
+# Returns: N/A
+class StringTable:
+
+    # Method: __init__
+    # Purpose: Initializes an empty StringTable object
+    # Parameters: N/A
+    # Returns: N/A
+    def __init__(self):
+        self.strings = []  # string number -> string
+        self.numbers = {}  # string -> string number
+
+    # Method: intern
+    # Purpose: gets the number of a string, adding the string if it isn't in the table yet
+    # Parameters:
+    #   String text: string to look up
+    # Returns:
+    #   Int number: number of the string
+    def intern(self, text):
+        number = self.numbers.get(text)
+        if number is None:
+            number = len(self.strings)
+            self.strings.append(text)
+            self.numbers[text] = number
+        return number
+
+
+# Class: ShapeStore
+# Purpose: A list of shapes stored as columns (one numpy array per value) instead of one object per shape. Names, keys
+#          and images are stored as numbers from a shared StringTable. Moving and scaling every shape, or working out
+#          where each one is drawn on the screen, is a few array operations no matter how many shapes there are.
+# Parameters:
+#   Array shapes: shape dicts (as saved in ShapeData.json) or ShapeToDraw objects
+#   StringTable strings: table to number the strings with (None for a new one)
+# Returns: N/A
+class ShapeStore:
+
+    # Method: __init__
+    # Purpose: Initializes a ShapeStore object with the values of each shape
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, shapes=(), strings=None):
+        if strings is None:
+            strings = StringTable()
+        self.strings = strings
+        numbers = []  # (x, y, width, height) of each shape
+        codes = []  # (shape, color, display_name, line_width, name, key, image) of each shape
+        for shape in shapes:
+            values = shape if isinstance(shape, dict) else shape.__dict__
+            key = values['key'] if 'key' in values else values['shape_key']
+            numbers.append((values['x'], values['y'], values['width'], values['height']))
+            codes.append((values['shape'], values.get('color', 1), values['display_name'],
+                          values.get('line_width', 5), strings.intern(values['name']), strings.intern(key),
+                          strings.intern(values['image'])))
+        numbers = numpy.array(numbers, dtype=numpy.float64).reshape(-1, 4)
+        codes = numpy.array(codes, dtype=numpy.int64).reshape(-1, 7)
+        self.x = numbers[:, 0].copy()  # center of the shape
+        self.y = numbers[:, 1].copy()
+        self.width = numbers[:, 2].copy()
+        self.height = numbers[:, 3].copy()
+        self.shape = codes[:, 0].astype(numpy.int8)  # 0 = circle, 1 = rectangle
+        self.color = codes[:, 1].astype(numpy.int8)  # see shape_colors
+        self.display_name = codes[:, 2].astype(numpy.int8)
+        self.line_width = codes[:, 3].astype(numpy.int16)
+        self.name = codes[:, 4].astype(numpy.int32)  # string numbers
+        self.key = codes[:, 5].astype(numpy.int32)
+        self.image = codes[:, 6].astype(numpy.int32)
+
+    # Method: __len__
+    # Purpose: gets the number of shapes
+    # Parameters: N/A
+    # Returns:
+    #   Int count: number of shapes
+    def __len__(self):
+        return len(self.x)
+
+    # Method: copy_columns
+    # Purpose: makes a ShapeStore from another one's columns, sharing its string table
+    # Parameters:
+    #   Function take: function that makes each new column from the old one
+    # Returns:
+    #   ShapeStore store: the new store
+    def copy_columns(self, take):
+        store = ShapeStore.__new__(ShapeStore)  # the columns are filled in below instead of from shapes
+        store.strings = self.strings
+        for column in ('x', 'y', 'width', 'height', 'shape', 'color', 'display_name', 'line_width', 'name', 'key',
+                       'image'):
+            setattr(store, column, take(getattr(self, column)))
+        return store
+
+    # Method: select
+    # Purpose: gets some of the shapes
+    # Parameters:
+    #   Array indices: positions of the shapes to keep, in the order to keep them
+    # Returns:
+    #   ShapeStore store: the selected shapes
+    def select(self, indices):
+        indices = numpy.asarray(indices, dtype=numpy.intp)
+        return self.copy_columns(lambda column: column[indices])
+
+    # Method: scaled
+    # Purpose: gets the shapes with their position and size multiplied by a scale factor
+    # Parameters:
+    #   Float scale: scale factor
+    # Returns:
+    #   ShapeStore store: the scaled shapes
+    def scaled(self, scale):
+        store = self.copy_columns(lambda column: column)
+        store.x = self.x * scale
+        store.y = self.y * scale
+        store.width = self.width * scale
+        store.height = self.height * scale
+        return store
+
+    # Method: find_key
+    # Purpose: gets the positions of the shapes with a key
+    # Parameters:
+    #   String key: key from the inspection's ResultParameters
+    # Returns:
+    #   Array indices: positions of the matching shapes
+    def find_key(self, key):
+        number = self.strings.numbers.get(key)
+        if number is None:
+            return numpy.zeros(0, dtype=numpy.intp)
+        return numpy.flatnonzero(self.key == number)
+
+    # Method: get_shape
+    # Purpose: gets one shape as a dict laid out like ShapeData.json
+    # Parameters:
+    #   Int index: position of the shape
+    # Returns:
+    #   Dict shape: the shape's values
+    def get_shape(self, index):
+        strings = self.strings.strings
+        return {'name': strings[self.name[index]], 'shape': int(self.shape[index]), 'color': int(self.color[index]),
+                'display_name': int(self.display_name[index]), 'x': float(self.x[index]), 'y': float(self.y[index]),
+                'height': float(self.height[index]), 'width': float(self.width[index]),
+                'key': strings[self.key[index]], 'image': strings[self.image[index]],
+                'line_width': int(self.line_width[index])}
+
+    # Method: get_image_offsets
+    # Purpose: gets the position and scale of the image each shape is drawn on
+    # Parameters:
+    #   Dict image_positions: image -> (x, y, scale) of the images on the screen
+    #   Bool carry: a shape on an image that isn't listed is drawn on the image of the shape before it (like the
+    #               viewer always has), instead of at (0, 0) with scale 1
+    # Returns:
+    #   Tuple offsets: (x, y, scale) arrays with one value per shape
+    def get_image_offsets(self, image_positions, carry=False):
+        # Slot 0 of each table is for images that aren't listed
+        table_x = [0.0]
+        table_y = [0.0]
+        table_scale = [1.0]
+        slots = numpy.zeros(len(self.strings.strings), dtype=numpy.intp)  # string number -> slot
+        for image, (x, y, scale) in image_positions.items():
+            number = self.strings.numbers.get(image)
+            if number is not None:
+                slots[number] = len(table_x)
+                table_x.append(x)
+                table_y.append(y)
+                table_scale.append(scale)
+        lookup = slots[self.image]
+        if carry and len(lookup) > 0:
+            # Position of the last shape at or before each shape that is on a listed image (-1 if there isn't one)
+            last = numpy.maximum.accumulate(numpy.where(lookup > 0, numpy.arange(len(lookup)), -1))
+            lookup = numpy.where(last >= 0, lookup[last], 0)
+        return numpy.array(table_x)[lookup], numpy.array(table_y)[lookup], numpy.array(table_scale)[lookup]
+
+    # Method: get_screen_rects
+    # Purpose: gets where each shape is drawn on the screen
+    # Parameters:
+    #   Float/Array image_x: x position of the image the shapes are on (left), one value or one per shape
+    #   Float/Array image_y: y position of the image the shapes are on (top)
+    #   Float/Array scale: scale factor of the image
+    # Returns:
+    #   Tuple rects: (left, top, width, height) arrays with one value per shape
+    def get_screen_rects(self, image_x, image_y, scale):
+        width = self.width*scale
+        height = self.height*scale
+        return image_x + self.x*scale - (width/2), image_y + self.y*scale - (height/2), width, height
+
+    # Method: get_label_positions
+    # Purpose: gets where each shape's name label is drawn on the screen (above the shape, starting at its center)
+    # Parameters:
+    #   Float/Array image_x: x position of the image the shapes are on (left), one value or one per shape
+    #   Float/Array image_y: y position of the image the shapes are on (top)
+    #   Float/Array scale: scale factor of the image
+    #   Float gap: space between the label and the shape, in line widths
+    # Returns:
+    #   Tuple positions: (x, y) arrays with one value per shape
+    def get_label_positions(self, image_x, image_y, scale, gap):
+        return image_x + self.x*scale, image_y + self.y*scale - (self.height*scale/2) - (self.line_width*gap)
+
+    # Method: get_font_sizes
+    # Purpose: gets the font size of each shape's name label, in proportion to the shape's size on the screen
+    # Parameters:
+    #   Float/Array scale: scale factor of the image
+    #   Float ratio: font size per pixel of the shape's width plus height
+    #   Int largest: largest font size
+    # Returns:
+    #   Array font_sizes: font size of each shape
+    def get_font_sizes(self, scale, ratio=.2, largest=20):
+        return numpy.minimum(((self.width + self.height)*scale*ratio).astype(int), largest)
+
+
+# Method: get_library_store
+# Purpose: gets every shape of a shape library as a ShapeStore, so an inspection's shapes are picked out of its columns
+#          by position (see ShapeStore.select) instead of being built one at a time. Built the first time and kept on
+#          the library, which is never modified (a changed shape file is loaded as a new library).
+# Parameters:
+#   ShapeLibrary library: Shape_Library.ShapeLibrary or Shape_Binary.BinaryShapeLibrary
+# Returns:
+#   ShapeStore store: every shape of the library, in file order
+def get_library_store(library):
+    if library.store is not None:
+        return library.store
+    if not hasattr(library, 'columns'):
+        library.store = ShapeStore(library.shapes)
+        return library.store
+
+    # A compiled library already has its shapes as columns and its strings numbered, so they are copied as they are
+    strings = StringTable()
+    for number in range(library.string_count):
+        strings.intern(library.get_string(number))
+    store = ShapeStore.__new__(ShapeStore)  # the columns are filled in below instead of from shapes
+    store.strings = strings
+    for column, dtype in (('x', numpy.float64), ('y', numpy.float64), ('width', numpy.float64),
+                          ('height', numpy.float64), ('shape', numpy.int8), ('color', numpy.int8),
+                          ('display_name', numpy.int8), ('line_width', numpy.int16), ('name', numpy.int32),
+                          ('key', numpy.int32), ('image', numpy.int32)):
+        setattr(store, column, numpy.array(library.columns[column]).astype(dtype))
+    library.store = store
+    return store
+
+
+# Method: draw_shapes
+# Purpose: draws every shape of a ShapeStore where get_screen_rects and get_label_positions placed it
+# Parameters:
+#   Surface screen: surface to draw the shapes on
+#   ShapeStore store: shapes to draw
+#   Tuple rects: (left, top, width, height) arrays from get_screen_rects
+#   Tuple label_positions: (x, y) arrays from get_label_positions
+#   Array font_sizes: font size of each shape's name label (see get_font_sizes)
+# Returns:
+#   Array drawn_rects: area of the screen drawn on by each shape (shape and name label)
+def draw_shapes(screen, store, rects, label_positions, font_sizes):
+    drawn_rects = []
+    names = store.strings.strings
+    for left, top, width, height, label_x, label_y, font_size, shape, color, display_name, line_width, name in zip(
+            *[column.tolist() for column in rects], *[column.tolist() for column in label_positions],
+            numpy.broadcast_to(font_sizes, store.x.shape).tolist(), store.shape.tolist(), store.color.tolist(),
+            store.display_name.tolist(), store.line_width.tolist(), store.name.tolist()):
+        shape_color = shape_colors.get(color, (255, 0, 0))
+        rect = (left, top, width, height)
+        if shape == 0:
+            pygame.draw.ellipse(surface=screen, color=shape_color, rect=rect, width=line_width)
+        elif shape == 1:
+            pygame.draw.rect(surface=screen, color=shape_color, rect=rect, width=line_width)
+        rect = pygame.Rect(rect)
+        if display_name:
+            name_label = Font_Cache.render_text(names[name], font_size, shape_color, text_background)
+            rect = rect.union(screen.blit(name_label, (label_x, label_y)))
+        drawn_rects.append(rect)
+    return drawn_rects
+
+
+# Method: get_drawn_rects
+# Purpose: gets the area of the screen draw_shapes would draw on for each shape, without drawing
+# Parameters: See draw_shapes
+# Returns:
+#   Array drawn_rects: area of the screen covered by each shape (shape and name label)
+def get_drawn_rects(store, rects, label_positions, font_sizes):
+    drawn_rects = []
+    names = store.strings.strings
+    for left, top, width, height, label_x, label_y, font_size, display_name, name in zip(
+            *[column.tolist() for column in rects], *[column.tolist() for column in label_positions],
+            numpy.broadcast_to(font_sizes, store.x.shape).tolist(), store.display_name.tolist(), store.name.tolist()):
+        rect = pygame.Rect(left, top, width, height)
+        if display_name:
+            rect = rect.union(pygame.Rect((label_x, label_y), Font_Cache.get_font(font_size).size(names[name])))
+        drawn_rects.append(rect)
+    return drawn_rects
@@ -0,0 +1,284 @@
+# Author: Tyler Brunette
+# Company: Indicon Corporation
+
+import collections
+import concurrent.futures
+import os
+import shutil
+import threading
+import time
+import Inspection_Parser
+
+
+# Class: ShareMirror
+# Purpose: Keeps a copy of the newest inspection files and their failure images on the local disk, so the viewer never
+#          reads from the Windows share itself. Each new file on the share is copied on a small pool of threads: its
+#          failure images first, then the json file, which is renamed into place and published to the local watcher
+#          once everything it needs is there. Files missing from the mirror (ex: deleted to stay under the size limit)
+#          are copied the first time they are asked for (see fetch). The oldest files are deleted once the mirror is
+#          over its size limit.
+# Parameters:
+#   InspectionWatcher share_watcher: watcher of the share (started by start())
+#   InspectionWatcher local_watcher: watcher of the local mirror folder (the one the viewer uses, it is never started,
+#                                    the mirror publishes each file to it instead)
+#   Int max_bytes: size limit of the mirror folder in bytes
+#   Int workers: number of files copied at the same time
+#   Float latency: seconds to wait before every read from the share (to test against a slow share, 0 normally)
+#   Int initial_files: number of the share's newest files to copy when the mirror starts
+# Returns: N/A
+class ShareMirror:
+
+    # Method: __init__
+    # Purpose: Initializes a ShareMirror object
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, share_watcher, local_watcher, max_bytes=2 * 1024 * 1024 * 1024, workers=4, latency=0.0,
+                 initial_files=20):
+        self.share_watcher = share_watcher
+        self.local_watcher = local_watcher
+        self.share_directory = share_watcher.directory
+        self.mirror_directory = local_watcher.directory
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.latency = latency
+        self.initial_files = initial_files
+        self.files = collections.OrderedDict()  # mirrored file path -> size in bytes, oldest first
+        self.total_bytes = 0
+        self.jobs = {}  # share json file -> Future of its mirror_file job
+        self.copied = 0  # files copied from the share
+        self.copied_bytes = 0
+        self.fetched = 0  # files copied by fetch because they were missing from the mirror
+        self.evictions = 0  # files deleted to stay under the size limit
+        self.lock = threading.Lock()
+        self.executor = None
+
+    # Method: get_local_file
+    # Purpose: gets the mirror location of a file on the share
+    # Parameters:
+    #   String share_file: file location on the share
+    # Returns:
+    #   String local_file: file location in the mirror folder
+    def get_local_file(self, share_file):
+        return os.path.join(self.mirror_directory, os.path.relpath(share_file, self.share_directory))
+
+    # Method: get_share_file
+    # Purpose: gets the share location of a file in the mirror folder
+    # Parameters:
+    #   String local_file: file location in the mirror folder
+    # Returns:
+    #   String share_file: file location on the share
+    def get_share_file(self, local_file):
+        return os.path.join(self.share_directory, os.path.relpath(local_file, self.mirror_directory))
+
+    # Method: start
+    # Purpose: indexes the files already in the mirror, copies the share's newest files and starts copying each new
+    #          file that arrives on the share
+    # Parameters: N/A
+    # Returns: N/A
+    def start(self):
+        if self.executor is not None:
+            return
+        os.makedirs(self.mirror_directory, exist_ok=True)
+        found = []
+        for folder, folder_names, file_names in os.walk(self.mirror_directory):
+            for file_name in file_names:
+                path = os.path.join(folder, file_name)
+                if file_name.endswith(".part"):
+                    os.remove(path)  # left over from a copy that was stopped part way
+                    continue
+                stat = os.stat(path)
+                found.append((stat.st_mtime, stat.st_size, path))
+        found.sort()
+        with self.lock:
+            for mtime, size, path in found:
+                self.files[path] = size
+                self.total_bytes = self.total_bytes + size
+
+        # Copies keep the share's modified time, so both the files already here and the ones copied from now on are
+        # sorted by when they were written to the share, not by when they were copied
+        for mtime, size, path in found:
+            if self.local_watcher.is_inspection_file(path):
+                self.local_watcher.publish(path, mtime)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+        self.evict()
+
+        # The share is indexed before the listener is added, so only its newest files are copied
+        self.share_watcher.scan()
+        self.share_watcher.check_pending(settled=True)
+        share_files = self.share_watcher.get_files()
+        for share_file in share_files[max(0, len(share_files) - self.initial_files):]:
+            self.submit(share_file)
+        self.share_watcher.add_listener(self.submit)
+        self.share_watcher.start()
+
+    # Method: stop
+    # Purpose: stops watching the share, dropping copies that haven't started
+    # Parameters: N/A
+    # Returns: N/A
+    def stop(self):
+        self.share_watcher.stop()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    # Method: submit
+    # Purpose: starts copying a new inspection file and its failure images from the share (safe to call from any
+    #          thread, ex: as a listener of the share watcher)
+    # Parameters:
+    #   String share_file: inspection file on the share
+    # Returns: N/A
+    def submit(self, share_file):
+        with self.lock:
+            if self.executor is None or share_file in self.jobs:
+                return
+            # Only the newest jobs are kept, so the same file is not copied twice
+            while len(self.jobs) >= 256:
+                del self.jobs[next(iter(self.jobs))]
+            self.jobs[share_file] = self.executor.submit(self.mirror_file, share_file)
+
+    # Method: mirror_file
+    # Purpose: copies an inspection file and its failure images, then publishes it to the local watcher (runs on the
+    #          thread pool)
+    # Parameters:
+    #   String share_file: inspection file on the share
+    # Returns: N/A
+    def mirror_file(self, share_file):
+        local_file = self.get_local_file(share_file)
+        try:
+            if local_file not in self.files:
+                # The images are read from the local copy of the json file, so the share is only read once
+                temp_file = self.copy_to_temp(share_file, local_file)
+                try:
+                    try:
+                        image_files = Inspection_Parser.get_failure_images(temp_file, self.share_directory)
+                    except ValueError as error:
+                        print("Could not read the images of " + share_file + ": " + str(error))
+                        image_files = []
+                    for image_file in image_files:
+                        self.copy(image_file)
+                    os.replace(temp_file, local_file)
+                finally:
+                    self.remove_temp(temp_file)
+                self.add_file(local_file)
+            self.local_watcher.publish(local_file, os.stat(local_file).st_mtime)
+        except OSError as error:
+            print("Could not mirror " + share_file + ": " + str(error))
+
+    # Method: copy_to_temp
+    # Purpose: copies a file from the share next to its mirror location, keeping its modified time
+    # Parameters:
+    #   String share_file: file location on the share
+    #   String local_file: file location in the mirror folder
+    # Returns:
+    #   String temp_file: location of the copy (rename it to local_file once it is ready)
+    def copy_to_temp(self, share_file, local_file):
+        os.makedirs(os.path.dirname(local_file), exist_ok=True)
+        temp_file = local_file + "." + str(threading.get_ident()) + ".part"
+        if self.latency > 0:
+            time.sleep(self.latency)
+        try:
+            shutil.copy2(share_file, temp_file)
+        except OSError:
+            self.remove_temp(temp_file)  # the share went away part way through the copy
+            raise
+        with self.lock:
+            self.copied = self.copied + 1
+            self.copied_bytes = self.copied_bytes + os.path.getsize(temp_file)
+        return temp_file
+
+    # Method: copy
+    # Purpose: copies a file from the share into the mirror folder, unless it is already there
+    # Parameters:
+    #   String share_file: file location on the share
+    # Returns:
+    #   String local_file: file location in the mirror folder
+    def copy(self, share_file):
+        local_file = self.get_local_file(share_file)
+        with self.lock:
+            if local_file in self.files:
+                self.files.move_to_end(local_file)
+                return local_file
+        temp_file = self.copy_to_temp(share_file, local_file)
+        try:
+            os.replace(temp_file, local_file)
+        finally:
+            self.remove_temp(temp_file)
+        self.add_file(local_file)
+        return local_file
+
+    # Method: remove_temp
+    # Purpose: deletes a temporary copy that was not renamed into place (ex: an image it needs could not be copied)
+    # Parameters:
+    #   String temp_file: location of the copy (see copy_to_temp)
+    # Returns: N/A
+    def remove_temp(self, temp_file):
+        try:
+            os.remove(temp_file)
+        except FileNotFoundError:
+            pass  # already renamed into place
+        except OSError as error:
+            print("Could not delete " + temp_file + ": " + str(error))
+
+    # Method: add_file
+    # Purpose: adds a copied file to the mirror's list and keeps the folder under its size limit
+    # Parameters:
+    #   String local_file: file location in the mirror folder
+    # Returns: N/A
+    def add_file(self, local_file):
+        size = os.path.getsize(local_file)
+        with self.lock:
+            self.total_bytes = self.total_bytes - self.files.pop(local_file, 0) + size
+            self.files[local_file] = size
+        self.evict()
+
+    # Method: fetch
+    # Purpose: gets a file from the mirror, copying it from the share first if it isn't there (ex: it was deleted to
+    #          stay under the size limit, or its copy hasn't finished yet). The copy reads from the share, so only call
+    #          this from a background thread (ex: the inspection pipeline), never from the render loop.
+    # Parameters:
+    #   String local_file: file location in the mirror folder
+    # Returns:
+    #   String file_name: location to read the file from (the share, if it could not be copied)
+    def fetch(self, local_file):
+        with self.lock:
+            if local_file in self.files:
+                return local_file
+        share_file = self.get_share_file(local_file)
+        try:
+            self.copy(share_file)
+        except OSError as error:
+            print("Could not mirror " + share_file + ": " + str(error))
+            return share_file
+        with self.lock:
+            self.fetched = self.fetched + 1
+        return local_file
+
+    # Method: evict
+    # Purpose: deletes the oldest files until the mirror is under its size limit (the newest file is always kept)
+    # Parameters: N/A
+    # Returns: N/A
+    def evict(self):
+        removed = []
+        with self.lock:
+            while self.total_bytes > self.max_bytes and len(self.files) > 1:
+                path, size = self.files.popitem(last=False)
+                self.total_bytes = self.total_bytes - size
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                removed.append(path)
+                self.evictions = self.evictions + 1
+        for path in removed:
+            if self.local_watcher.is_inspection_file(path):
+                self.local_watcher.discard(path)
+
+    # Method: stats
+    # Purpose: gets the mirror counters
+    # Parameters: N/A
+    # Returns:
+    #   Dict stats: files and bytes copied, missing files copied by fetch, files deleted and size of the mirror
+    def stats(self):
+        with self.lock:
+            return {'copied': self.copied, 'copied_bytes': self.copied_bytes, 'fetched': self.fetched,
+                    'evictions': self.evictions, 'total_bytes': self.total_bytes, 'max_bytes': self.max_bytes}
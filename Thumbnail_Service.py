@@ -0,0 +1,211 @@
+# Author: Tyler Brunette
+# Company: Indicon Corporation
+
+import concurrent.futures
+import hashlib
+import os
+import threading
+import pygame
+import Image_Cache
+import Inspection_Parser
+
+
+# Method: get_thumbnail_file
+# Purpose: gets the sidecar file of a live image scaled by a scale factor
+# Parameters:
+#   String cache_directory: folder the sidecar files are kept in
+#   String image_file: file location of the live image
+#   Float scale: scale factor of the sidecar
+# Returns:
+#   String thumbnail_file: file location of the sidecar
+def get_thumbnail_file(cache_directory, image_file, scale):
+    name = hashlib.sha1(os.path.abspath(image_file).encode('utf-8')).hexdigest()
+    return os.path.join(cache_directory, name + "_" + repr(float(scale)) + ".png")
+
+
+# Method: make_thumbnails
+# Purpose: writes the sidecars of a live image (runs in a worker process)
+# Parameters:
+#   String image_file: file location of the live image
+#   String cache_directory: folder the sidecar files are kept in
+#   Array scales: scale factors to write a sidecar for
+# Returns:
+#   Array written: file locations of the sidecars that were written
+def make_thumbnails(image_file, cache_directory, scales):
+    written = []
+    image = None
+    for scale in scales:
+        thumbnail_file = get_thumbnail_file(cache_directory, image_file, scale)
+        try:
+            if os.path.getmtime(thumbnail_file) >= os.path.getmtime(image_file):
+                continue  # already made from this image
+        except OSError:
+            pass
+        try:
+            if image is None:
+                image = pygame.image.load(image_file)
+            # Same sizing as the viewer, so a sidecar looks the same as scaling the original
+            temp_file = thumbnail_file + "." + str(os.getpid()) + ".tmp.png"
+            pygame.image.save(Image_Cache.scale_surface(image, scale), temp_file)
+            os.replace(temp_file, thumbnail_file)
+            written.append(thumbnail_file)
+        except (OSError, pygame.error) as error:
+            print("Could not make a thumbnail of " + image_file + ": " + str(error))
+            break
+    return written
+
+
+# Class: ThumbnailService
+# Purpose: Writes scaled-down copies (sidecars) of each new inspection's failure images on a pool of worker processes
+#          as soon as the inspection file arrives, so the viewer can load a small sidecar instead of decoding the
+#          full size live image from the share. Sidecars are kept in a local folder, and the least recently used are
+#          deleted once the folder is over its size limit.
+# Parameters:
+#   String cache_directory: local folder to keep the sidecar files in
+#   String image_directory: directory the live images are stored in
+#   Array scales: scale factors to write a sidecar for (the scales the failure panel shows)
+#   Int max_bytes: size limit of the folder in bytes
+#   Int workers: number of worker processes
+# Returns: N/A
+class ThumbnailService:
+
+    # Method: __init__
+    # Purpose: Initializes a ThumbnailService object
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, cache_directory, image_directory, scales, max_bytes=256 * 1024 * 1024, workers=2):
+        self.cache_directory = cache_directory
+        self.image_directory = image_directory
+        self.scales = scales
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.jobs = {}  # live image file -> Future of its make_thumbnails job
+        self.written = 0  # sidecars written
+        self.evictions = 0  # sidecars deleted to stay under the size limit
+        self.lock = threading.Lock()
+        self.executor = None
+
+    # Method: start
+    # Purpose: starts the worker processes
+    # Parameters: N/A
+    # Returns: N/A
+    def start(self):
+        if self.executor is not None or self.cache_directory is None:
+            return
+        os.makedirs(self.cache_directory, exist_ok=True)
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+        self.evict()
+
+    # Method: stop
+    # Purpose: stops the worker processes, dropping jobs that haven't started
+    # Parameters: N/A
+    # Returns: N/A
+    def stop(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    # Method: submit
+    # Purpose: starts writing the sidecars of an inspection file's failure images, one job per image (safe to call
+    #          from any thread, ex: as a watcher listener, add it once the watcher has indexed the files already there
+    #          and before the pipeline's listener so prepare_image can wait on the jobs)
+    # Parameters:
+    #   String json_file: new inspection file
+    # Returns: N/A
+    def submit(self, json_file):
+        if self.executor is None:
+            return
+        try:
+            image_files = Inspection_Parser.get_failure_images(json_file, self.image_directory)
+        except (OSError, ValueError) as error:
+            print("Could not read the images of " + json_file + ": " + str(error))
+            return
+        for image_file in image_files:
+            with self.lock:
+                if self.executor is None or image_file in self.jobs:
+                    continue
+                # Only the newest jobs are kept for wait(), older ones that haven't started are dropped so new
+                # inspections never queue behind them
+                while len(self.jobs) >= 256:
+                    self.jobs.pop(next(iter(self.jobs))).cancel()
+                job = self.executor.submit(make_thumbnails, image_file, self.cache_directory, list(self.scales))
+                self.jobs[image_file] = job
+            job.add_done_callback(self.finish)
+
+    # Method: finish
+    # Purpose: counts the sidecars a job wrote and keeps the folder under its size limit (called when a job is done)
+    # Parameters:
+    #   Future job: finished make_thumbnails job
+    # Returns: N/A
+    def finish(self, job):
+        if job.cancelled():
+            return
+        error = job.exception()
+        if error is not None:
+            print("Could not make thumbnails: " + str(error))
+            return
+        with self.lock:
+            self.written = self.written + len(job.result())
+        self.evict()
+
+    # Method: wait
+    # Purpose: waits for the sidecars of a live image to be written (returns at once if there is no job for it)
+    # Parameters:
+    #   String image_file: file location of the live image
+    #   Float timeout: longest time to wait in seconds
+    # Returns: N/A
+    def wait(self, image_file, timeout):
+        with self.lock:
+            job = self.jobs.get(image_file)
+        if job is not None:
+            concurrent.futures.wait([job], timeout)
+
+    # Method: find
+    # Purpose: gets the sidecar of a live image, marking it as recently used
+    # Parameters:
+    #   String image_file: file location of the live image
+    #   Float scale: scale factor of the sidecar
+    # Returns:
+    #   String thumbnail_file: file location of the sidecar, or None if there isn't one
+    def find(self, image_file, scale):
+        if self.cache_directory is None:
+            return None
+        thumbnail_file = get_thumbnail_file(self.cache_directory, image_file, scale)
+        try:
+            os.utime(thumbnail_file)
+        except OSError:
+            return None
+        return thumbnail_file
+
+    # Method: evict
+    # Purpose: deletes the least recently used sidecars until the folder is under its size limit
+    # Parameters: N/A
+    # Returns: N/A
+    def evict(self):
+        with self.lock:
+            files = []
+            total_bytes = 0
+            for entry in os.scandir(self.cache_directory):
+                if entry.is_file() and entry.name.endswith(".png") and not entry.name.endswith(".tmp.png"):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+                    total_bytes = total_bytes + stat.st_size
+            files.sort()
+            for mtime, size, path in files:
+                if total_bytes <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total_bytes = total_bytes - size
+                self.evictions = self.evictions + 1
+
+    # Method: stats
+    # Purpose: gets the service counters
+    # Parameters: N/A
+    # Returns:
+    #   Dict stats: sidecars written and deleted
+    def stats(self):
+        with self.lock:
+            return {'written': self.written, 'evictions': self.evictions, 'max_bytes': self.max_bytes}
@@ -0,0 +1,343 @@
+# Author: Tyler Brunette
+# Company: Indicon Corporation
+
+import asyncio
+import collections
+import socket
+import struct
+import threading
+import time
+import Latency_Trace
+
+
+# Class: ClientStats
+# Purpose: Throughput and drop counters for one connected station
+# Parameters:
+#   String address: "ip:port" of the client
+# Returns: N/A
+class ClientStats:
+
+    # Method: __init__
+    # Purpose: Initializes a ClientStats object
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, address):
+        self.address = address
+        self.connected_time = time.time()
+        self.disconnected_time = None
+        self.bytes_received = 0
+        self.messages = 0  # complete messages received
+        self.coalesced = 0  # messages that repeated the message already waiting in the queue
+        self.dropped = 0  # messages lost because the queue was full or the message was too long
+
+    # Method: to_dict
+    # Purpose: gets the counters as a dict
+    # Parameters: N/A
+    # Returns:
+    #   Dict stats: counters plus bytes and messages per second while connected
+    def to_dict(self):
+        end_time = self.disconnected_time if self.disconnected_time is not None else time.time()
+        seconds = max(end_time - self.connected_time, 1e-9)
+        return {'address': self.address, 'connected': self.disconnected_time is None,
+                'bytes': self.bytes_received, 'messages': self.messages, 'coalesced': self.coalesced,
+                'dropped': self.dropped, 'bytes_per_second': self.bytes_received / seconds,
+                'messages_per_second': self.messages / seconds}
+
+
+# Class: TriggerServer
+# Purpose: TCP server that receives system names from any number of PLC/station clients at once. It runs an asyncio
+#          event loop on its own thread, splits the byte stream into messages, and hands them to the render thread
+#          through a bounded queue. A message that repeats the one already at the back of the queue is coalesced
+#          into it, and when the queue is full the oldest message is dropped.
+# Parameters:
+#   String host: IP address to listen on
+#   Int port: port to listen on (0 picks a free port, see self.port once started)
+#   String framing: 'newline' (messages end with \n or \r\n) or 'length' (4-byte big-endian length, then the message)
+#   Int max_queue: number of messages the queue holds
+#   Int max_message: longest message accepted in bytes
+#   Float flush_timeout: in newline framing, seconds after which bytes without a newline are taken as a whole
+#                        message (for stations that send the bare system name), None to always wait for the newline
+#   Int max_disconnected: number of disconnected clients whose counters are kept (the oldest are dropped)
+# Returns: N/A
+class TriggerServer:
+
+    # Method: __init__
+    # Purpose: Initializes a TriggerServer object
+    # Parameters: See Above
+    # Returns: N/A
+    def __init__(self, host, port, framing='newline', max_queue=64, max_message=4096, flush_timeout=0.25,
+                 max_disconnected=32):
+        if framing not in ('newline', 'length'):
+            raise ValueError("framing must be 'newline' or 'length'")
+        self.host = host
+        self.port = port
+        self.framing = framing
+        self.max_queue = max_queue
+        self.max_message = max_message
+        self.flush_timeout = flush_timeout
+        self.max_disconnected = max_disconnected
+        self.queue = collections.deque()  # (message, ClientStats) waiting for the render thread
+        self.latest = None  # most recent message from any client
+        self.clients = []  # ClientStats of the connected clients and the most recently disconnected ones
+        self.listeners = []  # functions called with every message (called on the server thread)
+        self.lock = threading.Lock()
+        self.message_event = threading.Event()  # set whenever a message is queued
+        self.ready_event = threading.Event()  # set once the server is listening (or failed to start)
+        self.start_error = None
+        self.loop = None
+        self.server = None
+        self.thread = None
+
+    # Method: add_listener
+    # Purpose: registers a function to call with every message (called on the server thread, keep it short)
+    # Parameters:
+    #   Function listener: function that takes the message string
+    # Returns: N/A
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    # Method: start
+    # Purpose: starts the server on a separate thread and waits until it is listening
+    # Parameters: N/A
+    # Returns: N/A
+    def start(self):
+        if self.thread is not None:
+            return
+        self.ready_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.ready_event.wait()
+        if self.start_error is not None:
+            self.thread = None
+            raise self.start_error
+
+    # Method: stop
+    # Purpose: closes the server and every client connection
+    # Parameters: N/A
+    # Returns: N/A
+    def stop(self):
+        if self.thread is None:
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.thread = None
+
+    # Method: run
+    # Purpose: runs the asyncio event loop until stop() is called (runs on the thread from start())
+    # Parameters: N/A
+    # Returns: N/A
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self.handle_client, self.host, self.port, reuse_address=True))
+        except OSError as error:
+            self.start_error = error
+            self.ready_event.set()
+            self.loop.close()
+            return
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.ready_event.set()
+
+        try:
+            self.loop.run_forever()
+        finally:
+            self.server.close()
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            # Let every client handler finish closing its connection before the loop is closed
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+    # Method: handle_client
+    # Purpose: reads messages from one client until it disconnects
+    # Parameters:
+    #   StreamReader reader: incoming data from the client
+    #   StreamWriter writer: connection to the client
+    # Returns: N/A
+    async def handle_client(self, reader, writer):
+        peer = writer.get_extra_info('peername')
+        stats = ClientStats(peer[0] + ':' + str(peer[1]) if peer else 'unknown')
+        with self.lock:
+            self.clients.append(stats)
+        print('Client connected: ' + stats.address)
+        try:
+            if self.framing == 'length':
+                await self.read_length_framed(reader, stats)
+            else:
+                await self.read_newline_framed(reader, stats)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            pass  # the server is stopping
+        finally:
+            stats.disconnected_time = time.time()
+            print('Client disconnected: ' + stats.address)
+            writer.close()
+            self.forget_clients()
+
+    # Method: forget_clients
+    # Purpose: drops the counters of the oldest disconnected clients once more than max_disconnected are kept, so a
+    #          station that keeps reconnecting doesn't grow the list forever
+    # Parameters: N/A
+    # Returns: N/A
+    def forget_clients(self):
+        with self.lock:
+            disconnected = [client for client in self.clients if client.disconnected_time is not None]
+            if len(disconnected) <= self.max_disconnected:
+                return
+            forgotten = set(id(client) for client in disconnected[:len(disconnected) - self.max_disconnected])
+            self.clients = [client for client in self.clients if id(client) not in forgotten]
+
+    # Method: read_newline_framed
+    # Purpose: splits a client's byte stream into messages at each newline
+    # Parameters:
+    #   StreamReader reader: incoming data from the client
+    #   ClientStats stats: counters of the client
+    # Returns: N/A
+    async def read_newline_framed(self, reader, stats):
+        buffer = b''
+        while True:
+            timeout = self.flush_timeout if len(buffer) > 0 else None
+            try:
+                chunk = await asyncio.wait_for(reader.read(4096), timeout)
+            except asyncio.TimeoutError:
+                # Nothing more arrived, the station sent a message without a newline
+                self.deliver(buffer, stats)
+                buffer = b''
+                continue
+            if len(chunk) == 0:
+                if len(buffer) > 0:
+                    self.deliver(buffer, stats)
+                return
+            stats.bytes_received = stats.bytes_received + len(chunk)
+
+            lines = (buffer + chunk).split(b'\n')
+            buffer = lines.pop()
+            for line in lines:
+                self.deliver(line, stats)
+            if len(buffer) > self.max_message:
+                stats.dropped = stats.dropped + 1
+                buffer = b''
+
+    # Method: read_length_framed
+    # Purpose: reads messages that each start with a 4-byte big-endian length
+    # Parameters:
+    #   StreamReader reader: incoming data from the client
+    #   ClientStats stats: counters of the client
+    # Returns: N/A
+    async def read_length_framed(self, reader, stats):
+        while True:
+            try:
+                header = await reader.readexactly(4)
+            except asyncio.IncompleteReadError:
+                return
+            length = struct.unpack('>I', header)[0]
+            stats.bytes_received = stats.bytes_received + 4 + length
+            if length > self.max_message:
+                # Read past the message in pieces instead of buffering all of it
+                stats.dropped = stats.dropped + 1
+                while length > 0:
+                    length = length - len(await reader.readexactly(min(length, 65536)))
+                continue
+            message = await reader.readexactly(length)
+            self.deliver(message, stats)
+
+    # Method: deliver
+    # Purpose: decodes a message and adds it to the queue
+    # Parameters:
+    #   Bytes raw_message: message as received
+    #   ClientStats stats: counters of the client that sent it
+    # Returns: N/A
+    def deliver(self, raw_message, stats):
+        with Latency_Trace.tracer.span('tcp_receive'):
+            self.queue_message(raw_message, stats)
+
+    # Method: queue_message
+    # Purpose: decodes a message, adds it to the queue and calls the listeners (see deliver)
+    # Parameters:
+    #   Bytes raw_message: message as received
+    #   ClientStats stats: counters of the client that sent it
+    # Returns: N/A
+    def queue_message(self, raw_message, stats):
+        if len(raw_message) > self.max_message:
+            stats.dropped = stats.dropped + 1
+            return
+        message = raw_message.decode(errors='replace').strip('\r\n\x00 ')
+        if len(message) == 0:
+            return
+        stats.messages = stats.messages + 1
+
+        with self.lock:
+            if len(self.queue) > 0 and self.queue[-1][0] == message:
+                stats.coalesced = stats.coalesced + 1
+            else:
+                if len(self.queue) >= self.max_queue:
+                    dropped_message, dropped_stats = self.queue.popleft()
+                    dropped_stats.dropped = dropped_stats.dropped + 1
+                self.queue.append((message, stats))
+            self.latest = message
+        self.message_event.set()
+
+        for listener in self.listeners:
+            listener(message)
+
+    # Method: get_messages
+    # Purpose: takes every waiting message off the queue (called by the render thread)
+    # Parameters: N/A
+    # Returns:
+    #   Array messages: messages in the order they arrived
+    def get_messages(self):
+        with self.lock:
+            messages = [message for message, stats in self.queue]
+            self.queue.clear()
+            self.message_event.clear()
+        return messages
+
+    # Method: wait_for_message
+    # Purpose: waits until at least one message has been received
+    # Parameters:
+    #   Float timeout: longest time to wait in seconds (None to wait forever)
+    # Returns:
+    #   String latest: most recent message, or None if none arrived in time
+    def wait_for_message(self, timeout=None):
+        end_time = None if timeout is None else time.monotonic() + timeout
+        while self.latest is None:
+            remaining = None if end_time is None else end_time - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            self.message_event.wait(remaining)
+        return self.latest
+
+    # Method: stats
+    # Purpose: gets the counters of the connected clients and the most recently disconnected ones
+    # Parameters: N/A
+    # Returns:
+    #   Array stats: one dict per client (see ClientStats.to_dict)
+    def stats(self):
+        with self.lock:
+            return [client.to_dict() for client in self.clients]
+
+
+# Method: send_trigger
+# Purpose: sends messages to a TriggerServer (used by stations written in Python and for loopback testing)
+# Parameters:
+#   String host: IP address of the server
+#   Int port: port of the server
+#   Array messages: messages to send (a single string is also accepted)
+#   String framing: framing the server uses ('newline' or 'length')
+# Returns: N/A
+def send_trigger(host, port, messages, framing='newline'):
+    if isinstance(messages, str):
+        messages = [messages]
+    payload = b''
+    for message in messages:
+        encoded = message.encode()
+        if framing == 'length':
+            payload = payload + struct.pack('>I', len(encoded)) + encoded
+        else:
+            payload = payload + encoded + b'\n'
+    with socket.create_connection((host, port)) as connection:
+        connection.sendall(payload)
@@ -0,0 +1,222 @@
+# Author: Tyler Brunette
+# Company: Indicon Corporation
+
+# Times the viewer's hot paths on synthetic data of any size: parsing and shape matching (get_inspection), finding
+# the latest file in the share, and drawing a whole frame without a window.
+# Run from the repository folder: python benchmarks/Load_Benchmark.py [--cameras N] [--inspections N] [--shapes N]
+#                                   [--files N] [--output results.json] [--compare old_results.json]
+# The results file is JSON, so runs from two versions can be compared with --compare.
+
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import tempfile
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')  # must be set before pygame is imported
+repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repository)
+import pygame
+import Indicon_Inspection_Visuals as Visuals
+import Inspection_Parser
+import Inspection_Watcher
+import Shape_Binary
+import Shape_Library
+import Parse_Benchmark
+import Synthetic_Data
+
+
+# Method: make_share
+# Purpose: fills a folder with inspection files for the directory scan benchmarks (only the names matter there)
+# Parameters:
+#   String folder: folder to fill
+#   Int files: number of files
+#   String system_name: system name that half of the files belong to
+# Returns: N/A
+def make_share(folder, files, system_name):
+    os.makedirs(folder, exist_ok=True)
+    for number in range(files):
+        system = system_name if number % 2 == 0 else "OtherSystem"
+        with open(os.path.join(folder, str(number).zfill(6) + "_" + system + ".json"), 'w') as json_file:
+            json_file.write("{}")
+
+
+# Method: glob_latest
+# Purpose: finds the latest file of a system the way the viewer did before Inspection_Watcher (for comparison)
+# Parameters:
+#   String folder: folder to search
+#   String system_name: name the file path must contain
+# Returns:
+#   String latest_json: newest matching file
+def glob_latest(folder, system_name):
+    system_json_files = [file for file in glob.iglob(os.path.join(folder, '*.json')) if system_name in file]
+    return max(system_json_files, key=os.path.getctime)
+
+
+# Method: index_latest
+# Purpose: builds a new Inspection_Watcher index of a folder and gets the latest file of a system from it
+# Parameters:
+#   String folder: folder to index
+#   String system_name: name the file path must contain
+# Returns:
+#   String latest_json: newest matching file
+def index_latest(folder, system_name):
+    watcher = Inspection_Watcher.InspectionWatcher(folder)
+    watcher.scan()
+    watcher.check_pending(settled=True)
+    return watcher.get_latest(system_name)
+
+
+# Method: run_benchmarks
+# Purpose: generates the synthetic data in a temporary folder and times each hot path
+# Parameters:
+#   Namespace args: command line arguments (see main)
+# Returns:
+#   Dict results: benchmark name -> {'ms': best time of one call in milliseconds, 'number', 'repeat'}
+def run_benchmarks(args):
+    results = {}
+
+    # Method: record
+    # Purpose: times a function and adds it to the results
+    # Parameters:
+    #   String name: benchmark name
+    #   Function function: function to time (takes no arguments)
+    #   Int number: calls per run
+    # Returns: N/A
+    def record(name, function, number):
+        milliseconds = Parse_Benchmark.time_function(function, number=number, repeat=args.repeat)
+        results[name] = {'ms': milliseconds, 'number': number, 'repeat': args.repeat}
+        print("  {:<28}{:10.3f} ms".format(name, milliseconds))
+
+    with tempfile.TemporaryDirectory() as folder:
+        # Inspection file, shape libraries and live image
+        json_file = os.path.join(folder, "2022-04-28T144542_0_System00.Json")
+        shape_keys = Synthetic_Data.get_shape_keys(args.cameras, args.inspections, args.parameters)
+        Synthetic_Data.generate_result_file(json_file, args.cameras, args.inspections, args.parameters,
+                                            args.fail_rate)
+        Synthetic_Data.generate_shape_library(os.path.join(folder, "ShapeData.json"), shape_keys, args.shapes)
+        Synthetic_Data.generate_shape_library(os.path.join(folder, "LiveImageShapes.json"), shape_keys, args.shapes,
+                                              images=1)
+        live_width, live_height = [int(size) for size in args.live_size.split('x')]
+        live_image = pygame.Surface((live_width, live_height))
+        live_image.fill((90, 90, 90))
+        pygame.image.save(live_image, os.path.join(folder, "live.png"))
+        Visuals.shape_cache = Shape_Library.ShapeLibraryCache(os.path.join(folder, "ShapeData.json"))
+        Visuals.live_shape_cache = Shape_Library.ShapeLibraryCache(os.path.join(folder, "LiveImageShapes.json"))
+
+        print("Inspection file: " + str(os.path.getsize(json_file)) + " bytes, " +
+              str(args.cameras * args.inspections) + " inspections, " + str(args.shapes) + " shapes per library")
+        record("parse", lambda: Inspection_Parser.load_inspection(json_file), 20)
+        record("get_inspection", lambda: Visuals.get_inspection(json_file, image_directory=folder), 20)
+
+        # Loading a shape library from json and from its compiled copy
+        shape_file = os.path.join(folder, "ShapeData.json")
+        Shape_Binary.compile_shape_library(shape_file)
+
+        # Method: load_json_library
+        # Purpose: reads the json shape library the way the viewer does when there is no compiled copy
+        # Parameters: N/A
+        # Returns:
+        #   ShapeLibrary library: library holding every shape in the file
+        def load_json_library():
+            with open(shape_file) as shape_json:
+                return Shape_Library.ShapeLibrary(json.load(shape_json)['Shapes'], shape_file)
+
+        record("shape_library_json", load_json_library, 5)
+        record("shape_library_binary", lambda: Shape_Binary.load_binary_shape_library(shape_file), 5)
+
+        # Latest file in a share of args.files files
+        share = os.path.join(folder, "share")
+        make_share(share, args.files, "System00")
+        print("Share: " + str(args.files) + " files")
+        record("latest_file_glob", lambda: glob_latest(share, "System00"), 5)
+        record("latest_file_index_build", lambda: index_latest(share, "System00"), 5)
+        watcher = Inspection_Watcher.InspectionWatcher(share)
+        watcher.scan()
+        watcher.check_pending(settled=True)
+        record("latest_file_indexed", lambda: watcher.get_latest("System00"), 1000)
+
+        # A whole frame of the viewer: static images and every shape, then a failure panel
+        static_image = os.path.join(repository, "IP_Image_1.png")
+        viewer = Visuals.InspectionViewer(static_image, static_image, static_image)
+        inspection_results = Visuals.get_inspection(json_file, image_directory=folder)
+        Visuals.pipeline.prepare_images(inspection_results[1])  # live images are decoded by the pipeline
+        viewer.set_inspection(inspection_results, json_file)
+        print("Frame: " + str(len(inspection_results[0])) + " shapes, " + str(len(inspection_results[1])) +
+              " failed inspections")
+
+        # Method: draw_frame
+        # Purpose: draws and displays a whole frame (what the viewer does when a new inspection arrives)
+        # Parameters: N/A
+        # Returns: N/A
+        def draw_frame():
+            viewer.draw_inspection()
+            if len(viewer.failed_inspections) > 0:
+                viewer.draw_failed_inspection()
+            pygame.display.update(viewer.dirty_rects)
+            viewer.dirty_rects = []
+
+        # Method: draw_rotation
+        # Purpose: draws and displays the next failed inspection (what the viewer does on each carousel rotation)
+        # Parameters: N/A
+        # Returns: N/A
+        def draw_rotation():
+            if len(viewer.failed_inspections) > 0:
+                viewer.draw_failed_inspection()
+            pygame.display.update(viewer.dirty_rects)
+            viewer.dirty_rects = []
+
+        record("frame_full", draw_frame, 20)
+        record("frame_rotation", draw_rotation, 20)
+        pygame.quit()
+    return results
+
+
+# Method: main
+# Purpose: runs the benchmarks with the sizes given on the command line and saves or compares the results
+# Parameters: N/A
+# Returns: N/A
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parsing, shape matching, file lookup and drawing.")
+    parser.add_argument("--cameras", type=int, default=13)
+    parser.add_argument("--inspections", type=int, default=26, help="inspections per camera")
+    parser.add_argument("--parameters", type=int, default=2, help="ResultParameters per inspection")
+    parser.add_argument("--shapes", type=int, default=100, help="shapes in each shape library")
+    parser.add_argument("--fail-rate", type=float, default=0.1, help="fraction of inspections that fail")
+    parser.add_argument("--files", type=int, default=2000, help="inspection files in the share")
+    parser.add_argument("--live-size", default="1224x1024", help="size of the live image (WIDTHxHEIGHT)")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each benchmark (the best is kept)")
+    parser.add_argument("--output", default=None, help="JSON file to save the results to")
+    parser.add_argument("--compare", default=None, help="JSON results file of an earlier run to compare against")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args)
+    report = {
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'environment': {'python': platform.python_version(), 'pygame': pygame.version.ver,
+                        'platform': platform.platform()},
+        'results': results,
+    }
+
+    if args.output is not None:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as compare_file:
+            old_report = json.load(compare_file)
+        old_results = old_report['results']
+        print("Compared with " + args.compare + ":")
+        if old_report['config'] != report['config']:
+            print("  (the runs used different sizes, see 'config' in each results file)")
+        for name, result in results.items():
+            if name in old_results:
+                change = (result['ms'] / old_results[name]['ms'] - 1) * 100
+                print("  {:<28}{:10.3f} ms -> {:10.3f} ms ({:+.1f}%)".format(name, old_results[name]['ms'],
+                                                                             result['ms'], change))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# Author: Tyler Brunette
+# Company: Indicon Corporation
+
+# Compares ways of reading the parts of an inspection result file the viewer uses.
+# Run from the repository folder: python benchmarks/Parse_Benchmark.py [json files...]
+
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import Inspection_Parser
+
+sample_files = ["2022-04-28T141240_1728832_System00.Json", "2022-04-28T144542_1728833_System00.Json"]
+
+
+# Method: time_function
+# Purpose: times a function, keeping the best of several runs
+# Parameters:
+#   Function function: function to time (takes no arguments)
+#   Int number: calls per run
+#   Int repeat: number of runs
+# Returns:
+#   Float milliseconds: best time of one call in milliseconds
+def time_function(function, number=50, repeat=5):
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number * 1000
+
+
+# Method: main
+# Purpose: times json.load against Inspection_Parser on each file and prints the results
+# Parameters: N/A
+# Returns: N/A
+def main():
+    files = sys.argv[1:] if len(sys.argv) > 1 else sample_files
+    for file_name in files:
+        with open(file_name) as json_file:
+            text = json_file.read()
+
+        # Both must give the viewer the same data
+        full = Inspection_Parser.select_fields(json.loads(text), Inspection_Parser.viewer_fields)
+        assert Inspection_Parser.parse_inspection(text) == full
+
+        results = [
+            ("json.loads (whole tree)", time_function(lambda: json.loads(text))),
+            ("parse_inspection (decode + trim)", time_function(lambda: Inspection_Parser.parse_inspection(text))),
+        ]
+        print(file_name + " (" + str(len(text)) + " characters)")
+        for name, milliseconds in results:
+            print("  {:<34}{:8.3f} ms".format(name, milliseconds))
+
+
+if __name__ == "__main__":
+    main()
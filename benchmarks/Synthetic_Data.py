@@ -0,0 +1,183 @@
+# Author: Tyler Brunette
+# Company: Indicon Corporation
+
+# Generates System00-style inspection result files and matching shape libraries of any size for benchmarking.
+# Run from the repository folder: python benchmarks/Synthetic_Data.py <output folder> [--cameras N] [--inspections N]
+
+import argparse
+import json
+import os
+import random
+
+
+# Method: get_result_parameters
+# Purpose: builds the ResultParameters of one synthetic inspection (the values make its shape key unique)
+# Parameters:
+#   Int camera: camera number
+#   Int inspection: inspection number within the camera
+#   Int parameters: number of [key, value] pairs
+# Returns:
+#   Array result_parameters: [key, value] pairs
+def get_result_parameters(camera, inspection, parameters):
+    result_parameters = [["Result", "Camera " + str(camera) + " Inspection " + str(inspection)]]
+    for number in range(1, parameters):
+        result_parameters.append(["Parameter " + str(number), "Value " + str(number)])
+    return result_parameters
+
+
+# Method: get_shape_keys
+# Purpose: gets the shape key of every inspection in a synthetic result file (same joining as Shape_Library)
+# Parameters:
+#   Int cameras: number of cameras
+#   Int inspections: inspections per camera
+#   Int parameters: ResultParameters per inspection
+# Returns:
+#   Array shape_keys: shape key of every inspection, camera by camera
+def get_shape_keys(cameras, inspections, parameters):
+    shape_keys = []
+    for camera in range(cameras):
+        for inspection in range(inspections):
+            values = [value for key, value in get_result_parameters(camera, inspection, parameters)]
+            shape_keys.append(" ".join(values))
+    return shape_keys
+
+
+# Method: generate_result_file
+# Purpose: writes a synthetic inspection result file laid out like the System00 sample files, including the
+#          settings and tool data the viewer doesn't use (so parse times are realistic)
+# Parameters:
+#   String file_name: file to write
+#   Int cameras: number of cameras
+#   Int inspections: inspections per camera
+#   Int parameters: ResultParameters per inspection
+#   Float fail_rate: fraction of inspections that fail
+#   String live_image: FileName of every camera's live image
+#   Int seed: random seed (the same seed writes the same file)
+# Returns: N/A
+def generate_result_file(file_name, cameras, inspections, parameters, fail_rate=0.1, live_image="live.png", seed=0):
+    generator = random.Random(seed)
+    camera_list = []
+    failed = False
+    for camera in range(cameras):
+        inspection_list = []
+        for inspection in range(inspections):
+            result = 'F' if generator.random() < fail_rate else 'P'
+            failed = failed or result == 'F'
+            inspection_list.append({
+                "RunRestrictions": [["FGPN", "*"], ["FGPN 8-11", "0700,0900,0903,4803,5003,6104,6204,6304"],
+                                    ["FGPN 8-15", "*"]],
+                "ResultParameters": get_result_parameters(camera, inspection, parameters),
+                "Tools": [],
+                "Name": "Camera " + str(camera) + " Inspection " + str(inspection),
+                "Index": inspection,
+                "Ran": True,
+                "Passed": result == 'P',
+                "Debug": False,
+                "Bypass": False,
+                "Result": result,
+            })
+        camera_list.append({
+            "LoadSettings": [["TimeoutBool", "True"], ["Timeout", "10000"], ["TriggerMode", "Manual"],
+                             ["Output Pixel Format", "planarrgb8"], ["Packet Size", "9000"]],
+            "PrimeSettings": [["BalanceRatioSelector", "Red"], ["BalanceRatioRaw", "117.645"]],
+            "RunSettings": [["Exposure", "12"], ["Contrast", "0.1"], ["Brightness", "0"]],
+            "ImageLocations": [
+                {"CameraIndex": camera, "InspectionIndex": -1, "ToolIndex": -1, "ResultsSaved": True,
+                 "IncludeOverlay": False, "StorageType": "ID", "ImageType": "Png",
+                 "FileDirectoryName": "D:\\Images", "FileName": live_image,
+                 "FileFullName": "D:\\Images\\" + live_image},
+                {"CameraIndex": camera, "InspectionIndex": -1, "ToolIndex": -1, "ResultsSaved": True,
+                 "IncludeOverlay": False, "StorageType": "Custom", "ImageType": "Jpeg",
+                 "FileDirectoryName": "D:\\HMI", "FileName": "Image" + str(camera) + ".Jpeg",
+                 "FileFullName": "D:\\HMI\\Image" + str(camera) + ".Jpeg"},
+            ],
+            "Inspections": inspection_list,
+            "Name": str(camera).zfill(2) + "-Camera " + str(camera),
+            "Index": camera,
+            "Passed": True,
+            "Result": 'P',
+            "Bypassed": False,
+            "HasError": False,
+            "Trigger": "Normal",
+            "TriggerValue": True,
+            "Samples": [{"Tools": ["Locate", "Tool " + str(camera)], "RuntimeWorkspaceName": "Workspace"}],
+        })
+
+    result_file = {
+        "ResultRaw_Enabled": False,
+        "ResultArchive_Enabled": False,
+        "Name": "System00",
+        "Identifier": str(seed),
+        "Index": 0,
+        "BuildData": {"SERIALNUMBER": str(seed), "UserID": "OPERATOR_ID", "FGPN": "A29668058048W59"},
+        "Result": 'F' if failed else 'P',
+        "Timestamp_InspectionStart": "2022-04-28T14:45:36.1063252-05:00",
+        "Timestamp_InspectionEnd": "2022-04-28T14:45:42.7740536-05:00",
+        "Cameras": camera_list,
+        "BuildDataEvents": ["OPC"],
+        "TriggerEvents": [],
+        "ResultHandlers": ["OPC", "Website"],
+    }
+    with open(file_name, 'w') as json_file:
+        json.dump(result_file, json_file, indent=2)
+
+
+# Method: generate_shape_library
+# Purpose: writes a shape data file (ShapeData.json / LiveImageShapes.json layout) with a shape for some keys
+# Parameters:
+#   String file_name: file to write
+#   Array shape_keys: keys the library's shapes use (shapes are spread evenly over the keys)
+#   Int shapes: number of shapes in the library (shapes past the number of keys match no inspection)
+#   Int images: number of static images the shapes are spread over (1 for a live image library)
+#   Int seed: random seed (the same seed writes the same file)
+# Returns: N/A
+def generate_shape_library(file_name, shape_keys, shapes, images=3, seed=0):
+    generator = random.Random(seed)
+    shape_list = []
+    matched = min(shapes, len(shape_keys))
+    for number in range(shapes):
+        key = "Unused Key " + str(number)
+        if number < matched:
+            key = shape_keys[number * len(shape_keys) // matched]
+        size = generator.uniform(40, 160)
+        shape_list.append({
+            "name": "shape_" + str(number),
+            "shape": number % 2,
+            "color": 1,
+            "display_name": 1,
+            "x": generator.uniform(50, 550),
+            "y": generator.uniform(50, 350),
+            "height": size,
+            "width": size,
+            "key": key,
+            "image": str(number % images + 1),
+            "line_width": 5,
+        })
+    with open(file_name, 'w') as shape_json:
+        json.dump({"Shapes": shape_list}, shape_json, indent=4)
+
+
+# Method: main
+# Purpose: writes a synthetic result file and its two shape libraries to the folder given on the command line
+# Parameters: N/A
+# Returns: N/A
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic inspection data.")
+    parser.add_argument("output", help="folder to write the files to")
+    parser.add_argument("--cameras", type=int, default=13)
+    parser.add_argument("--inspections", type=int, default=26, help="inspections per camera")
+    parser.add_argument("--parameters", type=int, default=2, help="ResultParameters per inspection")
+    parser.add_argument("--shapes", type=int, default=100, help="shapes in each shape library")
+    parser.add_argument("--fail-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    shape_keys = get_shape_keys(args.cameras, args.inspections, args.parameters)
+    generate_result_file(os.path.join(args.output, "2022-04-28T144542_0_System00.Json"), args.cameras,
+                         args.inspections, args.parameters, args.fail_rate)
+    generate_shape_library(os.path.join(args.output, "ShapeData.json"), shape_keys, args.shapes)
+    generate_shape_library(os.path.join(args.output, "LiveImageShapes.json"), shape_keys, args.shapes, images=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+# Author: Tyler Brunette
+# Company: Indicon Corporation
+
+import os
+import sys
+
+# The modules are plain scripts in the folder above, not an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,147 @@
+# Author: Tyler Brunette
+# Company: Indicon Corporation
+
+import json
+import os
+import time
+import Inspection_Watcher
+import Share_Mirror
+
+
+# Method: write_inspection
+# Purpose: writes a small inspection file with one failed camera to a share folder
+# Parameters:
+#   Path share: share folder
+#   String name: file name of the inspection (ex: a_System00.Json)
+#   String image_name: file name of the failed camera's live image
+#   Float mtime: modified time to give the file (the mirror sorts by it)
+# Returns:
+#   Path json_file: the inspection file
+def write_inspection(share, name, image_name, mtime):
+    json_file = share / name
+    json_file.write_text(json.dumps({
+        'Name': 'System00',
+        'Cameras': [{'Name': 'Camera 1',
+                     'Inspections': [{'Name': 'Clip 1', 'Result': 'F', 'ResultParameters': []}],
+                     'ImageLocations': [{'StorageType': 'ID', 'ImageType': 'Png', 'FileName': image_name}]}]}))
+    os.utime(json_file, (mtime, mtime))
+    return json_file
+
+
+# Method: make_mirror
+# Purpose: makes a ShareMirror between two local folders, with latency added to every read from the share
+# Parameters:
+#   Path share: share folder
+#   Path mirror: mirror folder
+#   Int max_bytes: size limit of the mirror folder
+#   Int workers: number of files copied at once
+# Returns:
+#   ShareMirror share_mirror: the mirror (not started)
+#   Array published: files the mirror publishes to the local watcher, in order
+def make_mirror(share, mirror, max_bytes=1024 * 1024, workers=2):
+    share_watcher = Inspection_Watcher.InspectionWatcher(str(share), poll_interval=0.05, settle_time=0.05)
+    local_watcher = Inspection_Watcher.InspectionWatcher(str(mirror))
+    published = []
+    local_watcher.add_listener(published.append)
+    share_mirror = Share_Mirror.ShareMirror(share_watcher, local_watcher, max_bytes, workers=workers, latency=0.02)
+    return share_mirror, published
+
+
+# Method: wait_for
+# Purpose: waits until a condition is true
+# Parameters:
+#   Function condition: function that returns whether to stop waiting
+#   Float timeout: longest time to wait in seconds
+# Returns:
+#   Bool met: whether the condition became true
+def wait_for(condition, timeout=10.0):
+    end_time = time.monotonic() + timeout
+    while time.monotonic() < end_time:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+# Method: get_part_files
+# Purpose: gets the temporary copies left in a folder
+# Parameters:
+#   Path folder: folder to search
+# Returns:
+#   Array part_files: file names ending in .part
+def get_part_files(folder):
+    return [name for name in os.listdir(folder) if name.endswith(".part")]
+
+
+def test_json_and_images_are_mirrored_and_published(tmp_path):
+    share = tmp_path / "share"
+    mirror = tmp_path / "mirror"
+    share.mkdir()
+    (share / "a.Png").write_bytes(b'a' * 100)
+    write_inspection(share, "a_System00.Json", "a.Png", time.time() - 60)
+    share_mirror, published = make_mirror(share, mirror)
+    share_mirror.start()
+    try:
+        assert wait_for(lambda: len(published) == 1)
+        assert published == [str(mirror / "a_System00.Json")]
+        assert (mirror / "a.Png").read_bytes() == b'a' * 100
+        assert share_mirror.local_watcher.get_latest("System00") == str(mirror / "a_System00.Json")
+
+        # A file that arrives on the share later is copied in the background
+        (share / "b.Png").write_bytes(b'b' * 100)
+        write_inspection(share, "b_System00.Json", "b.Png", time.time())
+        assert wait_for(lambda: len(published) == 2)
+        assert (mirror / "b.Png").exists()
+        assert share_mirror.local_watcher.get_latest("System00") == str(mirror / "b_System00.Json")
+    finally:
+        share_mirror.stop()
+    assert share_mirror.stats()['copied'] == 4
+    assert get_part_files(mirror) == []
+
+
+def test_size_limit_evicts_oldest_files(tmp_path):
+    share = tmp_path / "share"
+    mirror = tmp_path / "mirror"
+    share.mkdir()
+    start_time = time.time() - 60
+    for number in range(4):
+        (share / ("image_" + str(number) + ".Png")).write_bytes(b'x' * 4000)
+        write_inspection(share, "file_" + str(number) + "_System00.Json", "image_" + str(number) + ".Png",
+                         start_time + number)
+    # One file at a time, so the files are added to the mirror (and evicted) in the order they were written
+    share_mirror, published = make_mirror(share, mirror, max_bytes=10000, workers=1)
+    share_mirror.start()
+    try:
+        assert wait_for(lambda: share_mirror.stats()['copied'] == 8)
+        assert wait_for(lambda: len(share_mirror.jobs) == 4 and all(job.done() for job in share_mirror.jobs.values()))
+    finally:
+        share_mirror.stop()
+    stats = share_mirror.stats()
+    assert stats['evictions'] > 0
+    assert stats['total_bytes'] <= 10000
+    assert stats['total_bytes'] == sum(os.path.getsize(mirror / name) for name in os.listdir(mirror))
+    # The newest file is kept, and evicted inspection files are taken out of the local index
+    assert (mirror / "file_3_System00.Json").exists()
+    local_files = share_mirror.local_watcher.get_files()
+    assert all(os.path.exists(path) for path in local_files)
+    assert str(mirror / "file_0_System00.Json") not in local_files
+
+
+def test_failed_image_copy_leaves_no_part_file(tmp_path):
+    share = tmp_path / "share"
+    mirror = tmp_path / "mirror"
+    share.mkdir()
+    write_inspection(share, "a_System00.Json", "missing.Png", time.time() - 60)
+    share_mirror, published = make_mirror(share, mirror)
+    share_mirror.start()
+    try:
+        assert wait_for(lambda: len(share_mirror.jobs) == 1 and next(iter(share_mirror.jobs.values())).done())
+    finally:
+        share_mirror.stop()
+    assert published == []
+    assert get_part_files(mirror) == []
+    assert not (mirror / "a_System00.Json").exists()
+
+    # fetch falls back to the share when the copy fails, and leaves nothing behind either
+    assert share_mirror.fetch(str(mirror / "missing.Png")) == str(share / "missing.Png")
+    assert get_part_files(mirror) == []
@@ -0,0 +1,166 @@
+# Author: Tyler Brunette
+# Company: Indicon Corporation
+
+import socket
+import struct
+import threading
+import time
+import pytest
+import Trigger_Server
+
+
+# Method: start_server
+# Purpose: starts a TriggerServer on a free loopback port
+# Parameters:
+#   Dict kwargs: TriggerServer arguments other than host and port
+# Returns:
+#   TriggerServer server: the running server
+def start_server(**kwargs):
+    server = Trigger_Server.TriggerServer('127.0.0.1', 0, **kwargs)
+    server.start()
+    return server
+
+
+# Method: connect
+# Purpose: opens a raw connection to a server, with Nagle turned off so each send goes out as its own write
+# Parameters:
+#   TriggerServer server: the running server
+# Returns:
+#   Socket connection: the open connection
+def connect(server):
+    connection = socket.create_connection(('127.0.0.1', server.port))
+    connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return connection
+
+
+# Method: wait_for_count
+# Purpose: waits until the server has received a number of messages (counted before coalescing and dropping)
+# Parameters:
+#   TriggerServer server: the running server
+#   Int count: number of messages to wait for
+#   Float timeout: longest time to wait in seconds
+# Returns:
+#   Bool received: whether the messages arrived in time
+def wait_for_count(server, count, timeout=5.0):
+    end_time = time.monotonic() + timeout
+    while time.monotonic() < end_time:
+        if sum(client['messages'] for client in server.stats()) >= count:
+            return True
+        time.sleep(0.01)
+    return False
+
+
+# Method: frame
+# Purpose: frames messages the way a station would send them
+# Parameters:
+#   Array messages: messages to frame
+#   String framing: 'newline' or 'length'
+# Returns:
+#   Bytes payload: the framed messages
+def frame(messages, framing):
+    payload = b''
+    for message in messages:
+        if framing == 'length':
+            payload = payload + struct.pack('>I', len(message)) + message.encode()
+        else:
+            payload = payload + message.encode() + b'\r\n'
+    return payload
+
+
+@pytest.mark.parametrize('framing', ['newline', 'length'])
+def test_message_split_across_writes(framing):
+    server = start_server(framing=framing)
+    try:
+        payload = frame(['System01', 'System02'], framing)
+        with connect(server) as connection:
+            # Split inside the first message (and inside the length header) with gaps shorter than the flush timeout
+            for start, end in ((0, 3), (3, 9), (9, len(payload))):
+                connection.sendall(payload[start:end])
+                time.sleep(0.05)
+            assert wait_for_count(server, 2)
+        assert server.get_messages() == ['System01', 'System02']
+    finally:
+        server.stop()
+
+
+@pytest.mark.parametrize('framing', ['newline', 'length'])
+def test_several_messages_in_one_write(framing):
+    server = start_server(framing=framing)
+    try:
+        Trigger_Server.send_trigger('127.0.0.1', server.port, ['System01', 'System02', 'System03'], framing)
+        assert wait_for_count(server, 3)
+        assert server.get_messages() == ['System01', 'System02', 'System03']
+        assert server.wait_for_message(0) == 'System03'
+    finally:
+        server.stop()
+
+
+@pytest.mark.parametrize('framing', ['newline', 'length'])
+def test_repeated_message_is_coalesced(framing):
+    server = start_server(framing=framing)
+    try:
+        Trigger_Server.send_trigger('127.0.0.1', server.port, ['System01', 'System01', 'System02', 'System01'],
+                                    framing)
+        assert wait_for_count(server, 4)
+        # Only a repeat of the message at the back of the queue is coalesced
+        assert server.get_messages() == ['System01', 'System02', 'System01']
+        assert sum(client['coalesced'] for client in server.stats()) == 1
+    finally:
+        server.stop()
+
+
+def test_oldest_message_dropped_when_queue_full():
+    server = start_server(max_queue=3)
+    try:
+        Trigger_Server.send_trigger('127.0.0.1', server.port, ['System0' + str(number) for number in range(5)])
+        assert wait_for_count(server, 5)
+        assert server.get_messages() == ['System02', 'System03', 'System04']
+        assert sum(client['dropped'] for client in server.stats()) == 2
+    finally:
+        server.stop()
+
+
+def test_partial_frame_flushed_after_timeout():
+    server = start_server(flush_timeout=0.25)
+    try:
+        with connect(server) as connection:
+            start_time = time.monotonic()
+            connection.sendall(b'System05')
+            assert server.wait_for_message(5.0) == 'System05'
+            assert time.monotonic() - start_time >= 0.2
+
+            # Bytes that arrive after the flush start a new message
+            connection.sendall(b'System06\n')
+            assert wait_for_count(server, 2)
+        assert server.get_messages() == ['System05', 'System06']
+    finally:
+        server.stop()
+
+
+def test_stop_with_clients_connected():
+    server = start_server()
+    connections = [connect(server) for number in range(3)]
+    try:
+        connections[0].sendall(b'System01\n')
+        assert wait_for_count(server, 1)
+        end_time = time.monotonic() + 5.0
+        while len(server.stats()) < 3 and time.monotonic() < end_time:
+            time.sleep(0.01)
+
+        stopper = threading.Thread(target=server.stop)
+        stopper.start()
+        stopper.join(5.0)
+        assert not stopper.is_alive()
+        assert server.thread is None
+        assert all(not client['connected'] for client in server.stats())
+
+        # The server closed every connection
+        for connection in connections:
+            connection.settimeout(5.0)
+            try:
+                assert connection.recv(16) == b''
+            except ConnectionResetError:
+                pass
+    finally:
+        for connection in connections:
+            connection.close()